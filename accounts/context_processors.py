@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import SimpleLazyObject
+from accounts.models import CartItem
+
+
+def _cache_key(user_id):
+    return f'cart_summary:{user_id}'
+
+
+def get_cart_summary(user_id):
+    """
+    Item count and subtotal of the user's open cart, cached until the cart changes
+    """
+    summary = cache.get(_cache_key(user_id))
+    if summary is None:
+        summary = CartItem.objects.filter(cart__is_paid=False, cart__user_id=user_id).aggregate(
+            count=Count('uid'),
+            subtotal=Coalesce(Sum(CartItem.line_price_expression()), 0),
+        )
+        cache.set(_cache_key(user_id), summary, settings.CART_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    if user_id:
+        cache.delete(_cache_key(user_id))
+
+
+def cart_summary(request):
+    """
+    Expose `cart_summary` (count, subtotal) to templates; only evaluated when
+    a template actually renders it
+    """
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return {}
+    return {'cart_summary': SimpleLazyObject(lambda: get_cart_summary(user.pk))}
@@ -0,0 +1,108 @@
+"""
+Invoice PDF Generation
+Renders order invoices once in a background worker and stores the PDF on disk
+so downloads are served as plain file reads
+"""
+
+import os
+import uuid
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.template.loader import get_template
+from django.utils.text import get_valid_filename
+from accounts.models import Order
+
+
+INVOICE_TEMPLATE = 'accounts/order_pdf_generate.html'
+INVOICE_STYLESHEETS = ['bootstrap.css', 'responsive.css', 'ui.css']
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'INVOICE_WORKERS', 2),
+    thread_name_prefix='invoice',
+)
+
+
+@lru_cache(maxsize=1)
+def get_stylesheets():
+    """
+    Parse the invoice CSS once per process; WeasyPrint stylesheets are
+    immutable, so the parsed objects are safe to share between renders
+    """
+    from weasyprint import CSS
+
+    css_dir = os.path.join(settings.STATIC_ROOT, 'css')
+    return [CSS(filename=os.path.join(css_dir, name)) for name in INVOICE_STYLESHEETS]
+
+
+def invoice_filename(order_id):
+    return f'invoice_{get_valid_filename(order_id)}.pdf'
+
+
+def invoice_path(order_id):
+    return os.path.join(settings.INVOICE_ROOT, invoice_filename(order_id))
+
+
+def render_invoice(order):
+    """
+    Render an order's invoice to PDF bytes
+    """
+    from weasyprint import HTML
+
+    html = get_template(INVOICE_TEMPLATE).render({
+        'order': order,
+        'order_items': order.order_items.select_related('product', 'size_variant', 'color_variant'),
+    })
+    return HTML(string=html).write_pdf(stylesheets=get_stylesheets())
+
+
+def generate_invoice(order, force=False):
+    """
+    Write the invoice PDF for `order` unless it already exists; returns its path
+    """
+    path = invoice_path(order.order_id)
+    if not force and os.path.exists(path):
+        return path
+
+    os.makedirs(settings.INVOICE_ROOT, exist_ok=True)
+    pdf = render_invoice(order)
+    # Unique per call: the background job and a download in the same process may both write
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as pdf_file:
+        pdf_file.write(pdf)
+    os.replace(temp_path, path)  # Atomic, so a concurrent download never reads a partial PDF
+    return path
+
+
+def _generate_in_background(order_uid):
+    """
+    Worker entry point: threads need their own database connection
+    """
+    close_old_connections()
+    try:
+        order = Order.objects.filter(uid=order_uid).first()
+        if order:
+            generate_invoice(order)
+    except Exception as e:
+        print(f"Error generating invoice for order {order_uid}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_invoice(order):
+    """
+    Queue invoice rendering once the order (and its items) are committed
+    """
+    transaction.on_commit(lambda: _executor.submit(_generate_in_background, order.uid))
+
+
+def get_invoice(order):
+    """
+    Path to the stored invoice, rendering synchronously if the background
+    job has not produced it yet
+    """
+    path = invoice_path(order.order_id)
+    if os.path.exists(path):
+        return path
+    return generate_invoice(order)
@@ -0,0 +1,81 @@
+"""
+Django management command to run a local stand-in for the Khalti ePayment API
+Usage: KHALTI_BASE_URL=http://127.0.0.1:8001/ python manage.py runserver
+       python manage.py khalti_stub_server [--port 8001] [--status Completed]
+"""
+
+import json
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Serve fake Khalti initiate/lookup endpoints for local checkout testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--status',
+            type=str,
+            default='Completed',
+            help='Status reported by the lookup endpoint',
+        )
+
+    def handle(self, *args, **options):
+        host, port, status = options['host'], options['port'], options['status']
+        payments = {}
+
+        class StubHandler(BaseHTTPRequestHandler):
+            def _send_json(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                path = urlparse(self.path).path.rstrip('/')
+
+                if path.endswith('/epayment/initiate'):
+                    pidx = uuid.uuid4().hex
+                    payments[pidx] = form
+                    self._send_json(200, {
+                        'pidx': pidx,
+                        'payment_url': f'http://{host}:{port}/pay/{pidx}/',
+                        'expires_in': 3600,
+                    })
+                elif path.endswith('/epayment/lookup'):
+                    pidx = form.get('pidx')
+                    if pidx not in payments:
+                        self._send_json(404, {'detail': 'Not found.'})
+                        return
+                    self._send_json(200, {'pidx': pidx, 'status': status})
+                else:
+                    self._send_json(404, {'detail': 'Not found.'})
+
+            def do_GET(self):
+                # Simulate the hosted payment page by bouncing straight back
+                pidx = urlparse(self.path).path.strip('/').split('/')[-1]
+                payment = payments.get(pidx)
+                if not payment:
+                    self._send_json(404, {'detail': 'Not found.'})
+                    return
+                query = urlencode({'pidx': pidx, 'purchase_order_id': payment['purchase_order_id']})
+                self.send_response(302)
+                self.send_header('Location', f"{payment['return_url']}?{query}")
+                self.end_headers()
+
+        server = ThreadingHTTPServer((host, port), StubHandler)
+        self.stdout.write(self.style.SUCCESS(f'Khalti stub listening on http://{host}:{port}/'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_orderitem_product_price_alter_orderitem_order'),
+        ('products', '0021_producthash_behavior_hash_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='cart_item_uid',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'cart_item_uid'), name='unique_order_cart_line'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 
 from django.db import models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from base.models import BaseModel
 from products.models import Product, ColorVariant, SizeVariant, Coupon
@@ -22,7 +24,8 @@ class Profile(BaseModel):
         return self.user.username
 
     def get_cart_count(self):
-        return CartItem.objects.filter(cart__is_paid=False, cart__user=self.user).count()
+        from accounts.context_processors import get_cart_summary
+        return get_cart_summary(self.user_id)['count']
     
     def save(self, *args, **kwargs):
         # Check if the profile image is being updated and profile exists
@@ -49,14 +52,39 @@ class Cart(BaseModel):
     razorpay_payment_id = models.CharField(max_length=100, null=True, blank=True)
     razorpay_payment_signature = models.CharField(max_length=100, null=True, blank=True)
 
-    def get_cart_total(self):
-        cart_items = self.cart_items.all()
-        total_price = 0
-
-        for cart_item in cart_items:
-            total_price += cart_item.get_product_price()
+    def save(self, *args, **kwargs):
+        self.invalidate_pricing()
+        super(Cart, self).save(*args, **kwargs)
+
+    def invalidate_pricing(self):
+        """
+        Drop memoized line prices and totals after the cart changes
+        """
+        self.__dict__.pop('_priced_items', None)
+        self.__dict__.pop('_cart_total', None)
+
+    def get_priced_items(self):
+        """
+        Cart lines with product/variants loaded and `line_price` annotated,
+        fetched in one query and memoized on this instance
+        """
+        if '_priced_items' not in self.__dict__:
+            self._priced_items = list(
+                self.cart_items.select_related('product', 'color_variant', 'size_variant')
+                .prefetch_related('product__color_variant')
+                .annotate(line_price=CartItem.line_price_expression())
+            )
+        return self._priced_items
 
-        return total_price
+    def get_cart_total(self):
+        if '_cart_total' not in self.__dict__:
+            if '_priced_items' in self.__dict__:
+                self._cart_total = sum(item.line_price for item in self._priced_items)
+            else:
+                self._cart_total = self.cart_items.aggregate(
+                    total=Coalesce(Sum(CartItem.line_price_expression()), 0)
+                )['total']
+        return self._cart_total
 
 
     def get_cart_total_price_after_coupon(self):
@@ -76,7 +104,22 @@ class CartItem(BaseModel):
     size_variant = models.ForeignKey(SizeVariant, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.IntegerField(default=1)
 
+    @staticmethod
+    def line_price_expression():
+        """
+        SQL expression for a line's price, mirroring get_product_price
+        """
+        return (
+            Coalesce(F('product__price'), 0) * F('quantity')
+            + Coalesce(F('color_variant__price'), 0)
+            + Coalesce(F('size_variant__price'), 0)
+        )
+
     def get_product_price(self):
+        # Annotated by Cart.get_priced_items, saving the related lookups
+        if 'line_price' in self.__dict__:
+            return self.line_price
+
         price = self.product.price * self.quantity
 
         if self.color_variant:
@@ -87,6 +130,21 @@ class CartItem(BaseModel):
         
         return price
 
+    def save(self, *args, **kwargs):
+        self.__dict__.pop('line_price', None)
+        super(CartItem, self).save(*args, **kwargs)
+        self._invalidate_cart_pricing()
+
+    def delete(self, *args, **kwargs):
+        result = super(CartItem, self).delete(*args, **kwargs)
+        self._invalidate_cart_pricing()
+        return result
+
+    def _invalidate_cart_pricing(self):
+        cart = self._state.fields_cache.get('cart')
+        if cart is not None:
+            cart.invalidate_pricing()
+
 
 class Order(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
@@ -113,6 +171,13 @@ class OrderItem(BaseModel):
     color_variant = models.ForeignKey(ColorVariant, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.PositiveIntegerField(default=1)
     product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    # Cart line this item was materialized from; makes order creation idempotent
+    cart_item_uid = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'cart_item_uid'], name='unique_order_cart_line'),
+        ]
 
     def __str__(self):
         return f"{self.product.product_name} - {self.quantity}"
@@ -0,0 +1,59 @@
+"""
+Order Materialization
+Turns a paid cart into an Order and its OrderItems in one transaction,
+pricing the cart once and inserting every line with a single bulk_create
+"""
+
+from django.db import IntegrityError, transaction
+from accounts.models import Order, OrderItem
+from accounts.invoices import schedule_invoice
+
+
+class OrderConflict(Exception):
+    """The cart's order id already belongs to another user's order"""
+
+
+@transaction.atomic
+def materialize_order(cart, payment_mode='khalti'):
+    """
+    Create (or complete) the order for a paid cart. Safe to call again for
+    the same cart: existing lines are skipped via the (order, cart line) key.
+    Raises OrderConflict when another user already owns the order id
+    """
+    priced_items = cart.get_priced_items()
+
+    try:
+        order, created = Order.objects.get_or_create(
+            order_id=cart.razorpay_order_id,
+            user=cart.user,
+            defaults={
+                'payment_status': "Paid",
+                'shipping_address': cart.user.profile.shipping_address,
+                'payment_mode': payment_mode,
+                'order_total_price': cart.get_cart_total(),
+                'coupon': cart.coupon,
+                'grand_total': cart.get_cart_total_price_after_coupon(),
+            },
+        )
+    except IntegrityError:
+        # order_id is unique: the only row it can clash with is another user's
+        raise OrderConflict(f'Order {cart.razorpay_order_id} belongs to another user')
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            cart_item_uid=cart_item.uid,
+            product=cart_item.product,
+            size_variant=cart_item.size_variant,
+            color_variant=cart_item.color_variant,
+            quantity=cart_item.quantity,
+            product_price=cart_item.line_price,
+        )
+        for cart_item in priced_items
+    ], ignore_conflicts=True)
+
+    if created:
+        # Runs after commit, so the invoice never sees a half-written order
+        schedule_invoice(order)
+
+    return order
@@ -0,0 +1,243 @@
+"""
+Payment Gateway Clients
+Khalti and eSewa integrations on a shared, pooled HTTP session with timeouts,
+retries and cached payment initiation
+"""
+
+import json
+import hmac
+import base64
+import hashlib
+import threading
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class PaymentGatewayError(Exception):
+    """Raised when a payment gateway cannot be reached or answers badly"""
+
+
+def get_session():
+    """
+    Process-wide requests.Session so TLS connections to the gateways are reused
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Connection failures never reached the gateway and are retried for
+                # every method. 502/503/504 are only retried for GET: behind a proxy
+                # they can arrive after the gateway already processed a POST
+                retry = Retry(
+                    total=settings.PAYMENT_GATEWAY_RETRIES,
+                    connect=settings.PAYMENT_GATEWAY_RETRIES,
+                    read=0,
+                    status=settings.PAYMENT_GATEWAY_RETRIES,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    backoff_factor=0.3,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class GatewayClient:
+    """Thin JSON client for one gateway base URL"""
+
+    def __init__(self, base_url, headers=None, timeout=None):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.headers = headers or {}
+        self.timeout = timeout or settings.PAYMENT_GATEWAY_TIMEOUT
+
+    def post(self, path, data):
+        """
+        POST form data and return (status_code, decoded JSON body)
+        """
+        try:
+            response = get_session().post(
+                self.base_url + path.lstrip('/'),
+                data=data,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise PaymentGatewayError(f'Gateway request failed: {e}') from e
+
+        try:
+            return response.status_code, response.json()
+        except ValueError as e:
+            raise PaymentGatewayError(f'Gateway returned invalid JSON ({response.status_code})') from e
+
+
+class KhaltiPayment:
+    def __init__(self):
+        self.KHALTI_SECRET_KEY = settings.KHALTI_SECRET_KEY
+        self.WEBSITE_URL = settings.PAYMENT_WEBSITE_URL
+        self.SUCCESS_URL = self.WEBSITE_URL + reverse('khalti_success')
+        self.FAILURE_URL = self.WEBSITE_URL + reverse('failure')
+        self.REDIRECT_URL = None  # Will be filled after initiate
+        self.client = GatewayClient(
+            settings.KHALTI_BASE_URL,
+            headers={"Authorization": f"Key {self.KHALTI_SECRET_KEY}"},
+        )
+
+    def _generate_signature(self, user_id, amount, tax_amount):
+        """Encode user/order info safely"""
+        payload = {
+            'user_id': user_id,
+            'amount': amount,
+            'tax_amount': tax_amount,
+            'rand': get_random_string(8)  # Add randomness for safety
+        }
+        json_str = json.dumps(payload)
+        encoded = base64.urlsafe_b64encode(json_str.encode()).decode()
+        return encoded
+
+    def _decode_signature(self, signature):
+        """Decode the unique signature back to original data"""
+        try:
+            decoded_bytes = base64.urlsafe_b64decode(signature.encode())
+            decoded_str = decoded_bytes.decode()
+            payload = json.loads(decoded_str)
+            return payload
+        except Exception:
+            return None
+
+    def initiate_payment(self, user_id, amount=90, tax_amount=10):
+        """Initiate Khalti Payment and return frontend-friendly data"""
+        purchase_order_id = self._generate_signature(user_id, amount, tax_amount)
+        purchase_order_name = "Order for User {}".format(user_id)
+
+        payload = {
+            "return_url": self.SUCCESS_URL,
+            "website_url": self.WEBSITE_URL,
+            "amount": int(amount * 100),  # Convert to paisa
+            "purchase_order_id": purchase_order_id,
+            "purchase_order_name": purchase_order_name,
+        }
+
+        try:
+            status_code, resp_data = self.client.post('epayment/initiate/', payload)
+        except PaymentGatewayError as e:
+            print(f"Error initiating Khalti payment: {e}")
+            status_code, resp_data = None, {'detail': 'Payment gateway is unavailable.'}
+
+        if status_code == 200 and resp_data.get("payment_url"):
+            self.REDIRECT_URL = resp_data["payment_url"]
+            return {
+                'url': self.REDIRECT_URL,
+                'pidx': resp_data.get('pidx'),
+                'button_text': 'Pay with Khalti',
+                'signature': purchase_order_id,
+                'success_url': self.SUCCESS_URL,
+                'failure_url': self.FAILURE_URL,
+                'fields': {}  # Add if you need custom POST fields
+            }
+        else:
+            return {
+                'error': resp_data.get('detail', 'Payment initiation failed.'),
+                'success_url': self.SUCCESS_URL,
+                'failure_url': self.FAILURE_URL
+            }
+
+    def initiate_cart_payment(self, cart, user_id, amount=90, tax_amount=10):
+        """
+        Initiate payment once per (cart, amount): repeat checkouts reuse the
+        cached payment URL until it expires or the amount changes
+        """
+        cache_key = f'khalti:initiation:{cart.uid}:{amount}:{tax_amount}'
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
+
+        result = self.initiate_payment(user_id, amount, tax_amount)
+        if 'error' not in result:
+            cache.set(cache_key, result, settings.KHALTI_INITIATION_CACHE_SECONDS)
+        return result
+
+    def verify_payment(self, pidx):
+        """Verify the payment status"""
+        payload = {
+            "pidx": pidx
+        }
+        try:
+            status_code, resp_data = self.client.post('epayment/lookup/', payload)
+        except PaymentGatewayError as e:
+            print(f"Error verifying Khalti payment: {e}")
+            return {}
+        return resp_data
+
+
+class EsewaPayment:
+    def __init__(self):
+        self.PRODUCT_CODE = "EPAYTEST"
+        self.SUCCESS_URL = settings.PAYMENT_WEBSITE_URL + reverse('success')
+        self.FAILURE_URL = settings.PAYMENT_WEBSITE_URL + reverse('failure')
+        self.SIGNED_FIELDS = "total_amount,transaction_uuid,product_code"
+        self.REDIRECT_URL = settings.ESEWA_FORM_URL
+        self.SECRET_KEY = b"8gBm/:&EnhH.1/q"
+        # replace with your actual eSewa key
+
+    @classmethod
+    def decode_transaction_uuid(self,transaction_uuid: str) -> int:
+        """
+        Extracts the user_id from transaction_uuid of format 'user_id-timestamp'.
+        """
+        try:
+            user_id_str = transaction_uuid.split("-")[0]
+            return int(user_id_str)
+        except (IndexError, ValueError):
+            return None
+
+    def generate_signature(self,total_amount, transaction_uuid, product_code, secret_key):
+        message = f"total_amount={total_amount},transaction_uuid={transaction_uuid},product_code={product_code}"
+        signature = hmac.new(
+            secret_key.encode(), message.encode(), hashlib.sha256
+        ).digest()
+        return base64.b64encode(signature).decode()
+
+    def get_form(self, user_id, amount=90,tax_amount=10):
+        # Derived values
+        total_amount = round(amount + tax_amount, 2)
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        transaction_uuid = f"{user_id}-{timestamp}"
+        signature = self.generate_signature(
+            total_amount=total_amount,
+            transaction_uuid=transaction_uuid,
+            product_code=self.PRODUCT_CODE,
+            secret_key=self.SECRET_KEY.decode()
+        )
+        return {
+            'url': self.REDIRECT_URL,
+            'button_text': 'Pay with eSewa',
+            'signature': signature,
+            'success_url': self.SUCCESS_URL,
+            'failure_url': self.FAILURE_URL,
+            'fields': {
+                "amount": str(amount),
+                "tax_amount": str(tax_amount),
+                "total_amount": str(total_amount),
+                "transaction_uuid": transaction_uuid,
+                "product_code": self.PRODUCT_CODE,
+                "product_service_charge": "0",
+                "product_delivery_charge": "0",
+                "success_url": self.SUCCESS_URL,
+                "failure_url": self.FAILURE_URL,
+                "signed_field_names": self.SIGNED_FIELDS,
+                "signature": signature
+            }
+        }
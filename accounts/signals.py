@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from accounts.models import Profile
+from accounts.models import Profile, Cart, CartItem
+from accounts.context_processors import invalidate_cart_summary
 
 
 @receiver(post_save, sender=User)
@@ -13,3 +14,16 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def refresh_cart_summary(sender, instance, **kwargs):
+    invalidate_cart_summary(instance.user_id)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def refresh_cart_summary_for_item(sender, instance, **kwargs):
+    user_id = Cart.objects.filter(uid=instance.cart_id).values_list('user_id', flat=True).first()
+    invalidate_cart_summary(user_id)
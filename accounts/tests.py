@@ -1,3 +1,118 @@
-from django.test import TestCase
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from accounts.invoices import generate_invoice
+from accounts.models import Cart, CartItem, Order, OrderItem
+from accounts.orders import OrderConflict, materialize_order
+from accounts.payments import KhaltiPayment
+from base.testing import QueryBudgetMixin
+from products.models import Category, Product
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class KhaltiSuccessTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(category_name='Running', slug='running')
+        product = Product.objects.create(
+            product_name='Runner', slug='runner', category=category, price=100, product_desription='Shoe')
+        self.product = product
+        # khalti_checkout ties the cart to the pidx Khalti returned
+        self.cart = Cart.objects.create(user=self.user, razorpay_order_id='pidx-123')
+        CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        self.params = {
+            'pidx': 'pidx-123',
+            'purchase_order_id': KhaltiPayment()._generate_signature(self.user.id, 200, 10),
+        }
+
+    @mock.patch('accounts.views.KhaltiPayment.initiate_payment',
+                return_value={'url': 'https://pay.khalti.com/?pidx=pidx-456', 'pidx': 'pidx-456'})
+    def test_checkout_ties_the_cart_to_the_pidx(self, initiate_payment):
+        self.client.login(username='buyer', password='secret')
+        response = self.client.post(reverse('khalti_checkout'))
+
+        self.assertEqual(response.status_code, 302)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.razorpay_order_id, 'pidx-456')
+
+    @mock.patch('accounts.views.KhaltiPayment.verify_payment', return_value={'status': 'Completed'})
+    def test_replayed_callback_creates_one_order(self, verify_payment):
+        first = self.client.get(reverse('khalti_success'), self.params)
+        # A fresh unpaid cart must not be paid by the replayed callback
+        new_cart = Cart.objects.create(user=self.user)
+        second = self.client.get(reverse('khalti_success'), self.params)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Order.objects.get().order_id, 'pidx-123')
+        self.assertEqual(Order.objects.get().order_items.count(), 1)
+        self.cart.refresh_from_db()
+        new_cart.refresh_from_db()
+        self.assertTrue(self.cart.is_paid)
+        self.assertFalse(new_cart.is_paid)
+
+    @mock.patch('accounts.views.KhaltiPayment.verify_payment', return_value={'status': 'Completed'})
+    def test_pidx_of_another_users_order_is_rejected(self, verify_payment):
+        self.client.get(reverse('khalti_success'), self.params)
+
+        # Another user claims the same pidx through a forged purchase_order_id
+        other = User.objects.create_user(username='other', password='secret')
+        other_cart = Cart.objects.create(user=other, razorpay_order_id='pidx-123')
+        CartItem.objects.create(cart=other_cart, product=self.product, quantity=5)
+        response = self.client.get(reverse('khalti_success'), {
+            'pidx': 'pidx-123',
+            'purchase_order_id': KhaltiPayment()._generate_signature(other.id, 500, 10),
+        })
+
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(list(order.order_items.values_list('quantity', flat=True)), [2])
+        other_cart.refresh_from_db()
+        self.assertFalse(other_cart.is_paid)
+
+    def test_materialize_order_refuses_another_users_order_id(self):
+        other = User.objects.create_user(username='other', password='secret')
+        Order.objects.create(
+            user=other, order_id='pidx-123', payment_status='Paid', payment_mode='khalti',
+            order_total_price=0, grand_total=0)
+
+        with self.assertRaises(OrderConflict):
+            materialize_order(self.cart)
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class CartQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def test_cart(self):
+        user = User.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(category_name='Running', slug='running')
+        cart = Cart.objects.create(user=user)
+        for i in range(5):
+            product = Product.objects.create(
+                product_name=f'Runner {i}', slug=f'runner-{i}', category=category, price=100, product_desription='Shoe')
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        self.client.login(username='buyer', password='secret')
+
+        response = self.assertWithinQueryBudget(reverse('cart'))
+        self.assertEqual(response.status_code, 200)
+
+
+class InvoiceWriteTests(SimpleTestCase):
+    @mock.patch('accounts.invoices.render_invoice', return_value=b'%PDF-1.7 invoice')
+    def test_concurrent_writes_of_one_invoice_do_not_collide(self, render_invoice):
+        order = SimpleNamespace(order_id='pidx-123')
+        with tempfile.TemporaryDirectory() as invoice_root, override_settings(INVOICE_ROOT=invoice_root):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                paths = list(pool.map(lambda _: generate_invoice(order, force=True), range(16)))
+
+            self.assertEqual(set(paths), {os.path.join(invoice_root, 'invoice_pidx-123.pdf')})
+            self.assertEqual(os.listdir(invoice_root), ['invoice_pidx-123.pdf'])
@@ -37,7 +37,8 @@ urlpatterns = [
     path('remove-cart/<uid>/', remove_cart, name="remove_cart"),
     path('remove-coupon/<cart_id>/', remove_coupon, name="remove_coupon"),
 
-    # Success url after payment is done.
+    # Payment initiation and success urls.
+    path('checkout/khalti/', khalti_checkout, name='khalti_checkout'),
     path('success/', success, name="success"),
     path('khalti_success/',khalti_success,name='khalti_success'),
     path('failure/', failure, name="failure"),
@@ -1,22 +1,25 @@
 import os
 import json
 import uuid
-import requests
-from weasyprint import CSS, HTML
 from products.models import *
 from django.urls import reverse
 from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
 from django.http import JsonResponse
 from home.models import ShippingAddress
 from django.contrib.auth.models import User
-from django.template.loader import get_template
 from accounts.models import Profile, Cart, CartItem, Order, OrderItem
+from accounts.invoices import get_invoice, invoice_filename
+from accounts.orders import OrderConflict, materialize_order
+from accounts.payments import KhaltiPayment, EsewaPayment
 from base.emails import send_account_activation_email
+from base.instrumentation import query_budget
+from base.metrics import COMMERCE_LATENCY
 from django.views.decorators.http import require_POST
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, FileResponse
 from django.contrib.auth import authenticate, login, logout
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.shortcuts import redirect, render, get_object_or_404
@@ -25,154 +28,9 @@ from products.models import Product, Category
 from products.forms import ProductForm
 from django.contrib.auth import logout
 from django.conf import settings
-import hmac, hashlib, base64
-from datetime import datetime
-from django.utils.crypto import get_random_string
+import base64
 import time
 
-class KhaltiPayment:
-    def __init__(self):
-        self.KHALTI_SECRET_KEY = settings.KHALTI_SECRET_KEY
-        self.WEBSITE_URL = 'http://127.0.0.1:8000'  # e.g., https://yourdomain.com
-        self.SUCCESS_URL = self.WEBSITE_URL + reverse('khalti_success')
-        self.FAILURE_URL = self.WEBSITE_URL + reverse('failure')
-        self.INITIATE_URL = "https://dev.khalti.com/api/v2/epayment/initiate/"
-        self.LOOKUP_URL = "https://dev.khalti.com/api/v2/epayment/lookup/"
-        self.REDIRECT_URL = None  # Will be filled after initiate
-
-    def _generate_signature(self, user_id, amount, tax_amount):
-        """Encode user/order info safely"""
-        payload = {
-            'user_id': user_id,
-            'amount': amount,
-            'tax_amount': tax_amount,
-            'rand': get_random_string(8)  # Add randomness for safety
-        }
-        json_str = json.dumps(payload)
-        encoded = base64.urlsafe_b64encode(json_str.encode()).decode()
-        return encoded
-
-    def _decode_signature(self, signature):
-        """Decode the unique signature back to original data"""
-        try:
-            decoded_bytes = base64.urlsafe_b64decode(signature.encode())
-            decoded_str = decoded_bytes.decode()
-            payload = json.loads(decoded_str)
-            return payload
-        except Exception:
-            return None
-
-    def initiate_payment(self, user_id, amount=90, tax_amount=10):
-        """Initiate Khalti Payment and return frontend-friendly data"""
-        purchase_order_id = self._generate_signature(user_id, amount, tax_amount)
-        purchase_order_name = "Order for User {}".format(user_id)
-
-        payload = {
-            "return_url": self.SUCCESS_URL,
-            "website_url": self.WEBSITE_URL,
-            "amount": int(amount * 100),  # Convert to paisa
-            "purchase_order_id": purchase_order_id,
-            "purchase_order_name": purchase_order_name,
-        }
-
-        headers = {
-            "Authorization": f"Key {self.KHALTI_SECRET_KEY}"
-        }
-        print(f'payload for khalti initative payment : {payload}')
-        response = requests.post(self.INITIATE_URL, data=payload, headers=headers)
-        resp_data = response.json()
-        print(f'response of payment start : {resp_data}')
-        if response.status_code == 200 and resp_data.get("payment_url"):
-            self.REDIRECT_URL = resp_data["payment_url"]
-            return {
-                'url': self.REDIRECT_URL,
-                'button_text': 'Pay with Khalti',
-                'signature': purchase_order_id,
-                'success_url': self.SUCCESS_URL,
-                'failure_url': self.FAILURE_URL,
-                'fields': {}  # Add if you need custom POST fields
-            }
-        else:
-            return {
-                'error': resp_data.get('detail', 'Payment initiation failed.'),
-                'success_url': self.SUCCESS_URL,
-                'failure_url': self.FAILURE_URL
-            }
-
-    def verify_payment(self, pidx):
-        """Verify the payment status"""
-        headers = {
-            "Authorization": f"Key {self.KHALTI_SECRET_KEY}"
-        }
-        payload = {
-            "pidx": pidx
-        }
-        response = requests.post(self.LOOKUP_URL, data=payload, headers=headers)
-        resp_data = response.json()
-        return resp_data
-
-
-class EsewaPayment:
-    def __init__(self):
-        self.PRODUCT_CODE = "EPAYTEST"
-        self.SUCCESS_URL = "http://127.0.0.1:8000/accounts/success"
-        self.FAILURE_URL = "http://127.0.0.1:8000/accounts/failure"
-        self.SIGNED_FIELDS = "total_amount,transaction_uuid,product_code"
-        self.REDIRECT_URL = 'https://rc-epay.esewa.com.np/api/epay/main/v2/form'
-        self.SECRET_KEY = b"8gBm/:&EnhH.1/q"
-        # replace with your actual eSewa key
-
-    @classmethod
-    def decode_transaction_uuid(self,transaction_uuid: str) -> int:
-        """
-        Extracts the user_id from transaction_uuid of format 'user_id-timestamp'.
-        """
-        try:
-            user_id_str = transaction_uuid.split("-")[0]
-            return int(user_id_str)
-        except (IndexError, ValueError):
-            return None
-
-    def generate_signature(self,total_amount, transaction_uuid, product_code, secret_key):
-        message = f"total_amount={total_amount},transaction_uuid={transaction_uuid},product_code={product_code}"
-        signature = hmac.new(
-            secret_key.encode(), message.encode(), hashlib.sha256
-        ).digest()
-        return base64.b64encode(signature).decode()
-
-    def get_form(self, user_id, amount=90,tax_amount=10):
-        # Derived values
-        total_amount = round(amount + tax_amount, 2)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        transaction_uuid = f"{user_id}-{timestamp}"
-        signature = self.generate_signature(
-            total_amount=total_amount,
-            transaction_uuid=transaction_uuid,
-            product_code=self.PRODUCT_CODE,
-            secret_key=self.SECRET_KEY.decode()
-        )
-        return {
-            'url': self.REDIRECT_URL,
-            'button_text': 'Pay with eSewa',
-            'signature': signature,
-            'success_url': self.SUCCESS_URL,
-            'failure_url': self.FAILURE_URL,
-            'fields': {
-                "amount": str(amount),
-                "tax_amount": str(tax_amount),
-                "total_amount": str(total_amount),
-                "transaction_uuid": transaction_uuid,
-                "product_code": self.PRODUCT_CODE,
-                "product_service_charge": "0",
-                "product_delivery_charge": "0",
-                "success_url": self.SUCCESS_URL,
-                "failure_url": self.FAILURE_URL,
-                "signed_field_names": self.SIGNED_FIELDS,
-                "signature": signature
-            }
-        }
-
-
 # Create your views here.
 
 
@@ -256,6 +114,7 @@ def activate_email_account(request, email_token):
         return HttpResponse('Invalid email token.')
 
 
+@COMMERCE_LATENCY.timed(view='add_to_cart')
 @login_required
 def add_to_cart(request, uid):
     try:
@@ -282,6 +141,8 @@ def add_to_cart(request, uid):
     return redirect(reverse('cart'))
 
 
+@COMMERCE_LATENCY.timed(view='cart')
+@query_budget(15)
 @login_required
 def cart(request):
     cart_obj = None
@@ -289,7 +150,7 @@ def cart(request):
     user = request.user
 
     try:
-        cart_obj = Cart.objects.get(is_paid=False, user=user)
+        cart_obj = Cart.objects.select_related('coupon').get(is_paid=False, user=user)
 
     except Exception as e:
         messages.warning(request, "Your cart is empty. Please add a product to cart.", str(e))
@@ -329,18 +190,13 @@ def cart(request):
             messages.warning(
                 request, 'Total amount in cart is less than the minimum required amount (1.00 INR). Please add a product to the cart.')
             return redirect('index')
-    # lets create payments forms
+    # lets create payments forms; Khalti is initiated only on checkout
     esewa_formddata = {}
-    khalti_formdata = {}
     try:
         esewa = EsewaPayment()
         esewa_formddata=  esewa.get_form(
             user_id=user.id,
         )
-        khalti = KhaltiPayment()
-        khalti_formdata = khalti.initiate_payment(
-            user_id=user.id
-        )
 
     except Exception as e:
         pass
@@ -350,17 +206,39 @@ def cart(request):
         'payment': payment,
         'quantity_range': range(1, 6),
         'payment_method': [esewa_formddata],
-        'khalti_formdata': khalti_formdata,
 
     }
     return render(request, 'accounts/cart.html', context)
 
+
+@COMMERCE_LATENCY.timed(view='khalti_checkout')
+@require_POST
+@login_required
+def khalti_checkout(request):
+    cart_obj = Cart.objects.filter(is_paid=False, user=request.user).first()
+    if not cart_obj:
+        messages.warning(request, "Your cart is empty. Please add a product to cart.")
+        return redirect('index')
+
+    khalti_formdata = KhaltiPayment().initiate_cart_payment(
+        cart_obj, user_id=request.user.id, amount=cart_obj.get_cart_total_price_after_coupon())
+    if khalti_formdata.get('url'):
+        if khalti_formdata.get('pidx'):
+            # The callback pays the cart that was sent to Khalti under this pidx
+            cart_obj.razorpay_order_id = khalti_formdata['pidx']
+            cart_obj.save(update_fields=['razorpay_order_id'])
+        return redirect(khalti_formdata['url'])
+
+    messages.warning(request, khalti_formdata.get('error', 'Payment initiation failed.'))
+    return redirect('cart')
+
 def generate_uid():
     timestamp = int(time.time() * 1000)
     unique_part = uuid.uuid4().hex[:6]  # 6 hex digits from UUID
     return f"{timestamp}{unique_part}"
 
 
+@COMMERCE_LATENCY.timed(view='khalti_success')
 def khalti_success(request):
     pidx = request.GET.get('pidx')
     signature = request.GET.get('purchase_order_id')  # You sent this during initiation
@@ -368,7 +246,7 @@ def khalti_success(request):
     payment = KhaltiPayment()
     decoded_data = payment._decode_signature(signature)
 
-    if not decoded_data:
+    if not decoded_data or not pidx:
         return redirect('cart')
     payment_info = payment.verify_payment(pidx)
 
@@ -376,26 +254,32 @@ def khalti_success(request):
         # Save payment to DB using decoded_data['user_id'], decoded_data['amount'], etc.
         user_id = decoded_data.get('user_id',None)
         if user_id:
-            cart = Cart.objects.filter(user=user_id) #get_object_or_404(Cart, user=user_id)
-            if cart:
-                cart = cart.last()
-                # Mark the cart as paid
-                cart.is_paid = True
-                cart.razorpay_order_id = generate_uid()
-                cart.save()
-                # Create the order after payment is confirmed
-                order = create_order(cart)
-                order_id = order.order_id
-                context = {'order_id': order_id, 'order': order}
-                return render(request, 'payment_success/payment_success.html', context)
-            else:
+            # The cart was tied to Khalti's pidx at checkout, so a replayed or
+            # refreshed callback completes the same order and never pays another cart
+            try:
+                with transaction.atomic():
+                    cart = Cart.objects.select_for_update().filter(razorpay_order_id=pidx, user=user_id).first()
+                    if not cart:
+                        return redirect('cart')
+                    if not cart.is_paid:
+                        # Mark the cart as paid
+                        cart.is_paid = True
+                        cart.razorpay_payment_id = pidx
+                        cart.save()
+                    # Create the order after payment is confirmed
+                    order = create_order(cart)
+            except OrderConflict as e:
+                print(f"Error completing Khalti payment {pidx}: {e}")
                 return redirect('cart')
+            context = {'order_id': order.order_id, 'order': order}
+            return render(request, 'payment_success/payment_success.html', context)
         else:
             return redirect('cart')
     else:
         return redirect('cart')
 
 
+@COMMERCE_LATENCY.timed(view='update_cart_item')
 @require_POST
 @login_required
 def update_cart_item(request):
@@ -413,6 +297,7 @@ def update_cart_item(request):
         return JsonResponse({"success": False, "error": str(e)})
 
 
+@COMMERCE_LATENCY.timed(view='remove_cart')
 def remove_cart(request, uid):
     try:
         cart_item = get_object_or_404(CartItem, uid=uid)
@@ -426,6 +311,7 @@ def remove_cart(request, uid):
     return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
 
 
+@COMMERCE_LATENCY.timed(view='remove_coupon')
 def remove_coupon(request, cart_id):
     cart = Cart.objects.get(uid=cart_id)
     cart.coupon = None
@@ -438,6 +324,7 @@ def failure(request):
     return redirect('cart')
 
 # Payment success view
+@COMMERCE_LATENCY.timed(view='success')
 def success(request):
     data = json.loads(base64.b64decode(request.body))
     transaction_uuid = data["transaction_uuid"]
@@ -455,38 +342,22 @@ def success(request):
     return render(request, 'payment_success/payment_success.html', context)
 
 
-# HTML to PDF Conversion
-def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html = template.render(context_dict)
-
-    static_root = settings.STATIC_ROOT
-    css_files = [
-        os.path.join(static_root, 'css', 'bootstrap.css'),
-        os.path.join(static_root, 'css', 'responsive.css'),
-        os.path.join(static_root, 'css', 'ui.css'),
-    ]
-    css_objects = [CSS(filename=css_file) for css_file in css_files]
-    pdf_file = HTML(string=html).write_pdf(stylesheets=css_objects)
-
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="invoice_{context_dict["order"].order_id}.pdf"'
-    return response
-
-
+# Invoice download (rendered in the background when the order is created)
 def download_invoice(request, order_id):
-    order = Order.objects.filter(order_id=order_id).first()
-    order_items = order.order_items.all()
-
-    context = {
-        'order': order,
-        'order_items': order_items,
-    }
+    order = get_object_or_404(Order, order_id=order_id)
 
-    pdf = render_to_pdf('accounts/order_pdf_generate.html', context)
-    if pdf:
-        return pdf
-    return HttpResponse("Error generating PDF", status=400)
+    try:
+        path = get_invoice(order)
+    except Exception as e:
+        print(f"Error generating invoice for order {order_id}: {e}")
+        return HttpResponse("Error generating PDF", status=400)
+
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=invoice_filename(order.order_id),
+        content_type='application/pdf',
+    )
 
 
 @login_required
@@ -565,30 +436,7 @@ def order_history(request):
 
 # Create an order view
 def create_order(cart,payment_mode='khalti'):
-    order, created = Order.objects.get_or_create(
-        user=cart.user,
-        order_id=cart.razorpay_order_id,
-        payment_status="Paid",
-        shipping_address=cart.user.profile.shipping_address,
-        payment_mode=payment_mode,
-        order_total_price=cart.get_cart_total(),
-        coupon=cart.coupon,
-        grand_total=cart.get_cart_total_price_after_coupon(),
-    )
-
-    # Create OrderItem instances for each item in the cart
-    cart_items = CartItem.objects.filter(cart=cart)
-    for cart_item in cart_items:
-        OrderItem.objects.get_or_create(
-            order=order,
-            product=cart_item.product,
-            size_variant=cart_item.size_variant,
-            color_variant=cart_item.color_variant,
-            quantity=cart_item.quantity,
-            product_price=cart_item.get_product_price()
-        )
-
-    return order
+    return materialize_order(cart, payment_mode)
 
 
 # Order Details view
@@ -0,0 +1,197 @@
+"""
+Query Instrumentation
+Opt-in middleware that records per-view query counts, repeated query
+fingerprints (N+1 patterns), database time and wall time, reports them as
+Server-Timing headers and keeps a rolling in-memory summary per view
+"""
+
+import re
+import time
+import threading
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+
+# Literals are normally parameters already; normalize any that are inlined
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    SQL with literals and IN lists collapsed, so queries that differ only by
+    their parameters share a fingerprint
+    """
+    sql = STRING_LITERAL_RE.sub('?', sql)
+    sql = NUMBER_LITERAL_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may run; the middleware flags requests
+    over budget and QueryBudgetMixin fails tests that exceed it
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    # Follow functools.wraps chains (login_required, require_http_methods, ...)
+    while view_func is not None:
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            return budget
+        view_func = getattr(view_func, '__wrapped__', None)
+    return None
+
+
+class QueryRecorder:
+    """Collects every query run on all database connections while active"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, threshold=2):
+        """
+        Fingerprints run at least `threshold` times, most repeated first
+        """
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+
+class QueryStats:
+    """
+    Rolling per-view samples kept in process memory; each worker process
+    reports only the requests it served
+    """
+
+    def __init__(self, window=200):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def record(self, view_name, sample):
+        with self.lock:
+            self.samples[view_name].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        # numpy is only needed for the dashboard report, not per request
+        import numpy as np
+
+        with self.lock:
+            samples = {view: list(entries) for view, entries in self.samples.items()}
+
+        views = []
+        for view, entries in samples.items():
+            queries = np.array([entry['queries'] for entry in entries])
+            db_ms = np.array([entry['db_ms'] for entry in entries])
+            wall_ms = np.array([entry['wall_ms'] for entry in entries])
+            duplicates = Counter()
+            for entry in entries:
+                for sql, count in entry['duplicates']:
+                    duplicates[sql] = max(duplicates[sql], count)
+            views.append({
+                'view': view,
+                'requests': len(entries),
+                'budget': entries[-1]['budget'],
+                'over_budget': sum(entry['over_budget'] for entry in entries),
+                'mean_queries': round(float(queries.mean()), 1),
+                'max_queries': int(queries.max()),
+                'mean_db_ms': round(float(db_ms.mean()), 2),
+                'p95_db_ms': round(float(np.percentile(db_ms, 95)), 2),
+                'mean_wall_ms': round(float(wall_ms.mean()), 2),
+                'p95_wall_ms': round(float(np.percentile(wall_ms, 95)), 2),
+                'duplicate_queries': [
+                    {'fingerprint': sql, 'max_count': count} for sql, count in duplicates.most_common(5)
+                ],
+            })
+        return sorted(views, key=lambda view: view['mean_queries'], reverse=True)
+
+
+query_stats = QueryStats(getattr(settings, 'QUERY_INSTRUMENTATION_WINDOW', 200))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records queries per request and adds a Server-Timing header:
+    db (count and time), dup (repeated fingerprints) and app (wall time)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.duplicate_threshold = getattr(settings, 'QUERY_DUPLICATE_THRESHOLD', 3)
+
+    def __call__(self, request):
+        request.query_budget = None
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        budget = request.query_budget
+        over_budget = budget is not None and recorder.count > budget
+        query_stats.record(match.view_name or match._func_path, {
+            'queries': recorder.count,
+            'db_ms': recorder.duration_ms,
+            'wall_ms': wall_ms,
+            'duplicates': duplicates[:5],
+            'budget': budget,
+            'over_budget': over_budget,
+        })
+
+        description = f'{recorder.count} queries'
+        if over_budget:
+            description += f' (budget {budget})'
+        timings = [
+            f'db;dur={recorder.duration_ms:.1f};desc="{description}"',
+            f'app;dur={wall_ms:.1f}',
+        ]
+        if duplicates:
+            timings.append(f'dup;desc="{sum(count for _, count in duplicates)} repeated queries"')
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join(([existing] if existing else []) + timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
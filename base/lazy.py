@@ -0,0 +1,48 @@
+"""
+Lazy Imports
+Stand-ins for classes and functions whose modules pull in the ML stack
+(pandas, scikit-learn, scipy, TextBlob); the module is imported on first use
+instead of when the importing module loads
+"""
+
+import importlib
+import threading
+
+
+# Modules that must not be imported just by loading URLs, views or settings
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'textblob', 'nltk')
+
+
+class LazyImport:
+    """
+    Resolves `module_path.name` on first call or attribute access:
+
+        RecommendationService = LazyImport('products.recommendation_engine', 'RecommendationService')
+        RecommendationService().get_recommendations_for_user(user)
+    """
+
+    def __init__(self, module_path, name):
+        self._module_path = module_path
+        self._name = name
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    module = importlib.import_module(self._module_path)
+                    self._target = getattr(module, self._name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._target is not None else 'not loaded'
+        return f'<LazyImport {self._module_path}.{self._name} ({state})>'
@@ -0,0 +1,314 @@
+"""
+Runtime Metrics
+Counters and latency histograms exposed in the Prometheus text format at
+/metrics. With METRICS_MULTIPROC_DIR set, every worker process writes its
+samples to its own mmap'd file and the endpoint sums all files, so the
+numbers cover every gunicorn worker; otherwise samples stay in memory
+"""
+
+import os
+import json
+import mmap
+import glob
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from django.conf import settings
+from django.http import HttpResponse
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+INITIAL_FILE_SIZE = 1024 * 1024
+
+
+class InMemoryValues:
+    """Samples of this process only"""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class MmapValues:
+    """
+    Append-only key/value file: a 4-byte used-size header, then entries of
+    4-byte key length, the UTF-8 key padded to 8 bytes and an 8-byte double.
+    Only the owning process writes; readers parse the file without locking
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a+b')
+        if not exists:
+            self.file.truncate(INITIAL_FILE_SIZE)
+        self.capacity = os.path.getsize(path)
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        if not exists:
+            struct.pack_into('i', self.map, 0, 8)
+        self.used = struct.unpack_from('i', self.map, 0)[0]
+        for key, _, position in self._entries(self.map, self.used):
+            self.positions[key] = position
+
+    @staticmethod
+    def _entries(data, used):
+        offset = 8
+        while offset < used:
+            key_length = struct.unpack_from('i', data, offset)[0]
+            key = bytes(data[offset + 4:offset + 4 + key_length]).decode()
+            offset += 4 + key_length + (-(4 + key_length) % 8)
+            value = struct.unpack_from('d', data, offset)[0]
+            yield key, value, offset
+            offset += 8
+
+    def _add_key(self, key):
+        encoded = key.encode()
+        padding = -(4 + len(encoded)) % 8
+        size = 4 + len(encoded) + padding + 8
+        while self.used + size > self.capacity:
+            self.capacity *= 2
+            self.file.truncate(self.capacity)
+            self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        struct.pack_into(f'i{len(encoded)}s{padding}x', self.map, self.used, len(encoded), encoded)
+        position = self.used + 4 + len(encoded) + padding
+        struct.pack_into('d', self.map, position, 0.0)
+        self.used += size
+        # Publish the entry only after it is fully written
+        struct.pack_into('i', self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self._add_key(key)
+            value = struct.unpack_from('d', self.map, position)[0]
+            struct.pack_into('d', self.map, position, value + amount)
+
+    @classmethod
+    def read_file(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < 8:
+            return []
+        used = struct.unpack_from('i', data, 0)[0]
+        return [(key, value) for key, value, _ in cls._entries(data, used)]
+
+
+_values = None
+_values_pid = None
+_values_lock = threading.Lock()
+
+
+def get_values():
+    """
+    This process's sample store; reopened after fork so each worker owns a file
+    """
+    global _values, _values_pid
+    pid = os.getpid()
+    if _values is None or _values_pid != pid:
+        with _values_lock:
+            if _values is None or _values_pid != pid:
+                directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                    _values = MmapValues(os.path.join(directory, f'metrics_{pid}.db'))
+                else:
+                    _values = InMemoryValues()
+                _values_pid = pid
+    return _values
+
+
+def collect_values():
+    """
+    Samples summed over every process writing to METRICS_MULTIPROC_DIR
+    """
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    if not directory:
+        return dict(get_values().items())
+    totals = {}
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        try:
+            for key, value in MmapValues.read_file(path):
+                totals[key] = totals.get(key, 0.0) + value
+        except Exception as e:
+            print(f"Error reading metrics file {path}: {e}")
+    return totals
+
+
+def _sample_key(name, suffix, labels):
+    return json.dumps([name, suffix, sorted(labels.items())], separators=(',', ':'))
+
+
+REGISTRY = {}
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return {key: str(value) for key, value in labels.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        get_values().inc(_sample_key(self.name, '_total', self._labels(labels)), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        values = get_values()
+        # Buckets are stored per interval and made cumulative at exposition
+        bound = next((b for b in self.buckets if value <= b), '+Inf')
+        values.inc(_sample_key(self.name, '_bucket', dict(labels, le=str(bound))), 1)
+        values.inc(_sample_key(self.name, '_sum', labels), value)
+        values.inc(_sample_key(self.name, '_count', labels), 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """
+        Decorator observing the wrapped function's duration
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def generate_latest():
+    """
+    Prometheus text exposition of every registered metric
+    """
+    samples = {}
+    for key, value in collect_values().items():
+        name, suffix, labels = json.loads(key)
+        samples.setdefault(name, []).append((suffix, [tuple(pair) for pair in labels], value))
+
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        metric_samples = samples.get(name, [])
+        if metric.type == 'counter':
+            for suffix, labels, value in sorted(metric_samples):
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+            continue
+
+        series = {}
+        for suffix, labels, value in metric_samples:
+            base_labels = tuple(pair for pair in labels if pair[0] != 'le')
+            entry = series.setdefault(base_labels, {'buckets': {}, 'sum': 0.0, 'count': 0.0})
+            if suffix == '_bucket':
+                entry['buckets'][dict(labels)['le']] = value
+            elif suffix == '_sum':
+                entry['sum'] = value
+            else:
+                entry['count'] = value
+        for base_labels, entry in sorted(series.items()):
+            cumulative = 0.0
+            for bound in [str(b) for b in metric.buckets] + ['+Inf']:
+                cumulative += entry['buckets'].get(bound, 0.0)
+                labels = sorted(base_labels + (('le', bound),))
+                lines.append(f'{name}_bucket{_format_labels(labels)} {_format_value(cumulative)}')
+            lines.append(f'{name}_sum{_format_labels(base_labels)} {_format_value(entry["sum"])}')
+            lines.append(f'{name}_count{_format_labels(base_labels)} {_format_value(entry["count"])}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; protected by METRICS_TOKEN when it is set
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(generate_latest(), content_type=CONTENT_TYPE)
+
+
+# Application metrics
+RECOMMENDATION_REQUESTS = Counter(
+    'ecomm_recommendation_requests', 'Recommendation requests by strategy', ['strategy'])
+RECOMMENDATION_LATENCY = Histogram(
+    'ecomm_recommendation_request_seconds', 'Recommendation request latency by strategy', ['strategy'])
+CACHE_REQUESTS = Counter(
+    'ecomm_cache_requests', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result'])
+BEHAVIOR_EVENTS = Counter(
+    'ecomm_behavior_events', 'User behavior events recorded by type', ['behavior_type'])
+SENTIMENT_JOBS = Counter(
+    'ecomm_sentiment_jobs', 'Product sentiment analysis jobs by status', ['status'])
+SENTIMENT_JOB_LATENCY = Histogram(
+    'ecomm_sentiment_job_seconds', 'Duration of product sentiment analysis jobs')
+MODEL_FIT_LATENCY = Histogram(
+    'ecomm_model_fit_seconds', 'Recommendation model fit and similarity rebuild durations', ['model'],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0))
+COMMERCE_LATENCY = Histogram(
+    'ecomm_commerce_request_seconds', 'Cart and checkout view latency', ['view'])
+
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def track_recommendation(strategy):
+    """
+    Count and time one recommendation request
+    """
+    RECOMMENDATION_REQUESTS.inc(strategy=strategy)
+    with RECOMMENDATION_LATENCY.time(strategy=strategy):
+        yield
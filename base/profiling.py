@@ -0,0 +1,228 @@
+"""
+Request Profiling
+Staff-triggered profiling of single live requests: a stack-sampling profiler
+(or cProfile) wraps the request and the result is stored as speedscope and
+collapsed-stack files for flamegraphs. Untriggered requests pass straight
+through
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import sysconfig
+import threading
+from collections import Counter
+from datetime import datetime
+from django.conf import settings
+
+
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+class SamplingProfiler:
+    """
+    Samples the profiled thread's Python stack from a background thread
+    every `interval` seconds and counts identical stacks
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def _frame_name(self, frame):
+        code = frame.f_code
+        filename = code.co_filename
+        for root in self._roots:
+            if filename.startswith(root):
+                filename = os.path.relpath(filename, root)
+                break
+        return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        # Project, site-packages and stdlib paths are shortened in frame names
+        paths = sysconfig.get_paths()
+        self._roots = [str(settings.BASE_DIR), paths['purelib'], paths['platlib'], paths['stdlib']]
+        self._target = threading.get_ident()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def collapsed(self):
+        """
+        Brendan Gregg's collapsed format: `frame;frame;frame count` per line
+        """
+        return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def speedscope(self, name):
+        """
+        speedscope 'sampled' profile with sample weights in milliseconds
+        """
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({'name': frame})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': name,
+            'exporter': 'ecomm.profiling',
+        }
+
+
+def profile_dir():
+    path = settings.PROFILE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _profile_basename(request):
+    slug = request.path.strip('/').replace('/', '_') or 'root'
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{request.method.lower()}_{slug[:60]}"
+
+
+def list_profiles():
+    """
+    Stored profiles, newest first
+    """
+    path = settings.PROFILE_DIR
+    if not os.path.isdir(path):
+        return []
+    profiles = []
+    for filename in os.listdir(path):
+        full_path = os.path.join(path, filename)
+        if not os.path.isfile(full_path):
+            continue
+        stat = os.stat(full_path)
+        profiles.append({
+            'name': filename,
+            'size': stat.st_size,
+            'created': datetime.fromtimestamp(stat.st_mtime),
+        })
+    return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+
+def get_profile_path(name):
+    """
+    Absolute path of a stored profile, or None for names outside PROFILE_DIR
+    """
+    path = os.path.realpath(os.path.join(settings.PROFILE_DIR, name))
+    if os.path.dirname(path) != os.path.realpath(settings.PROFILE_DIR) or not os.path.isfile(path):
+        return None
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when a staff user adds ?_profile=1 (or =cprofile) or
+    sends an X-Profile header; the stored file names come back in the
+    X-Profile-Files response header
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _requested_mode(self, request):
+        value = request.GET.get(PROFILE_QUERY_PARAM) or request.META.get(PROFILE_HEADER)
+        if not value:
+            return None
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_staff:
+            return None
+        return value if value in PROFILE_MODES else 'sample'
+
+    def __call__(self, request):
+        # Untriggered requests cost one dict lookup per source
+        if PROFILE_QUERY_PARAM not in request.GET and PROFILE_HEADER not in request.META:
+            return self.get_response(request)
+
+        mode = self._requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        basename = _profile_basename(request)
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            files = self._save_cprofile(profiler, basename)
+        else:
+            profiler = SamplingProfiler(settings.PROFILE_SAMPLE_INTERVAL)
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            files = self._save_samples(profiler, basename, f'{request.method} {request.get_full_path()}')
+
+        response['X-Profile-Files'] = ', '.join(files)
+        return response
+
+    def _save_samples(self, profiler, basename, name):
+        directory = profile_dir()
+        collapsed = f'{basename}.collapsed.txt'
+        speedscope = f'{basename}.speedscope.json'
+        try:
+            with open(os.path.join(directory, collapsed), 'w') as f:
+                f.write(profiler.collapsed())
+            with open(os.path.join(directory, speedscope), 'w') as f:
+                json.dump(profiler.speedscope(name), f)
+        except Exception as e:
+            print(f"Error saving profile: {e}")
+            return []
+        return [collapsed, speedscope]
+
+    def _save_cprofile(self, profiler, basename):
+        directory = profile_dir()
+        stats_file = f'{basename}.prof'
+        summary_file = f'{basename}.cprofile.txt'
+        try:
+            profiler.dump_stats(os.path.join(directory, stats_file))
+            with open(os.path.join(directory, summary_file), 'w') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(60)
+        except Exception as e:
+            print(f"Error saving profile: {e}")
+            return []
+        return [stats_file, summary_file]
@@ -0,0 +1,40 @@
+"""
+Test helpers
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from .instrumentation import fingerprint, get_query_budget
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that fails when a view runs more queries than the budget
+    declared on it with @query_budget
+    """
+
+    def assertWithinQueryBudget(self, path, method='get', budget=None, **request_kwargs):
+        if budget is None:
+            budget = get_query_budget(resolve(path.split('?')[0]).func)
+        if budget is None:
+            self.fail(f'No query budget declared for {path}')
+
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(path, **request_kwargs)
+
+        count = len(captured)
+        if count > budget:
+            fingerprints = {}
+            for query in captured.captured_queries:
+                key = fingerprint(query['sql'])
+                fingerprints[key] = fingerprints.get(key, 0) + 1
+            repeated = '\n'.join(
+                f'  {times}x {sql}' for sql, times in
+                sorted(fingerprints.items(), key=lambda item: item[1], reverse=True) if times > 1
+            )
+            self.fail(
+                f'{path} ran {count} queries, over its budget of {budget}'
+                + (f'\nRepeated queries:\n{repeated}' if repeated else '')
+            )
+        return response
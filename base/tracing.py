@@ -0,0 +1,241 @@
+"""
+Stage Tracing
+Lightweight spans for timing recommendation stages. Spans are no-ops unless a
+trace is active (TracingMiddleware or trace()), and finished traces are
+exported to logs, the Server-Timing header or an OTLP/JSON file
+"""
+
+import os
+import json
+import time
+import logging
+import secrets
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+
+logger = logging.getLogger('ecomm.tracing')
+
+_current_trace = ContextVar('current_trace', default=None)
+_current_span = ContextVar('current_span', default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage with attributes such as candidate counts and cache hits"""
+
+    def __init__(self, trace, name, parent=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1_000_000)
+
+
+class NoopSpan:
+    """Returned when no trace is active so instrumented code costs nothing"""
+
+    def set(self, **attributes):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Trace:
+    """All spans recorded during one request or command"""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+
+    def server_timing(self):
+        """
+        Server-Timing entries with durations summed per stage name
+        """
+        stages = {}
+        for span_ in self.spans:
+            if span_.parent_id is None or span_.duration_ms is None:
+                continue  # The root span duplicates the request's own timing
+            stage = stages.setdefault(span_.name, {'dur': 0.0, 'count': 0, 'attributes': {}})
+            stage['dur'] += span_.duration_ms
+            stage['count'] += 1
+            stage['attributes'].update(span_.attributes)
+
+        entries = []
+        for name, stage in stages.items():
+            details = [f'{key}={value}' for key, value in stage['attributes'].items()
+                       if key in ('candidates', 'results') or key.endswith('cache_hit')]
+            if stage['count'] > 1:
+                details.insert(0, f"calls={stage['count']}")
+            entry = f"{name};dur={stage['dur']:.1f}"
+            if details:
+                entry += f';desc="{" ".join(details)}"'
+            entries.append(entry)
+        return entries
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage of the active trace; usable as a context manager or, via
+    traced(), a decorator. Yields a no-op span when no trace is active
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+
+    current = Span(trace, name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+
+def traced(name=None):
+    """
+    Decorator form of span(); defaults to the function's qualified name
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """
+    Innermost active span (or the no-op span) for adding attributes
+    """
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Record spans for the duration of the block and export them on exit
+    """
+    current = Trace(name)
+    trace_token = _current_trace.set(current)
+    try:
+        with span(name, **attributes):
+            yield current
+    finally:
+        _current_trace.reset(trace_token)
+        export(current)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace):
+    """
+    OpenTelemetry OTLP/JSON ExportTraceServiceRequest for one trace
+    """
+    spans = []
+    for span_ in trace.spans:
+        otlp_span = {
+            'traceId': trace.trace_id,
+            'spanId': span_.span_id,
+            'name': span_.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span_.start_ns),
+            'endTimeUnixNano': str(span_.end_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span_.attributes.items()],
+            'status': {'code': 2, 'message': span_.error} if span_.error else {'code': 1},
+        }
+        if span_.parent_id:
+            otlp_span['parentSpanId'] = span_.parent_id
+        spans.append(otlp_span)
+
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'ecomm'}}]},
+        'scopeSpans': [{'scope': {'name': 'ecomm.tracing'}, 'spans': spans}],
+    }]}
+
+
+def export(trace):
+    """
+    Send a finished trace to the configured exporters; Server-Timing is
+    added by TracingMiddleware itself
+    """
+    exporters = getattr(settings, 'TRACING_EXPORTERS', [])
+    try:
+        if 'log' in exporters:
+            for span_ in sorted(trace.spans, key=lambda s: s.start_ns):
+                logger.info(
+                    'trace=%s span=%s duration_ms=%.2f %s', trace.trace_id, span_.name, span_.duration_ms,
+                    ' '.join(f'{key}={value}' for key, value in span_.attributes.items()),
+                )
+        if 'otlp_json' in exporters:
+            path = settings.TRACING_OTLP_FILE
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            line = json.dumps(to_otlp(trace), separators=(',', ':'))
+            with _export_lock, open(path, 'a') as f:
+                f.write(line + '\n')
+    except Exception as e:
+        print(f"Error exporting trace: {e}")
+
+
+class TracingMiddleware:
+    """
+    Traces each request (when TRACING_EXPORTERS is set) and appends the
+    stage timings to the Server-Timing header
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = 'server_timing' in settings.TRACING_EXPORTERS
+
+    def __call__(self, request):
+        with trace(f'{request.method} {request.path}', **{'http.method': request.method}) as current:
+            response = self.get_response(request)
+            current_span().set(**{'http.status_code': response.status_code})
+        if self.server_timing:
+            entries = current.server_timing()
+            if entries:
+                existing = response.get('Server-Timing')
+                response['Server-Timing'] = ', '.join(([existing] if existing else []) + entries)
+        return response
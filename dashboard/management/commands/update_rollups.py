@@ -0,0 +1,47 @@
+"""
+Django management command to maintain the daily reporting rollups
+Usage: python manage.py update_rollups [--backfill] [--since 2025-01-01]
+Run without options from cron for incremental updates.
+"""
+
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.metrics import DashboardMetricsService
+from dashboard.rollups import RollupService
+
+
+class Command(BaseCommand):
+    help = 'Incrementally update (or backfill) daily behavior and sales rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Recompute every day instead of starting at the watermark',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='Backfill from this date (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        service = RollupService()
+
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            written = service.backfill(since)
+        elif options['backfill']:
+            written = service.backfill()
+        else:
+            written = service.refresh()
+
+        # Sales charts read the rollup, so they are stale now
+        DashboardMetricsService().invalidate('sales')
+
+        for name, count in written.items():
+            self.stdout.write(self.style.SUCCESS(f'{name}: wrote {count} rows'))
@@ -0,0 +1,102 @@
+"""
+Dashboard Metrics Service
+Computes dashboard chart data with grouped aggregate queries and the daily
+sales rollup, caching each section separately; signals and rollup updates
+drop the affected sections and the TTL bounds anything they miss
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from products.models import Category, Product
+from .rollups import RollupService
+
+
+class DashboardMetricsService:
+    """Service class for dashboard chart data"""
+
+    CACHE_PREFIX = 'dashboard:metrics'
+    SECTIONS = ('categories', 'reviews', 'sales')
+
+    def __init__(self):
+        self.timeout = settings.DASHBOARD_METRICS_CACHE_SECONDS
+        self.top_products = settings.DASHBOARD_TOP_PRODUCTS
+
+    def _cached(self, section, compute):
+        """
+        Each section expires on its own, so one stale chart never forces the
+        others to be recomputed
+        """
+        return cache.get_or_set(f'{self.CACHE_PREFIX}:{section}', compute, self.timeout)
+
+    def get_category_metrics(self):
+        """
+        Product count and summed price per category in one GROUP BY query
+        """
+        def compute():
+            rows = Category.objects.annotate(
+                product_count=Count('products'),
+                total_price=Coalesce(Sum('products__price'), 0),
+            ).order_by('category_name').values_list('category_name', 'product_count', 'total_price')
+
+            names, counts, totals = [], [], []
+            for name, product_count, total_price in rows:
+                names.append(name)
+                counts.append(product_count)
+                totals.append(total_price)
+            return {
+                'category_names': names,
+                'products_per_category': counts,
+                'total_price_per_category': totals,
+            }
+
+        return self._cached('categories', compute)
+
+    def get_review_metrics(self):
+        """
+        Review counts of the most-reviewed products, capped so the chart
+        stays readable and the query stays bounded as the catalogue grows
+        """
+        def compute():
+            rows = Product.objects.annotate(
+                review_count=Count('reviews'),
+            ).order_by('-review_count', 'product_name').values_list(
+                'product_name', 'review_count'
+            )[:self.top_products]
+
+            return {
+                'product_names': [name for name, _ in rows],
+                'product_reviews_count': [count for _, count in rows],
+            }
+
+        return self._cached('reviews', compute)
+
+    def get_sales_metrics(self, days=30):
+        """
+        Revenue and units per category from the daily sales rollup
+        """
+        def compute():
+            rows = RollupService().get_category_sales(days)
+            return {
+                'sales_category_names': [row['category_name'] for row in rows],
+                'revenue_per_category': [float(row['revenue']) for row in rows],
+                'units_per_category': [row['units'] for row in rows],
+            }
+
+        return self._cached('sales', compute)
+
+    def get_dashboard_metrics(self):
+        metrics = {}
+        metrics.update(self.get_category_metrics())
+        metrics.update(self.get_review_metrics())
+        metrics.update(self.get_sales_metrics())
+        return metrics
+
+    def invalidate(self, *sections):
+        """
+        Drop the given sections (all when none are given) so the next request
+        recomputes them; called from catalog/review signals and update_rollups
+        """
+        sections = sections or self.SECTIONS
+        cache.delete_many([f'{self.CACHE_PREFIX}:{section}' for section in sections])
@@ -1,3 +1,42 @@
 from django.db import models
+from base.models import BaseModel
+from products.models import Product, Category
 
-# Create your models here.
+
+class DailyProductBehavior(BaseModel):
+    """Rollup of UserBehavior rows per day, product and behavior type"""
+    day = models.DateField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_behaviors')
+    behavior_type = models.CharField(max_length=20)
+    event_count = models.PositiveIntegerField(default=0)
+    total_weight = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = ('day', 'product', 'behavior_type')
+
+    def __str__(self):
+        return f'{self.day} - {self.product.product_name} - {self.behavior_type}: {self.event_count}'
+
+
+class DailyCategorySales(BaseModel):
+    """Rollup of OrderItem revenue and units per day and category"""
+    day = models.DateField(db_index=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    order_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'category')
+
+    def __str__(self):
+        return f'{self.day} - {self.category.category_name}: {self.revenue}'
+
+
+class RollupWatermark(BaseModel):
+    """Last time each rollup was brought up to date"""
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} @ {self.processed_until}'
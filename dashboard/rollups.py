@@ -0,0 +1,150 @@
+"""
+Reporting Rollups
+Maintains daily pre-aggregated behavior and sales tables so dashboards and
+stats APIs never scan the raw UserBehavior/OrderItem tables
+"""
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from accounts.models import OrderItem
+from products.models import UserBehavior
+from .models import DailyProductBehavior, DailyCategorySales, RollupWatermark
+
+
+class RollupService:
+    """Service class for building and reading daily rollup tables"""
+
+    BEHAVIOR = 'daily_product_behavior'
+    SALES = 'daily_category_sales'
+
+    def _start_day(self, name):
+        """
+        First day to recompute: the watermark's day is re-aggregated because
+        it may have been partial when the last run finished
+        """
+        watermark = RollupWatermark.objects.filter(name=name).first()
+        if watermark is None:
+            return None
+        return timezone.localdate(watermark.processed_until)
+
+    def _set_watermark(self, name, processed_until):
+        RollupWatermark.objects.update_or_create(
+            name=name, defaults={'processed_until': processed_until}
+        )
+
+    @transaction.atomic
+    def rebuild_behavior(self, start_day=None):
+        """
+        Recompute DailyProductBehavior for every day from `start_day`
+        (all days when None); returns the number of rows written
+        """
+        started_at = timezone.now()
+        events = UserBehavior.objects.all()
+        existing = DailyProductBehavior.objects.all()
+        if start_day:
+            events = events.filter(timestamp__date__gte=start_day)
+            existing = existing.filter(day__gte=start_day)
+
+        rows = events.annotate(day=TruncDate('timestamp')).values(
+            'day', 'product_id', 'behavior_type'
+        ).annotate(
+            event_count=Count('uid'),
+            total_weight=Coalesce(Sum('weight'), 0.0),
+        ).order_by()
+
+        existing.delete()
+        written = DailyProductBehavior.objects.bulk_create([
+            DailyProductBehavior(**row) for row in rows.iterator(chunk_size=2000)
+        ], batch_size=1000)
+
+        self._set_watermark(self.BEHAVIOR, started_at)
+        return len(written)
+
+    @transaction.atomic
+    def rebuild_sales(self, start_day=None):
+        """
+        Recompute DailyCategorySales for every day from `start_day`
+        (all days when None); returns the number of rows written
+        """
+        started_at = timezone.now()
+        items = OrderItem.objects.filter(product__isnull=False)
+        existing = DailyCategorySales.objects.all()
+        if start_day:
+            items = items.filter(order__order_date__date__gte=start_day)
+            existing = existing.filter(day__gte=start_day)
+
+        rows = items.annotate(
+            day=TruncDate('order__order_date'),
+            category_id=F('product__category_id'),
+        ).values('day', 'category_id').annotate(
+            order_count=Count('order', distinct=True),
+            units=Coalesce(Sum('quantity'), 0),
+            revenue=Coalesce(Sum('product_price'), 0, output_field=DailyCategorySales._meta.get_field('revenue')),
+        ).order_by()
+
+        existing.delete()
+        written = DailyCategorySales.objects.bulk_create([
+            DailyCategorySales(**row) for row in rows.iterator(chunk_size=2000)
+        ], batch_size=1000)
+
+        self._set_watermark(self.SALES, started_at)
+        return len(written)
+
+    def refresh(self):
+        """
+        Incremental run: only days at or after each watermark are recomputed
+        """
+        return {
+            self.BEHAVIOR: self.rebuild_behavior(self._start_day(self.BEHAVIOR)),
+            self.SALES: self.rebuild_sales(self._start_day(self.SALES)),
+        }
+
+    def backfill(self, since=None):
+        """
+        Recompute both rollups from `since` (or from the beginning)
+        """
+        return {
+            self.BEHAVIOR: self.rebuild_behavior(since),
+            self.SALES: self.rebuild_sales(since),
+        }
+
+    def get_watermarks(self):
+        return {
+            watermark.name: watermark.processed_until.isoformat()
+            for watermark in RollupWatermark.objects.all()
+        }
+
+    def get_behavior_totals(self):
+        """
+        Total behaviors, per-type counts and products with any behavior
+        """
+        by_type = {
+            row['behavior_type']: row['count']
+            for row in DailyProductBehavior.objects.values('behavior_type').annotate(
+                count=Sum('event_count')
+            ).order_by()
+        }
+        products_with_behaviors = DailyProductBehavior.objects.values('product_id').distinct().count()
+        return {
+            'total': sum(by_type.values()),
+            'by_type': by_type,
+            'products_with_behaviors': products_with_behaviors,
+        }
+
+    def get_category_sales(self, days=30):
+        """
+        Revenue and units per category over the last `days` days
+        """
+        since = timezone.localdate() - timedelta(days=days - 1)
+        return list(
+            DailyCategorySales.objects.filter(day__gte=since).values(
+                category_name=F('category__category_name')
+            ).annotate(
+                revenue=Sum('revenue'),
+                units=Sum('units'),
+                order_count=Sum('order_count'),
+            ).order_by('category_name')
+        )
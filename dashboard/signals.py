@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product, Category, ProductReview
+from dashboard.metrics import DashboardMetricsService
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_catalog_metrics(sender, instance, **kwargs):
+    DashboardMetricsService().invalidate('categories', 'reviews')
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def refresh_review_metrics(sender, instance, **kwargs):
+    DashboardMetricsService().invalidate('reviews')
@@ -1,3 +1,46 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from dashboard.metrics import DashboardMetricsService
+from products.models import Category, Product, ProductReview
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardMetricsInvalidationTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(category_name='Running', slug='running')
+        self.product = Product.objects.create(
+            product_name='Runner', slug='runner', category=self.category, price=100, product_desription='Shoe')
+
+    def test_catalog_and_review_changes_refresh_cached_charts(self):
+        service = DashboardMetricsService()
+        self.assertEqual(service.get_category_metrics()['products_per_category'], [1])
+        self.assertEqual(service.get_review_metrics()['product_reviews_count'], [0])
+
+        Product.objects.create(
+            product_name='Trail', slug='trail', category=self.category, price=120, product_desription='Shoe')
+        user = User.objects.create_user(username='reviewer', password='secret')
+        ProductReview.objects.create(product=self.product, user=user, stars=5, content='Great')
+
+        self.assertEqual(service.get_category_metrics()['products_per_category'], [2])
+        self.assertEqual(service.get_review_metrics()['product_reviews_count'], [1, 0])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardMetricsAccessTests(TestCase):
+    def test_sales_metrics_are_staff_only(self):
+        url = reverse('dashboard_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.create_user(username='customer', password='secret')
+        self.client.login(username='customer', password='secret')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.create_user(username='staff', password='secret', is_staff=True)
+        self.client.login(username='staff', password='secret')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('revenue_per_category', response.json()['metrics'])
@@ -5,6 +5,10 @@ from uuid import UUID
 
 urlpatterns = [
     path('', views.dashboard_home, name='dashboard'),
+    path('metrics/', views.dashboard_metrics, name='dashboard_metrics'),
+    path('queries/', views.dashboard_query_report, name='dashboard_query_report'),
+    path('profiles/', views.dashboard_profiles, name='dashboard_profiles'),
+    path('profiles/<str:name>/', views.download_profile, name='download_profile'),
     
     # Category routes
     path('dashboard/categories/', categories, name='categories'),
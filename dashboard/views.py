@@ -8,33 +8,61 @@ from .forms import ReviewForm
 
 # dashboard/views.py
 from django.shortcuts import render
+from django.http import JsonResponse, FileResponse, Http404
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from products.models import Category, Product
+from base.instrumentation import query_stats
+from base.profiling import list_profiles, get_profile_path
+from .metrics import DashboardMetricsService
 
 def dashboard_home(request):
-    categories = Category.objects.all()
-    products = Product.objects.all()
-
-    # Pie chart data: Number of products per category
-    category_names = [cat.category_name for cat in categories]
-    products_per_category = [cat.products.count() for cat in categories]
-
-    # Bar chart data: Example - total price sum per category (just for demo)
-    total_price_per_category = [
-        sum(prod.price for prod in cat.products.all()) for cat in categories
-    ]
-
-    # Line chart data: Number of reviews per product
-    product_names = [prod.product_name for prod in products]
-    product_reviews_count = [prod.reviews.count() for prod in products]
-
-    context = {
-        'category_names': category_names,
-        'products_per_category': products_per_category,
-        'total_price_per_category': total_price_per_category,
-        'product_names': product_names,
-        'product_reviews_count': product_reviews_count,
-    }
-    return render(request, 'dashboard/dashboard.html', context)
+    # Chart data is fetched asynchronously from dashboard_metrics
+    return render(request, 'dashboard/dashboard.html')
+
+
+@staff_member_required
+def dashboard_metrics(request):
+    try:
+        metrics = DashboardMetricsService().get_dashboard_metrics()
+        return JsonResponse({'success': True, 'metrics': metrics})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@staff_member_required
+def dashboard_query_report(request):
+    """
+    Rolling per-view query counts and timings from QueryInstrumentationMiddleware
+    (this worker process only); ?reset=1 clears the samples
+    """
+    try:
+        report = query_stats.summary()
+        if request.GET.get('reset'):
+            query_stats.clear()
+        return JsonResponse({
+            'success': True,
+            'enabled': settings.QUERY_INSTRUMENTATION,
+            'views': report,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@staff_member_required
+def dashboard_profiles(request):
+    return render(request, 'dashboard/profile_list.html', {
+        'profiles': list_profiles(),
+        'profiling_enabled': settings.REQUEST_PROFILING,
+    })
+
+
+@staff_member_required
+def download_profile(request, name):
+    path = get_profile_path(name)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
 
 def home(request):
     categories = Category.objects.all()
@@ -117,6 +117,48 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
 ]
 
+# Per-request query counts, N+1 fingerprints and Server-Timing headers (off by default)
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=False, cast=bool)
+if QUERY_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'base.instrumentation.QueryInstrumentationMiddleware')
+# Requests kept per view for the staff report, and repeats that count as N+1
+QUERY_INSTRUMENTATION_WINDOW = config('QUERY_INSTRUMENTATION_WINDOW', default=200, cast=int)
+QUERY_DUPLICATE_THRESHOLD = config('QUERY_DUPLICATE_THRESHOLD', default=3, cast=int)
+# Recommendation stage spans, exported to any of 'log', 'server_timing', 'otlp_json' (comma separated; off when empty)
+TRACING_EXPORTERS = config('TRACING_EXPORTERS', default='', cast=lambda value: [name.strip() for name in value.split(',') if name.strip()])
+if TRACING_EXPORTERS:
+    MIDDLEWARE.insert(0, 'base.tracing.TracingMiddleware')
+# One OTLP/JSON ExportTraceServiceRequest per line
+TRACING_OTLP_FILE = config('TRACING_OTLP_FILE', default=os.path.join(BASE_DIR, 'traces', 'traces.jsonl'))
+# The 'log' exporter writes one line per span to the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'ecomm.tracing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False}},
+}
+# Staff can profile a request with ?_profile=1 (sampling) or ?_profile=cprofile, or an X-Profile header
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=False, cast=bool)
+if REQUEST_PROFILING:
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1, 'base.profiling.ProfilingMiddleware')
+# Profiles are listed in the dashboard; they can contain request data, so keep them outside MEDIA_ROOT
+PROFILE_DIR = config('PROFILE_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+PROFILE_SAMPLE_INTERVAL = config('PROFILE_SAMPLE_INTERVAL', default=0.001, cast=float)
+
+# Runtime metrics at /metrics (Prometheus text format)
+# Directory shared by all gunicorn workers; empty keeps per-process in-memory values.
+# Clear it before the server starts so counters reset with the deployment
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='')
+# When set, scrapes must send "Authorization: Bearer <token>"
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Startup warmup of ML modules, lexicons and catalog indexes, reported at /ready.
+# Run gunicorn with --preload so it happens once before fork and pages stay shared.
+# Only gunicorn, uWSGI and runserver warm up; set WARMUP_SERVER=1 in other servers' environment
+WARMUP_ON_STARTUP = config('WARMUP_ON_STARTUP', default=False, cast=bool)
+# Any of 'ml_modules', 'sentiment_lexicon', 'search_index', 'image_hash_trees', 'factor_models' (comma separated)
+WARMUP_STEPS = config('WARMUP_STEPS', default='ml_modules,sentiment_lexicon,search_index,image_hash_trees,factor_models', cast=lambda value: [name.strip() for name in value.split(',') if name.strip()])
+
 ROOT_URLCONF = 'ecomm.urls'
 
 TEMPLATES = [
@@ -130,6 +172,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.request',
+                'accounts.context_processors.cart_summary',
             ],
         },
     },
@@ -144,7 +187,8 @@ WSGI_APPLICATION = 'ecomm.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Point at a throwaway file to generate synthetic data or run benchmarks
+        'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
     }
 }
 
@@ -230,3 +274,67 @@ SOCIALACCOUNT_LOGIN_ON_GET = True
 
 DEFAULT_DOMAIN = '127.0.0.1:8000'
 DEFAULT_HTTP_PROTOCOL = 'http'
+
+# Recommendation system
+# Top-K search over item factors: 'ivf', 'lsh' or 'brute' (exact scan)
+RECOMMENDER_ANN_INDEX = config('RECOMMENDER_ANN_INDEX', default='ivf')
+RECOMMENDER_ANN_MIN_ITEMS = config('RECOMMENDER_ANN_MIN_ITEMS', default=1000, cast=int)
+# Fitted matrix factorization models saved by update_collaborative_filtering and
+# memory-mapped by web processes (float32 .npy files); empty keeps models unsaved
+FACTOR_MODEL_DIR = config('FACTOR_MODEL_DIR', default='')
+
+# Product search
+# 'sqlite_fts', 'postgres', 'python' (in-process index) or 'auto' to pick by database
+PRODUCT_SEARCH_BACKEND = config('PRODUCT_SEARCH_BACKEND', default='auto')
+PRODUCT_SEARCH_PYTHON_INDEX_TTL = config('PRODUCT_SEARCH_PYTHON_INDEX_TTL', default=300, cast=int)
+# Sidebar facet counts; any catalog change invalidates them immediately
+FACET_CACHE_SECONDS = config('FACET_CACHE_SECONDS', default=300, cast=int)
+# Cursor-paginated listings show a total that is cached per filtered query
+CURSOR_COUNT_CACHE_SECONDS = config('CURSOR_COUNT_CACHE_SECONDS', default=300, cast=int)
+# Shared home page fragments; keyed by catalog version, so product edits show immediately
+HOME_FRAGMENT_CACHE_SECONDS = config('HOME_FRAGMENT_CACHE_SECONDS', default=600, cast=int)
+
+# Review polarity scorer: 'textblob' or 'lexicon' (vectorized, batch-scored)
+SENTIMENT_SCORER = config('SENTIMENT_SCORER', default='textblob')
+# Sentiment trends and insights per product; reviews and analyses invalidate them
+SENTIMENT_CACHE_SECONDS = config('SENTIMENT_CACHE_SECONDS', default=3600, cast=int)
+
+# Product media
+# Max Hamming distance (of 64 bits) at which two product images count as near-duplicates
+IMAGE_DUPLICATE_MAX_DISTANCE = config('IMAGE_DUPLICATE_MAX_DISTANCE', default=6, cast=int)
+# Named widths (px) of generated thumbnails and the format templates serve by default
+IMAGE_DERIVATIVE_SIZES = {'thumb': 160, 'card': 320, 'detail': 640}
+IMAGE_DERIVATIVE_FORMAT = config('IMAGE_DERIVATIVE_FORMAT', default='webp')
+
+# Invoices
+# Rendered PDFs are private, so they live outside MEDIA_ROOT
+INVOICE_ROOT = config('INVOICE_ROOT', default=os.path.join(BASE_DIR, 'invoices'))
+INVOICE_WORKERS = config('INVOICE_WORKERS', default=2, cast=int)
+
+# Cache
+# Cart badges and catalog-versioned fragments are invalidated by signals, which must
+# reach every worker: the default file cache is shared by all processes on the host
+# (use Redis or the database cache across hosts). LocMemCache is per process, so with
+# more than one worker the others keep serving stale entries until they expire
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    }
+}
+# Navbar cart badge; entries are also dropped whenever the cart changes
+CART_SUMMARY_CACHE_SECONDS = config('CART_SUMMARY_CACHE_SECONDS', default=300, cast=int)
+
+# Dashboard charts
+DASHBOARD_METRICS_CACHE_SECONDS = config('DASHBOARD_METRICS_CACHE_SECONDS', default=60, cast=int)
+DASHBOARD_TOP_PRODUCTS = config('DASHBOARD_TOP_PRODUCTS', default=50, cast=int)
+
+# Payment gateways (point the base URLs at a local stub server in development/tests)
+PAYMENT_WEBSITE_URL = config('PAYMENT_WEBSITE_URL', default='http://127.0.0.1:8000')
+KHALTI_BASE_URL = config('KHALTI_BASE_URL', default='https://dev.khalti.com/api/v2/')
+ESEWA_FORM_URL = config('ESEWA_FORM_URL', default='https://rc-epay.esewa.com.np/api/epay/main/v2/form')
+PAYMENT_GATEWAY_TIMEOUT = config('PAYMENT_GATEWAY_TIMEOUT', default=5.0, cast=float)
+PAYMENT_GATEWAY_RETRIES = config('PAYMENT_GATEWAY_RETRIES', default=2, cast=int)
+# Khalti payment links stay valid for 60 minutes
+KHALTI_INITIATION_CACHE_SECONDS = config('KHALTI_INITIATION_CACHE_SECONDS', default=1800, cast=int)
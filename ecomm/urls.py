@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from base.metrics import metrics_view
+from products.warmup import readiness_view
 
 
 urlpatterns = [
@@ -12,6 +14,8 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path("accounts/", include("allauth.urls")),
     path('dashboard/', include('dashboard.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', readiness_view, name='readiness'),
     
 ]
 
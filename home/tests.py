@@ -1,3 +1,54 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from base.testing import QueryBudgetMixin
+from products.models import Category, Product
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductSearchSortTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name='Running', slug='running')
+        now = timezone.now()
+        for days_old, name in ((3, 'Old'), (1, 'New'), (2, 'Middle')):
+            product = Product.objects.create(
+                product_name=name, slug=name.lower(), category=category, price=100, product_desription='Shoe')
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(days=days_old))
+
+    def _names(self, sort):
+        response = self.client.get(reverse('product_search'), {'sort': sort})
+        return [product.product_name for product in response.context['products']]
+
+    def test_oldest_and_newest_sorts(self):
+        self.assertEqual(self._names('oldest'), ['Old', 'Middle', 'New'])
+        self.assertEqual(self._names('newest'), ['New', 'Middle', 'Old'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HomeSentimentFragmentTests(TestCase):
+    def test_cached_fragments_skip_the_sentiment_service(self):
+        self.client.get(reverse('index'))
+        with mock.patch('home.views.SentimentService') as sentiment_service:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        sentiment_service.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HomeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name='Running', slug='running')
+        for i in range(5):
+            Product.objects.create(
+                product_name=f'Runner {i}', slug=f'runner-{i}', category=category, price=100,
+                product_desription='Shoe', is_trending=True)
+
+    def test_index(self):
+        # The first render fills the fragment caches; both must stay in budget
+        self.assertWithinQueryBudget(reverse('index'))
+        self.assertWithinQueryBudget(reverse('index'))
@@ -3,6 +3,7 @@ from home.views import *
 
 urlpatterns = [
     path('', index, name="index"),
+    path('recommendations/', recommended_products, name='home_recommendations'),
     path('search/', product_search, name='product_search'),
     path('contact/', contact, name='contact'),
     path('about/', about, name='about'),
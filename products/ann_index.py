@@ -0,0 +1,296 @@
+"""
+Approximate Nearest Neighbour Index for Matrix Factorization Models
+Provides sub-linear top-K maximum inner product search over item factor vectors
+"""
+
+import numpy as np
+from django.conf import settings
+from .hashing import HashBucketStore
+
+
+def _top_k(scores, limit):
+    """
+    Return indices of the `limit` highest scores, best first
+    """
+    if limit <= 0 or len(scores) == 0:
+        return np.array([], dtype=np.int64)
+
+    if limit >= len(scores):
+        return np.argsort(scores)[::-1]
+
+    top = np.argpartition(scores, -limit)[-limit:]
+    return top[np.argsort(scores[top])[::-1]]
+
+
+def _augment_items(item_vectors):
+    """
+    Map item vectors onto the unit sphere so that inner product ranking
+    becomes cosine ranking (Neyshabur & Srebro "simple LSH" transform)
+    """
+    norms = np.linalg.norm(item_vectors, axis=1)
+    max_norm = norms.max() if len(norms) else 0.0
+    if max_norm == 0:
+        max_norm = 1.0
+
+    scaled = item_vectors / max_norm
+    tail = np.sqrt(np.clip(1.0 - (norms / max_norm) ** 2, 0.0, None))
+    return np.hstack([scaled, tail[:, None]])
+
+
+def _augment_query(query):
+    """
+    Map a query vector into the same space as the augmented items
+    """
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        norm = 1.0
+    return np.append(query / norm, 0.0)
+
+
+class BruteForceIndex:
+    """Exact top-K inner product search, used as the reference path"""
+
+    method = 'brute'
+
+    def __init__(self):
+        self.item_vectors = None
+        self.item_ids = []
+
+    def build(self, item_vectors, item_ids):
+        """
+        Keep the item vectors for exhaustive scoring
+        """
+        self.item_vectors = np.asarray(item_vectors)
+        self.item_ids = list(item_ids)
+        return self
+
+    def search(self, query, limit=10):
+        """
+        Score every item and return the top `limit` (item_id, score) pairs
+        """
+        if self.item_vectors is None:
+            return []
+
+        scores = self.item_vectors @ np.asarray(query)
+        return [(self.item_ids[idx], scores[idx]) for idx in _top_k(scores, limit)]
+
+
+class RandomProjectionLSHIndex:
+    """Random-projection (sign) LSH with multi-probe for inner product search"""
+
+    method = 'lsh'
+    # One hash type per model: ProductHash holds one row per (product, hash_type)
+    hash_type_prefix = 'factor'
+
+    def __init__(self, n_tables=16, n_bits=8, candidate_factor=10, random_state=42):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.candidate_factor = candidate_factor
+        self.random_state = random_state
+        self.item_vectors = None
+        self.item_ids = []
+        self.planes = None
+        self.codes = None
+        self.tables = []
+
+    def build(self, item_vectors, item_ids):
+        """
+        Hash every item into `n_tables` tables of 2**n_bits buckets
+        """
+        self.item_vectors = np.asarray(item_vectors)
+        self.item_ids = list(item_ids)
+
+        augmented = _augment_items(self.item_vectors)
+        rng = np.random.default_rng(self.random_state)
+        self.planes = rng.standard_normal((self.n_tables, augmented.shape[1], self.n_bits))
+
+        self.codes = self._hash(augmented)
+        self.tables = []
+        for table in range(self.n_tables):
+            order = np.argsort(self.codes[:, table], kind='stable')
+            sorted_codes = self.codes[order, table]
+            boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+            buckets = {}
+            for members in np.split(order, boundaries):
+                if len(members):
+                    buckets[int(self.codes[members[0], table])] = members
+            self.tables.append(buckets)
+
+        return self
+
+    def _hash(self, vectors):
+        """
+        Compute one integer bucket code per table for each vector
+        """
+        bits = np.einsum('nd,tdb->ntb', vectors, self.planes) > 0
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        return (bits * weights).sum(axis=2)
+
+    def _candidates(self, query_codes, target):
+        """
+        Collect candidates from matching buckets, probing buckets at Hamming
+        distance one when the exact buckets hold fewer than `target` items
+        """
+        found = [self.tables[t].get(int(code)) for t, code in enumerate(query_codes)]
+        candidates = np.unique(np.concatenate([c for c in found if c is not None] or [np.array([], dtype=np.int64)]))
+
+        if len(candidates) >= target:
+            return candidates
+
+        probes = []
+        for t, code in enumerate(query_codes):
+            for bit in range(self.n_bits):
+                members = self.tables[t].get(int(code) ^ (1 << bit))
+                if members is not None:
+                    probes.append(members)
+
+        if probes:
+            candidates = np.unique(np.concatenate([candidates] + probes))
+        return candidates
+
+    def search(self, query, limit=10):
+        """
+        Return the top `limit` (item_id, score) pairs among LSH candidates
+        """
+        if self.item_vectors is None:
+            return []
+
+        query = np.asarray(query)
+        query_codes = self._hash(_augment_query(query)[None, :])[0]
+        candidates = self._candidates(query_codes, limit * self.candidate_factor)
+
+        # Too few collisions: fall back to the exact path rather than under-fill
+        if len(candidates) < limit:
+            candidates = np.arange(len(self.item_ids))
+
+        scores = self.item_vectors[candidates] @ query
+        return [
+            (self.item_ids[candidates[idx]], scores[idx])
+            for idx in _top_k(scores, limit)
+        ]
+
+    def persist(self, name):
+        """
+        Store bucket assignments in ProductHash/HashBucket so they can be
+        inspected and reused for candidate generation
+        """
+        if self.codes is None:
+            return 0
+
+        metadata = {
+            'index': name,
+            'n_tables': self.n_tables,
+            'n_bits': self.n_bits,
+            'random_state': self.random_state,
+        }
+        product_hashes = {
+            item_id: (
+                '-'.join(f'{int(code):x}' for code in self.codes[i]),
+                [f'{table}:{int(code):x}' for table, code in enumerate(self.codes[i])],
+                metadata,
+            )
+            for i, item_id in enumerate(self.item_ids)
+        }
+        return HashBucketStore().replace(f'{self.hash_type_prefix}_{name}', product_hashes, prefix=f'{name}:')
+
+
+class IVFIndex:
+    """Inverted-file index with a spherical k-means coarse quantizer"""
+
+    method = 'ivf'
+
+    def __init__(self, n_lists=None, n_probe=None, n_iter=10, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.item_vectors = None
+        self.item_ids = []
+        self.centroids = None
+        self.lists = []
+
+    def build(self, item_vectors, item_ids):
+        """
+        Cluster augmented item vectors and build one posting list per cluster
+        """
+        self.item_vectors = np.asarray(item_vectors)
+        self.item_ids = list(item_ids)
+
+        augmented = _augment_items(self.item_vectors)
+        n_items = len(augmented)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_items)))
+        n_lists = min(n_lists, n_items)
+
+        rng = np.random.default_rng(self.random_state)
+        self.centroids = augmented[rng.choice(n_items, n_lists, replace=False)].copy()
+
+        assignments = np.zeros(n_items, dtype=np.int64)
+        for _ in range(self.n_iter):
+            assignments = np.argmax(augmented @ self.centroids.T, axis=1)
+            for cell in range(n_lists):
+                members = augmented[assignments == cell]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    self.centroids[cell] = centroid / norm if norm else centroid
+
+        self.lists = [np.flatnonzero(assignments == cell) for cell in range(n_lists)]
+        return self
+
+    def search(self, query, limit=10):
+        """
+        Scan the `n_probe` closest cells and rank their members exactly
+        """
+        if self.item_vectors is None:
+            return []
+
+        query = np.asarray(query)
+        cell_scores = self.centroids @ _augment_query(query)
+        probe_order = np.argsort(cell_scores)[::-1]
+        n_probe = self.n_probe or max(8, len(self.lists) // 16)
+
+        chunks = []
+        total = 0
+        for probed, cell in enumerate(probe_order):
+            if probed >= n_probe and total >= limit:
+                break
+            chunks.append(self.lists[cell])
+            total += len(self.lists[cell])
+
+        candidates = np.concatenate(chunks) if chunks else np.array([], dtype=np.int64)
+        scores = self.item_vectors[candidates] @ query
+        return [
+            (self.item_ids[candidates[idx]], scores[idx])
+            for idx in _top_k(scores, limit)
+        ]
+
+
+ANN_INDEX_CLASSES = {
+    BruteForceIndex.method: BruteForceIndex,
+    RandomProjectionLSHIndex.method: RandomProjectionLSHIndex,
+    IVFIndex.method: IVFIndex,
+}
+
+
+def build_ann_index(item_vectors, item_ids, method=None):
+    """
+    Build the configured index over item factors. Small catalogues use the
+    exact path because hashing overhead outweighs a full scan there.
+    """
+    method = method or getattr(settings, 'RECOMMENDER_ANN_INDEX', 'ivf')
+    min_items = getattr(settings, 'RECOMMENDER_ANN_MIN_ITEMS', 1000)
+
+    if method not in ANN_INDEX_CLASSES or len(item_ids) < min_items:
+        method = BruteForceIndex.method
+
+    return ANN_INDEX_CLASSES[method]().build(item_vectors, item_ids)
+
+
+def recall_at_k(approximate, exact):
+    """
+    Fraction of the exact top-K item ids recovered by an approximate result
+    """
+    exact_ids = {item_id for item_id, _ in exact}
+    if not exact_ids:
+        return 1.0
+    return len(exact_ids & {item_id for item_id, _ in approximate}) / len(exact_ids)
@@ -11,14 +11,26 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 from django.db.models import Count, Sum
 from .models import Product, UserPreference, UserBehavior
-from .feature_extractor import ContentBasedRecommender
-from .preference_learner import PreferenceService
-from .collaborative_filtering import CollaborativeFilteringService
-from .matrix_factorization import MatrixFactorizationService
-from .sentiment_analyzer import SentimentService
+from .image_derivatives import product_thumbnail_url
+from .search import search_catalog
+from .pagination import paginate
+from dashboard.rollups import RollupService
+from base.instrumentation import query_budget
+from base.metrics import track_recommendation
+from base.lazy import LazyImport
 import json
 
+# ML services load pandas/scikit-learn/scipy/TextBlob on first use, not at URL load
+ContentBasedRecommender = LazyImport('products.feature_extractor', 'ContentBasedRecommender')
+PreferenceService = LazyImport('products.preference_learner', 'PreferenceService')
+CollaborativeFilteringService = LazyImport('products.collaborative_filtering', 'CollaborativeFilteringService')
+MatrixFactorizationService = LazyImport('products.matrix_factorization', 'MatrixFactorizationService')
+SentimentService = LazyImport('products.sentiment_analyzer', 'SentimentService')
+ImageHashingService = LazyImport('products.image_hashing', 'ImageHashingService')
+RecommendationService = LazyImport('products.recommendation_engine', 'RecommendationService')
 
+
+@query_budget(50)
 @login_required
 @require_http_methods(["GET"])
 def get_content_based_recommendations(request):
@@ -31,7 +43,8 @@ def get_content_based_recommendations(request):
         
         # Get recommendations
         recommender = ContentBasedRecommender()
-        recommendations = recommender.get_content_based_recommendations(user, limit)
+        with track_recommendation('content'):
+            recommendations = recommender.get_content_based_recommendations(user, limit)
         
         # Format response
         products_data = []
@@ -44,6 +57,7 @@ def get_content_based_recommendations(request):
                 'category': product.category.category_name,
                 'brand': product.brand.name if product.brand else None,
                 'image_url': product.product_images.first().image.url if product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(product),
                 'rating': product.get_rating(),
                 'review_count': product.reviews.count(),
                 'is_trending': product.is_trending,
@@ -66,6 +80,7 @@ def get_content_based_recommendations(request):
         }, status=500)
 
 
+@query_budget(12)
 @login_required
 @require_http_methods(["GET"])
 def get_user_preferences(request):
@@ -172,7 +187,6 @@ def record_user_behavior(request):
             product = get_object_or_404(Product, uid=product_id)
             
             # Record behavior
-            from .recommendation_engine import RecommendationService
             recommendation_service = RecommendationService()
             recommendation_service.record_user_behavior(
                 user=user,
@@ -208,6 +222,7 @@ def record_user_behavior(request):
         }, status=500)
 
 
+@query_budget(5)
 @require_http_methods(["GET"])
 def get_product_features(request, product_id):
     """
@@ -303,6 +318,7 @@ def get_recommendation_explanation(request, product_id):
         }, status=500)
 
 
+@query_budget(12)
 @require_http_methods(["GET"])
 def get_content_filtering_stats(request):
     """
@@ -314,7 +330,8 @@ def get_content_filtering_stats(request):
         products_with_features = Product.objects.filter(features__isnull=False).distinct().count()
         total_users = User.objects.count()
         users_with_preferences = User.objects.filter(preferences__isnull=False).distinct().count()
-        total_behaviors = UserBehavior.objects.count()
+        rollups = RollupService()
+        total_behaviors = rollups.get_behavior_totals()['total']
         
         # Get feature statistics
         from .models import ProductFeature
@@ -333,7 +350,8 @@ def get_content_filtering_stats(request):
                 'preference_coverage': round(users_with_preferences / total_users * 100, 2) if total_users > 0 else 0
             },
             'behaviors': {
-                'total': total_behaviors
+                'total': total_behaviors,
+                'as_of': rollups.get_watermarks().get(RollupService.BEHAVIOR)
             },
             'features': {
                 'total': total_features,
@@ -367,13 +385,15 @@ def get_collaborative_recommendations(request):
         # Get recommendations based on method
         if method in ['user_based', 'item_based', 'hybrid']:
             collaborative_service = CollaborativeFilteringService()
-            recommendations = collaborative_service.get_collaborative_recommendations(user, method, limit)
+            with track_recommendation(f'collaborative_{method}'):
+                recommendations = collaborative_service.get_collaborative_recommendations(user, method, limit)
         elif method in ['mf', 'svd', 'nmf', 'mf_hybrid']:
             mf_service = MatrixFactorizationService()
-            if method == 'mf_hybrid':
-                recommendations = mf_service.get_hybrid_recommendations(user, limit)
-            else:
-                recommendations = mf_service.get_recommendations(user, method, limit)
+            with track_recommendation(method):
+                if method == 'mf_hybrid':
+                    recommendations = mf_service.get_hybrid_recommendations(user, limit)
+                else:
+                    recommendations = mf_service.get_recommendations(user, method, limit)
         else:
             return JsonResponse({
                 'success': False,
@@ -391,6 +411,7 @@ def get_collaborative_recommendations(request):
                 'category': product.category.category_name,
                 'brand': product.brand.name if product.brand else None,
                 'image_url': product.product_images.first().image.url if product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(product),
                 'rating': product.get_rating(),
                 'review_count': product.reviews.count(),
                 'is_trending': product.is_trending,
@@ -461,7 +482,8 @@ def get_collaborative_similar_products(request, product_id):
         product = get_object_or_404(Product, uid=product_id)
         
         collaborative_service = CollaborativeFilteringService()
-        similar_products = collaborative_service.get_similar_products(product, limit)
+        with track_recommendation('collaborative_similar_products'):
+            similar_products = collaborative_service.get_similar_products(product, limit)
         
         # Format response
         products_data = []
@@ -474,6 +496,7 @@ def get_collaborative_similar_products(request, product_id):
                 'category': similar_product.category.category_name,
                 'brand': similar_product.brand.name if similar_product.brand else None,
                 'image_url': similar_product.product_images.first().image.url if similar_product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(similar_product),
                 'rating': similar_product.get_rating(),
                 'review_count': similar_product.reviews.count(),
                 'similarity_score': similarity_score,
@@ -495,6 +518,88 @@ def get_collaborative_similar_products(request, product_id):
         }, status=500)
 
 
+@require_http_methods(["GET"])
+def get_visually_similar_products(request, product_id):
+    """
+    Get products whose images are perceptually close to the specified product's
+    """
+    try:
+        limit = int(request.GET.get('limit', 10))
+        product = get_object_or_404(Product, uid=product_id)
+        
+        image_service = ImageHashingService()
+        similar_products = image_service.get_visually_similar_products(product, limit)
+        
+        # Format response
+        products_data = []
+        for similar_product, distance in similar_products:
+            products_data.append({
+                'id': str(similar_product.uid),
+                'name': similar_product.product_name,
+                'price': similar_product.price,
+                'discounted_price': float(similar_product.discounted_price) if similar_product.discounted_price else None,
+                'image_url': similar_product.product_images.first().image.url if similar_product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(similar_product),
+                'hamming_distance': distance,
+                'slug': similar_product.slug
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'similar_products': products_data,
+            'count': len(products_data),
+            'product_id': str(product.uid),
+            'product_name': product.product_name
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@query_budget(5)
+@require_http_methods(["GET"])
+def get_products(request):
+    """
+    Catalog listing with the search page's filters, paged by opaque cursor
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+        queryset, _, _, ordering = search_catalog(request.GET)
+        page = paginate(request, queryset.prefetch_related('product_images'), limit, ordering)
+
+        products_data = []
+        for product in page:
+            images = list(product.product_images.all())
+            products_data.append({
+                'id': str(product.uid),
+                'name': product.product_name,
+                'price': product.price,
+                'discounted_price': float(product.discounted_price) if product.discounted_price else None,
+                'discount_percent': product.discount_percent_annotated,
+                'image_url': images[0].image.url if images else None,
+                'slug': product.slug
+            })
+
+        return JsonResponse({
+            'success': True,
+            'products': products_data,
+            'count': len(products_data),
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+            'estimated_count': page.estimated_count
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@query_budget(10)
 @require_http_methods(["GET"])
 def get_collaborative_filtering_stats(request):
     """
@@ -505,13 +610,12 @@ def get_collaborative_filtering_stats(request):
         total_users = User.objects.count()
         users_with_behaviors = User.objects.filter(behaviors__isnull=False).distinct().count()
         total_products = Product.objects.count()
-        products_with_behaviors = Product.objects.filter(user_behaviors__isnull=False).distinct().count()
-        total_behaviors = UserBehavior.objects.count()
         
-        # Get behavior statistics
-        behavior_counts = UserBehavior.objects.values('behavior_type').annotate(
-            count=Count('uid')
-        )
+        # Get behavior statistics from the daily rollups
+        rollups = RollupService()
+        behavior_totals = rollups.get_behavior_totals()
+        products_with_behaviors = behavior_totals['products_with_behaviors']
+        total_behaviors = behavior_totals['total']
         
         # Get similarity statistics
         from .models import UserSimilarity, ProductSimilarity
@@ -531,7 +635,8 @@ def get_collaborative_filtering_stats(request):
             },
             'behaviors': {
                 'total': total_behaviors,
-                'by_type': {item['behavior_type']: item['count'] for item in behavior_counts}
+                'by_type': behavior_totals['by_type'],
+                'as_of': rollups.get_watermarks().get(RollupService.BEHAVIOR)
             },
             'similarities': {
                 'user_similarities': user_similarities,
@@ -551,6 +656,7 @@ def get_collaborative_filtering_stats(request):
         }, status=500)
 
 
+@query_budget(5)
 @require_http_methods(["GET"])
 def get_product_sentiment(request, product_id):
     """
@@ -585,6 +691,7 @@ def get_product_sentiment(request, product_id):
         }, status=500)
 
 
+@query_budget(5)
 @require_http_methods(["GET"])
 def get_sentiment_insights(request, product_id):
     """
@@ -619,6 +726,7 @@ def get_sentiment_insights(request, product_id):
         }, status=500)
 
 
+@query_budget(5)
 @require_http_methods(["GET"])
 def get_top_sentiment_products(request):
     """
@@ -643,6 +751,7 @@ def get_top_sentiment_products(request):
                 'category': product.category.category_name,
                 'brand': product.brand.name if product.brand else None,
                 'image_url': product.product_images.first().image.url if product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(product),
                 'rating': product.get_rating(),
                 'review_count': product.reviews.count(),
                 'sentiment_score': sentiment_data['sentiment_score'] if sentiment_data else 0.0,
@@ -686,6 +795,7 @@ def get_aspect_insights(request):
                 'category': product.category.category_name,
                 'brand': product.brand.name if product.brand else None,
                 'image_url': product.product_images.first().image.url if product.product_images.exists() else None,
+                'thumbnail_url': product_thumbnail_url(product),
                 'sentiment_score': insight['sentiment_score'],
                 'positive_mentions': insight['positive_mentions'],
                 'negative_mentions': insight['negative_mentions'],
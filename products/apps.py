@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        import products.signals
+        from .warmup import should_warm_up, skip_warm_up, warm_up
+        if should_warm_up():
+            warm_up()
+        else:
+            skip_warm_up()
@@ -16,6 +16,9 @@ from .models import (
     Product, UserBehavior, UserSimilarity, ProductSimilarity, 
     UserRating, ProductReview, Category, Brand
 )
+from .hashing import ProductHashingService
+from base.tracing import traced, current_span
+from base.metrics import MODEL_FIT_LATENCY
 
 
 class UserBasedCollaborativeFilter:
@@ -26,6 +29,7 @@ class UserBasedCollaborativeFilter:
         self.min_common_items = 2
         self.max_neighbors = 50
         
+    @traced('collaborative.user_based')
     def get_user_based_recommendations(self, user, limit=10):
         """
         Get user-based collaborative filtering recommendations
@@ -45,6 +49,7 @@ class UserBasedCollaborativeFilter:
             
             # Generate recommendations
             recommendations = self._generate_recommendations(user, similar_users, user_ratings, limit)
+            current_span().set(candidates=len(similar_users), results=len(recommendations))
             
             return recommendations
             
@@ -208,16 +213,10 @@ class UserBasedCollaborativeFilter:
             # Sort by predicted rating
             sorted_predictions = sorted(predictions.items(), key=lambda x: x[1], reverse=True)
             
-            # Get product objects
-            recommended_products = []
-            for product_id, predicted_rating in sorted_predictions[:limit]:
-                try:
-                    product = Product.objects.get(uid=product_id)
-                    recommended_products.append(product)
-                except Product.DoesNotExist:
-                    continue
-            
-            return recommended_products
+            # Get product objects in one query, keeping the prediction order
+            top_ids = [product_id for product_id, _ in sorted_predictions[:limit]]
+            products = Product.objects.in_bulk(top_ids)
+            return [products[product_id] for product_id in top_ids if product_id in products]
             
         except Exception as e:
             print(f"Error generating recommendations: {e}")
@@ -232,6 +231,7 @@ class ItemBasedCollaborativeFilter:
         self.min_common_users = 2
         self.max_similar_items = 20
         
+    @traced('collaborative.item_based')
     def get_item_based_recommendations(self, user, limit=10):
         """
         Get item-based collaborative filtering recommendations
@@ -251,6 +251,7 @@ class ItemBasedCollaborativeFilter:
             
             # Generate recommendations
             recommendations = self._generate_item_recommendations(user, user_ratings, item_similarity, limit)
+            current_span().set(candidates=len(user_ratings), results=len(recommendations))
             
             return recommendations
             
@@ -333,7 +334,7 @@ class ItemBasedCollaborativeFilter:
             ratings = {}
             for behavior in behaviors:
                 rating = self._behavior_to_rating(behavior)
-                ratings[behavior.product.uid] = rating
+                ratings[behavior.product_id] = rating
             
             return ratings
             
@@ -374,16 +375,10 @@ class ItemBasedCollaborativeFilter:
             # Sort by predicted rating
             sorted_predictions = sorted(predictions.items(), key=lambda x: x[1], reverse=True)
             
-            # Get product objects
-            recommended_products = []
-            for product_id, predicted_rating in sorted_predictions[:limit]:
-                try:
-                    product = Product.objects.get(uid=product_id)
-                    recommended_products.append(product)
-                except Product.DoesNotExist:
-                    continue
-            
-            return recommended_products
+            # Get product objects in one query, keeping the prediction order
+            top_ids = [product_id for product_id, _ in sorted_predictions[:limit]]
+            products = Product.objects.in_bulk(top_ids)
+            return [products[product_id] for product_id in top_ids if product_id in products]
             
         except Exception as e:
             print(f"Error generating item recommendations: {e}")
@@ -506,6 +501,7 @@ class CollaborativeFilteringService:
         self.user_based_filter = UserBasedCollaborativeFilter()
         self.item_based_filter = ItemBasedCollaborativeFilter()
     
+    @traced('collaborative.recommend')
     def get_collaborative_recommendations(self, user, method='hybrid', limit=10):
         """
         Get collaborative filtering recommendations
@@ -568,15 +564,26 @@ class CollaborativeFilteringService:
             # Get similarities for the product
             product_similarities = item_similarity.loc[product.uid]
             
+            # Only score products that share an LSH bucket, when buckets exist
+            candidate_ids = set(
+                ProductHashingService().get_candidate_products([product]).values_list('uid', flat=True)
+            )
+            if candidate_ids:
+                product_similarities = product_similarities[product_similarities.index.isin(candidate_ids)]
+            
+            matches = {
+                other_product_id: similarity
+                for other_product_id, similarity in product_similarities.items()
+                if other_product_id != product.uid and similarity > 0.1
+            }
+            products_by_id = Product.objects.in_bulk(list(matches))
+            
             # Sort by similarity
-            similar_products = []
-            for other_product_id, similarity in product_similarities.items():
-                if other_product_id != product.uid and similarity > 0.1:
-                    try:
-                        other_product = Product.objects.get(uid=other_product_id)
-                        similar_products.append((other_product, similarity))
-                    except Product.DoesNotExist:
-                        continue
+            similar_products = [
+                (products_by_id[other_product_id], similarity)
+                for other_product_id, similarity in matches.items()
+                if other_product_id in products_by_id
+            ]
             
             # Sort and return top matches
             similar_products.sort(key=lambda x: x[1], reverse=True)
@@ -586,6 +593,7 @@ class CollaborativeFilteringService:
             print(f"Error finding similar products: {e}")
             return []
     
+    @MODEL_FIT_LATENCY.timed(model='collaborative_similarity')
     def update_similarity_matrices(self):
         """
         Update similarity matrices (can be run periodically)
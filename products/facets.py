@@ -0,0 +1,227 @@
+"""
+Faceted Search Counts
+Builds per-dimension product filters from search parameters and counts how
+many products each facet value would match, one grouped query per dimension,
+cached per normalized filter set and catalog version
+"""
+
+import time
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Q
+from django.utils.dateparse import parse_datetime
+from .models import Product, Brand, Category
+from base.metrics import record_cache_lookup
+
+
+CATALOG_VERSION_KEY = 'facets:catalog_version'
+FLAG_FIELDS = ['is_trending', 'newest_product', 'is_men', 'is_women']
+FILTER_PARAMS = FLAG_FIELDS + [
+    'category', 'brand', 'price_gte', 'price_lte', 'discount_gte',
+    'product_description', 'created_after', 'created_before', 'q',
+]
+# (label, min inclusive, max exclusive); None means unbounded
+PRICE_BUCKETS = [
+    ('Under Rs 1000', None, 1000),
+    ('Rs 1000 - 2500', 1000, 2500),
+    ('Rs 2500 - 5000', 2500, 5000),
+    ('Rs 5000 - 10000', 5000, 10000),
+    ('Rs 10000 & above', 10000, None),
+]
+# "At least N%" thresholds, matching the discount_gte filter
+DISCOUNT_THRESHOLDS = [10, 20, 30, 40, 50]
+
+
+def discount_percent_expression():
+    return ExpressionWrapper(
+        100 * (F('price') - F('discounted_price')) / F('price'),
+        output_field=IntegerField()
+    )
+
+
+def build_product_filters(params):
+    """
+    Q objects per facet dimension from request parameters; 'other' holds the
+    filters that have no facet of their own
+    """
+    def get_list(param):
+        return [value for value in params.getlist(param) if value]
+
+    filters = {}
+
+    for field in FLAG_FIELDS:
+        # Read like normalize(): blank values are ignored and repeats are a set,
+        # so requests sharing a cache key always share a filter
+        values = {value.strip().lower() == 'true' for value in params.getlist(field) if value.strip()}
+        if values:
+            filters[field] = Q(**{f'{field}__in': sorted(values)})
+
+    category_ids = get_list('category')
+    if category_ids:
+        filters['category'] = Q(category_id__in=category_ids)
+
+    brand_ids = get_list('brand')
+    if brand_ids:
+        filters['brand'] = Q(brand_id__in=brand_ids)
+
+    price = Q()
+    if 'price_gte' in params:
+        price &= Q(price__gte=int(params.get('price_gte')))
+    if 'price_lte' in params:
+        price &= Q(price__lte=int(params.get('price_lte')))
+    if price:
+        filters['price'] = price
+
+    if 'discount_gte' in params:
+        try:
+            filters['discount'] = Q(discount_percent_annotated__gte=int(params.get('discount_gte')))
+        except (ValueError, TypeError):
+            pass
+
+    other = Q()
+    if 'product_description' in params:
+        other &= Q(product_desription__icontains=params.get('product_description'))
+    if 'created_after' in params:
+        other &= Q(created_at__gte=parse_datetime(params.get('created_after')))
+    if 'created_before' in params:
+        other &= Q(created_at__lte=parse_datetime(params.get('created_before')))
+    if other:
+        filters['other'] = other
+
+    return filters
+
+
+def combine_filters(filters, exclude=()):
+    combined = Q()
+    for dimension, condition in filters.items():
+        if dimension not in exclude:
+            combined &= condition
+    return combined
+
+
+def _seed_catalog_version():
+    """
+    Start a missing (culled or flushed) version at the current time in
+    nanoseconds: restarting at 1 would revive entries cached under old versions
+    """
+    seed = time.time_ns()
+    cache.add(CATALOG_VERSION_KEY, seed, None)
+    return cache.get(CATALOG_VERSION_KEY, seed)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _seed_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached facet result after a catalog change
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        _seed_catalog_version()
+
+
+class FacetService:
+    """Service class for computing facet counts for a product filter set"""
+
+    def __init__(self):
+        self.cache_timeout = getattr(settings, 'FACET_CACHE_SECONDS', 300)
+
+    def normalize(self, params):
+        """
+        Order-independent tuple of the filter parameters, so equivalent
+        query strings share one cache entry
+        """
+        normalized = []
+        for param in FILTER_PARAMS:
+            values = sorted(value.strip().lower() for value in params.getlist(param) if value.strip())
+            if values:
+                normalized.append((param, tuple(values)))
+        return tuple(normalized)
+
+    def _cache_key(self, params):
+        digest = hashlib.md5(repr(self.normalize(params)).encode()).hexdigest()
+        return f'facets:{get_catalog_version()}:{digest}'
+
+    def _queryset(self, filters, search_ids, exclude):
+        queryset = Product.objects.annotate(discount_percent_annotated=discount_percent_expression())
+        if search_ids is not None:
+            queryset = queryset.filter(pk__in=search_ids)
+        return queryset.filter(combine_filters(filters, exclude)).order_by()
+
+    def _value_counts(self, queryset, field):
+        return {
+            str(row[field]): row['count']
+            for row in queryset.values(field).annotate(count=Count('pk'))
+        }
+
+    def compute(self, filters, search_ids=None):
+        """
+        Facet counts where each dimension ignores its own filter, so the
+        counts show what selecting another value would return
+        """
+        brand_counts = self._value_counts(self._queryset(filters, search_ids, ['brand']), 'brand_id')
+        category_counts = self._value_counts(self._queryset(filters, search_ids, ['category']), 'category_id')
+
+        flags = self._queryset(filters, search_ids, FLAG_FIELDS).aggregate(
+            **{field: Count('pk', filter=Q(**{field: True})) for field in FLAG_FIELDS}
+        )
+
+        price_conditions = {}
+        for index, (label, low, high) in enumerate(PRICE_BUCKETS):
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            price_conditions[f'bucket_{index}'] = Count('pk', filter=condition)
+        price_counts = self._queryset(filters, search_ids, ['price']).aggregate(**price_conditions)
+
+        discount_counts = self._queryset(filters, search_ids, ['discount']).aggregate(**{
+            f'at_least_{threshold}': Count('pk', filter=Q(discount_percent_annotated__gte=threshold))
+            for threshold in DISCOUNT_THRESHOLDS
+        })
+
+        return {
+            'brands': [
+                {'uid': str(brand['uid']), 'name': brand['name'], 'count': brand_counts.get(str(brand['uid']), 0)}
+                for brand in Brand.objects.values('uid', 'name').order_by('name')
+            ],
+            'categories': [
+                {
+                    'uid': str(category['uid']),
+                    'category_name': category['category_name'],
+                    'count': category_counts.get(str(category['uid']), 0),
+                }
+                for category in Category.objects.values('uid', 'category_name').order_by('category_name')
+            ],
+            'flags': flags,
+            'price': [
+                {'label': label, 'min': low, 'max': high, 'count': price_counts[f'bucket_{index}']}
+                for index, (label, low, high) in enumerate(PRICE_BUCKETS)
+            ],
+            'discount': [
+                {'threshold': threshold, 'count': discount_counts[f'at_least_{threshold}']}
+                for threshold in DISCOUNT_THRESHOLDS
+            ],
+        }
+
+    def get_facets(self, params, filters=None, search_ids=None):
+        """
+        Cached facet counts for request parameters
+        """
+        cache_key = self._cache_key(params)
+        facets = cache.get(cache_key)
+        record_cache_lookup('facets', facets is not None)
+        if facets is None:
+            if filters is None:
+                filters = build_product_filters(params)
+            facets = self.compute(filters, search_ids)
+            cache.set(cache_key, facets, self.cache_timeout)
+        return facets
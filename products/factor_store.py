@@ -0,0 +1,195 @@
+"""
+Compact Factor Storage
+Id maps and factor matrices for the matrix factorization models as flat NumPy
+arrays: ids are kept sorted so an id's position (its factor row) is found with
+searchsorted, factors are float32, and a fitted set of models is saved as a
+versioned directory of .npy files that load memory-mapped and shared between
+processes
+"""
+
+import os
+import re
+import json
+import uuid
+import time
+import shutil
+import numpy as np
+
+
+MANIFEST = 'manifest.json'
+VERSION_RE = re.compile(r'^v\d+$')
+# Saved versions kept on disk, the current one included
+KEEP_VERSIONS = 2
+
+
+class IdIndex:
+    """
+    Sorted, unique ids in one array: UUIDs as 16-byte strings, integer ids
+    as int32 (int64 when they do not fit). Position i is row i of the
+    matching factor matrix
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self._ids = None
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = list(ids)
+        if ids and isinstance(ids[0], uuid.UUID):
+            keys = np.array([value.bytes for value in ids], dtype='S16')
+        else:
+            keys = np.asarray(ids, dtype=np.int64)
+            if len(keys) and keys.min() >= np.iinfo(np.int32).min and keys.max() <= np.iinfo(np.int32).max:
+                keys = keys.astype(np.int32)
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            raise ValueError('Ids must be sorted and unique')
+        return cls(keys)
+
+    def _key(self, value):
+        if self.keys.dtype.kind == 'S':
+            if isinstance(value, str):
+                try:
+                    value = uuid.UUID(value)
+                except ValueError:
+                    return None
+            return np.array(value.bytes, dtype='S16') if isinstance(value, uuid.UUID) else None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def position(self, value):
+        """
+        Row of `value`, or None when the id is unknown
+        """
+        key = self._key(value)
+        if key is None:
+            return None
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def id_at(self, position):
+        key = self.keys[position]
+        if self.keys.dtype.kind == 'S':
+            # NumPy drops trailing zero bytes from fixed-width strings
+            return uuid.UUID(bytes=bytes(key).ljust(16, b'\0'))
+        return int(key)
+
+    def ids(self):
+        """
+        Decoded ids in row order, built once and shared by every model's ANN index
+        """
+        if self._ids is None:
+            self._ids = [self.id_at(position) for position in range(len(self.keys))]
+        return self._ids
+
+    def __contains__(self, value):
+        return self.position(value) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def sort_rating_matrix(rating_matrix):
+    """
+    Order rating matrix rows and columns by id so they line up with IdIndex
+    positions; UUID order matches the order of their bytes
+    """
+    if rating_matrix.index.is_monotonic_increasing and rating_matrix.columns.is_monotonic_increasing:
+        return rating_matrix
+    return rating_matrix.sort_index(axis=0).sort_index(axis=1)
+
+
+def compact_factors(factors):
+    return np.ascontiguousarray(factors, dtype=np.float32)
+
+
+def save_factor_models(directory, user_index, item_index, models):
+    """
+    Write the shared id arrays and each model's (user_factors, item_factors)
+    as .npy files in a new version subdirectory, then atomically swap in a
+    manifest naming it: readers see either the old set or the new one, never
+    a mix. Older versions beyond KEEP_VERSIONS are removed
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = {'user_ids': user_index.keys, 'item_ids': item_index.keys}
+    for name, (user_factors, item_factors) in models.items():
+        arrays[f'{name}_user_factors'] = compact_factors(user_factors)
+        arrays[f'{name}_item_factors'] = compact_factors(item_factors)
+
+    version = f'v{time.time_ns()}'
+    version_dir = os.path.join(directory, version)
+    os.makedirs(version_dir)
+    for name, array in arrays.items():
+        with open(os.path.join(version_dir, f'{name}.npy'), 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+
+    manifest = {
+        'version': version,
+        'models': sorted(models),
+        'users': len(user_index),
+        'items': len(item_index),
+        'saved_at': time.time(),
+    }
+    temp_path = os.path.join(directory, f'.{MANIFEST}.{uuid.uuid4().hex}.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, os.path.join(directory, MANIFEST))
+
+    _remove_old_versions(directory, keep=version)
+    return sum(array.nbytes for array in arrays.values())
+
+
+def _remove_old_versions(directory, keep):
+    # The previous version stays for processes that read the old manifest just before the swap
+    versions = sorted(
+        (name for name in os.listdir(directory) if VERSION_RE.match(name)),
+        key=lambda name: int(name[1:]),
+    )
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def manifest_mtime(directory):
+    """
+    Modification time of the saved models' manifest, or None when there are none
+    """
+    try:
+        return os.path.getmtime(os.path.join(directory, MANIFEST))
+    except OSError:
+        return None
+
+
+def load_factor_models(directory, mmap_mode='r'):
+    """
+    Load saved models as (user_index, item_index, {name: (user_factors,
+    item_factors)}); arrays are memory-mapped read-only by default. Raises
+    ValueError when the arrays do not match the manifest's sizes
+    """
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    version_dir = os.path.join(directory, manifest['version'])
+
+    def load(name):
+        return np.load(os.path.join(version_dir, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+
+    user_index = IdIndex(load('user_ids'))
+    item_index = IdIndex(load('item_ids'))
+    models = {
+        name: (load(f'{name}_user_factors'), load(f'{name}_item_factors'))
+        for name in manifest['models']
+    }
+
+    # Rows are matched to ids by position, so any size mismatch would misalign them
+    expected = {'user_ids': (len(user_index), manifest['users']), 'item_ids': (len(item_index), manifest['items'])}
+    for name, (user_factors, item_factors) in models.items():
+        expected[f'{name}_user_factors'] = (user_factors.shape[0], manifest['users'])
+        expected[f'{name}_item_factors'] = (item_factors.shape[0], manifest['items'])
+    mismatched = [f'{name} has {rows} rows, expected {count}' for name, (rows, count) in expected.items() if rows != count]
+    if mismatched:
+        raise ValueError(f"Saved factor models in {version_dir} do not match their manifest: {'; '.join(mismatched)}")
+    return user_index, item_index, models
@@ -5,19 +5,23 @@ Extracts and analyzes product features for recommendation system
 
 import re
 import numpy as np
-from textblob import TextBlob
 from django.db.models import Q, Count, Avg
 from django.utils.text import slugify
 from .models import (
     Product, ProductFeature, Category, Brand, ColorVariant, 
     SizeVariant, ProductReview, UserBehavior
 )
+from .hashing import ProductHashingService
+from .sentiment_scorers import get_scorer
+from base.tracing import traced, current_span
 
 
 class ProductFeatureExtractor:
     """Extract and analyze product features for content-based filtering"""
     
     def __init__(self):
+        self.sentiment_scorer = get_scorer()
+
         # Define feature categories
         self.style_features = [
             'casual', 'formal', 'sporty', 'elegant', 'trendy', 'classic',
@@ -115,8 +119,7 @@ class ProductFeatureExtractor:
                 self._create_feature(product, f"color_{color}", 1.0)
         
         # Sentiment analysis
-        blob = TextBlob(text)
-        sentiment_score = (blob.sentiment.polarity + 1) / 2  # Normalize to 0-1
+        sentiment_score = (self.sentiment_scorer.score(text) + 1) / 2  # Normalize to 0-1
         self._create_feature(product, "sentiment_positive", sentiment_score)
         
         # Text complexity
@@ -395,10 +398,13 @@ class FeatureVectorBuilder:
 class ContentBasedRecommender:
     """Content-based recommendation engine"""
     
-    def __init__(self):
+    def __init__(self, candidate_limit=500):
         self.feature_extractor = ProductFeatureExtractor()
         self.vector_builder = FeatureVectorBuilder()
+        self.hashing_service = ProductHashingService()
+        self.candidate_limit = candidate_limit
     
+    @traced('content.score')
     def get_content_based_recommendations(self, user, limit=10):
         """
         Get content-based recommendations for a user
@@ -410,15 +416,32 @@ class ContentBasedRecommender:
             if not user_preferences:
                 return self._get_popular_products(limit)
             
-            # Get all products
-            products = Product.objects.all()
+            # Score products sharing an LSH bucket with the user's history;
+            # fall back to the whole catalogue until hashes have been built
+            interacted_ids = set(
+                UserBehavior.objects.filter(user=user).values_list('product_id', flat=True)
+            )
+            products = self.hashing_service.get_candidate_products(
+                interacted_ids, limit=self.candidate_limit
+            ) if interacted_ids else Product.objects.none()
+            products = list(products.prefetch_related('features'))
+            if not products:
+                products = Product.objects.prefetch_related('features')
+            
+            owned_ids = set(
+                UserBehavior.objects.filter(
+                    user=user,
+                    behavior_type__in=['purchase', 'cart_add', 'wishlist']
+                ).values_list('product_id', flat=True)
+            )
             
             # Calculate similarity scores
             product_scores = []
+            current_span().set(candidates=len(products))
             
             for product in products:
                 # Skip if user already has this product
-                if self._user_has_product(user, product):
+                if product.uid in owned_ids:
                     continue
                 
                 # Build product feature vector
@@ -435,6 +458,7 @@ class ContentBasedRecommender:
             
             # Return top recommendations
             recommended_products = [product for product, score in product_scores[:limit]]
+            current_span().set(results=len(recommended_products))
             
             return recommended_products
             
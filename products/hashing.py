@@ -0,0 +1,279 @@
+"""
+Locality-Sensitive Hashing for Candidate Generation
+Builds SimHash, MinHash and perceptual hashes into ProductHash/HashBucket rows
+and answers "which products share a bucket with these?" queries
+"""
+
+import re
+import hashlib
+from collections import Counter, defaultdict
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from .models import (
+    Product, UserBehavior, ProductHash, HashBucket, ProductHashBucket
+)
+
+
+HASH_BITS = 64
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _token_hash(token):
+    """
+    Stable 64-bit hash of a token (Python's hash() is salted per process)
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+
+
+def hamming_distance(a, b):
+    """
+    Number of differing bits between two integer hashes
+    """
+    return bin(a ^ b).count('1')
+
+
+def band_keys(value, n_bands=4, bits=HASH_BITS):
+    """
+    Split a fingerprint into bands; two fingerprints within n_bands - 1 bits
+    of each other always share at least one band (pigeonhole)
+    """
+    band_bits = bits // n_bands
+    mask = (1 << band_bits) - 1
+    return [f'{band}:{(value >> (band * band_bits)) & mask:x}' for band in range(n_bands)]
+
+
+class SimHasher:
+    """64-bit SimHash over weighted product text tokens"""
+
+    def __init__(self, n_bands=4):
+        self.n_bands = n_bands
+        self.shifts = np.arange(HASH_BITS, dtype=np.uint64)
+
+    def product_tokens(self, product):
+        """
+        Weighted tokens for a product's name, description, brand and category
+        """
+        text = f'{product.product_name} {product.product_desription}'.lower()
+        tokens = Counter(re.findall(r'[a-z0-9]+', text))
+
+        # Field-tagged tokens so a shared brand/category weighs more than a shared word
+        if product.brand_id:
+            tokens[f'brand:{product.brand.name.lower()}'] += 3
+        tokens[f'category:{product.category.category_name.lower()}'] += 3
+        return tokens
+
+    def hash_tokens(self, tokens):
+        """
+        Compute the SimHash fingerprint of a {token: weight} mapping
+        """
+        if not tokens:
+            return 0
+
+        hashes = np.array([_token_hash(token) for token in tokens], dtype=np.uint64)
+        weights = np.array(list(tokens.values()), dtype=np.float64)
+        bits = ((hashes[:, None] >> self.shifts) & np.uint64(1)).astype(np.int8)
+        votes = (weights[:, None] * (2 * bits - 1)).sum(axis=0)
+        return sum(1 << i for i in np.flatnonzero(votes > 0).tolist())
+
+    def hash_product(self, product):
+        """
+        Return (hash_value, bucket_keys, metadata) for a product
+        """
+        tokens = self.product_tokens(product)
+        fingerprint = self.hash_tokens(tokens)
+        return f'{fingerprint:016x}', band_keys(fingerprint, self.n_bands), {'tokens': len(tokens)}
+
+
+class MinHasher:
+    """MinHash signatures over the set of users who interacted with a product"""
+
+    def __init__(self, num_perm=64, n_bands=16, random_state=42):
+        self.num_perm = num_perm
+        self.n_bands = n_bands
+        self.rows_per_band = num_perm // n_bands
+        rng = np.random.default_rng(random_state)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, members):
+        """
+        MinHash signature (num_perm ints) of a set of hashable members
+        """
+        values = np.array(
+            [_token_hash(str(member)) & MERSENNE_PRIME for member in members],
+            dtype=np.uint64,
+        )
+        permuted = (values[:, None] * self.a + self.b) % np.uint64(MERSENNE_PRIME)
+        return permuted.min(axis=0)
+
+    def hash_members(self, members):
+        """
+        Return (hash_value, bucket_keys, metadata) for a behaviour set
+        """
+        signature = self.signature(members)
+        keys = []
+        for band in range(self.n_bands):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            keys.append(f'{band}:{hashlib.blake2b(rows.tobytes(), digest_size=6).hexdigest()}')
+        return hashlib.blake2b(signature.tobytes(), digest_size=8).hexdigest(), keys, {'members': len(members)}
+
+
+class HashBucketStore:
+    """Bulk persistence of product hashes and their LSH bucket memberships"""
+
+    @transaction.atomic
+    def replace(self, hash_type, product_hashes, prefix=''):
+        """
+        Replace all hashes and buckets of `hash_type` (under `prefix`) with
+        `product_hashes`: {product_id: (hash_value, bucket_keys, metadata)}
+        """
+        HashBucket.objects.filter(hash_type=hash_type, bucket_id__startswith=prefix).delete()
+        if prefix:
+            ProductHash.objects.filter(hash_type=hash_type, product_id__in=list(product_hashes)).delete()
+        else:
+            ProductHash.objects.filter(hash_type=hash_type).delete()
+
+        ProductHash.objects.bulk_create([
+            ProductHash(product_id=product_id, hash_type=hash_type, hash_value=value, hash_metadata=metadata)
+            for product_id, (value, keys, metadata) in product_hashes.items()
+        ], batch_size=1000)
+
+        members_by_key = defaultdict(list)
+        for product_id, (value, keys, metadata) in product_hashes.items():
+            for key in keys:
+                members_by_key[key].append(product_id)
+
+        buckets = []
+        memberships = []
+        for key, product_ids in members_by_key.items():
+            # Singleton buckets can never produce a candidate
+            if len(product_ids) < 2:
+                continue
+            bucket = HashBucket(bucket_id=f'{prefix}{key}', hash_type=hash_type)
+            buckets.append(bucket)
+            memberships.extend(ProductHashBucket(product_id=pid, bucket=bucket) for pid in product_ids)
+
+        HashBucket.objects.bulk_create(buckets, batch_size=1000)
+        ProductHashBucket.objects.bulk_create(memberships, batch_size=1000)
+        return len(buckets)
+
+    @transaction.atomic
+    def upsert(self, hash_type, product_id, value, keys, metadata):
+        """
+        Re-bucket a single product without rebuilding the whole hash type
+        """
+        ProductHash.objects.update_or_create(
+            product_id=product_id,
+            hash_type=hash_type,
+            defaults={'hash_value': value, 'hash_metadata': metadata},
+        )
+        ProductHashBucket.objects.filter(product_id=product_id, bucket__hash_type=hash_type).delete()
+
+        existing = {
+            bucket.bucket_id: bucket
+            for bucket in HashBucket.objects.filter(hash_type=hash_type, bucket_id__in=keys)
+        }
+        missing = [HashBucket(bucket_id=key, hash_type=hash_type) for key in keys if key not in existing]
+        HashBucket.objects.bulk_create(missing)
+        buckets = list(existing.values()) + missing
+
+        ProductHashBucket.objects.bulk_create([
+            ProductHashBucket(product_id=product_id, bucket=bucket) for bucket in buckets
+        ])
+
+
+class ProductHashingService:
+    """Service class for LSH hashing and candidate generation"""
+
+    CONTENT = 'content'
+    BEHAVIOR = 'behavior'
+    IMAGE = 'image'
+
+    def __init__(self):
+        self.simhasher = SimHasher()
+        self.minhasher = MinHasher()
+        self.store = HashBucketStore()
+        self.min_behavior_users = 2
+
+    def build_content_hashes(self):
+        """
+        SimHash every product's text features into content buckets
+        """
+        products = Product.objects.select_related('brand', 'category').only(
+            'uid', 'product_name', 'product_desription', 'brand__name', 'category__category_name'
+        )
+        product_hashes = {
+            product.uid: self.simhasher.hash_product(product)
+            for product in products.iterator(chunk_size=1000)
+        }
+        return self.store.replace(self.CONTENT, product_hashes)
+
+    def build_behavior_hashes(self):
+        """
+        MinHash each product's set of interacting users into behaviour buckets
+        """
+        users_by_product = defaultdict(set)
+        for product_id, user_id in UserBehavior.objects.values_list('product_id', 'user_id').iterator(chunk_size=5000):
+            users_by_product[product_id].add(user_id)
+
+        product_hashes = {
+            product_id: self.minhasher.hash_members(users)
+            for product_id, users in users_by_product.items()
+            if len(users) >= self.min_behavior_users
+        }
+        return self.store.replace(self.BEHAVIOR, product_hashes)
+
+    def build_image_hashes(self, workers=None, batch_size=500):
+        """
+        dHash/pHash product images into image buckets
+        """
+        from .image_hashing import ImageHashingService
+
+        return ImageHashingService().build(workers, batch_size)['buckets']
+
+    def build_all(self):
+        """
+        Rebuild every hash type; returns bucket counts per type
+        """
+        return {
+            self.CONTENT: self.build_content_hashes(),
+            self.BEHAVIOR: self.build_behavior_hashes(),
+            self.IMAGE: self.build_image_hashes(),
+        }
+
+    def index_product(self, product):
+        """
+        Incrementally (re)hash one product's text features
+        """
+        value, keys, metadata = self.simhasher.hash_product(product)
+        self.store.upsert(self.CONTENT, product.uid, value, keys, metadata)
+
+    def get_candidate_products(self, products, hash_types=None, limit=None):
+        """
+        Products sharing at least one bucket with any of `products`, ordered
+        by the number of shared buckets (a cheap similarity proxy)
+        """
+        hash_types = hash_types or [self.CONTENT, self.BEHAVIOR, self.IMAGE]
+        product_ids = [getattr(product, 'uid', product) for product in products]
+
+        bucket_ids = ProductHashBucket.objects.filter(
+            product_id__in=product_ids,
+            bucket__hash_type__in=hash_types,
+        ).values('bucket_id')
+
+        candidates = Product.objects.filter(
+            producthashbucket__bucket_id__in=bucket_ids
+        ).exclude(
+            uid__in=product_ids
+        ).annotate(
+            shared_buckets=Count('producthashbucket')
+        ).order_by('-shared_buckets')
+
+        return candidates[:limit] if limit else candidates
+
+    def get_similar_products(self, product, limit=5):
+        """
+        Products most often co-bucketed with `product`
+        """
+        return list(self.get_candidate_products([product], limit=limit))
@@ -0,0 +1,178 @@
+"""
+Responsive Image Derivatives for Product Media
+Generates fixed-width WebP/JPEG thumbnails of uploaded images and caches them
+on disk under MEDIA_ROOT keyed by a hash of the source file
+"""
+
+import os
+import uuid
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+
+DERIVATIVE_DIR = 'derivatives'
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# name -> (mtime_ns, size, digest); avoids re-reading unchanged sources per render
+_source_digests = {}
+
+
+def get_sizes():
+    """
+    Named derivative widths, e.g. {'thumb': 160, 'card': 320, 'detail': 640}
+    """
+    return getattr(settings, 'IMAGE_DERIVATIVE_SIZES', {'thumb': 160, 'card': 320, 'detail': 640})
+
+
+def get_default_format():
+    return getattr(settings, 'IMAGE_DERIVATIVE_FORMAT', 'webp')
+
+
+def source_digest(path):
+    """
+    Content hash of a source image, memoized on (mtime, size)
+    """
+    stat = os.stat(path)
+    cached = _source_digests.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1 << 20), b''):
+            digest.update(chunk)
+
+    _source_digests[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return _source_digests[path][2]
+
+
+def derivative_name(digest, width, fmt):
+    """
+    Storage name (relative to MEDIA_ROOT) of one derivative
+    """
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}/{width}.{fmt}'
+
+
+def generate_derivatives(path, widths=None, formats=None, force=False):
+    """
+    Write every missing width/format derivative of the image at `path`;
+    returns the number of files written
+    """
+    from PIL import Image, ImageOps
+
+    widths = widths or sorted(set(get_sizes().values()))
+    formats = formats or list(FORMATS)
+    digest = source_digest(path)
+
+    pending = [
+        (width, fmt) for width in widths for fmt in formats
+        if force or not os.path.exists(os.path.join(settings.MEDIA_ROOT, derivative_name(digest, width, fmt)))
+    ]
+    if not pending:
+        return 0
+
+    with Image.open(path) as image:
+        image.draft('RGB', (max(widths), max(widths)))  # Let JPEG decode at reduced size
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        resized = {}
+        for width, fmt in pending:
+            if width not in resized:
+                # Never upscale: narrow sources are re-encoded at their own width
+                target = min(width, image.width)
+                height = max(1, round(image.height * target / image.width))
+                resized[width] = image.resize((target, height), Image.LANCZOS)
+
+            output = resized[width]
+            if fmt == 'jpeg' and output.mode == 'RGBA':
+                background = Image.new('RGB', output.size, (255, 255, 255))
+                background.paste(output, mask=output.split()[3])
+                output = background
+
+            target_path = os.path.join(settings.MEDIA_ROOT, derivative_name(digest, width, fmt))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            # Unique per call: concurrent requests in one process may render the same derivative
+            temp_path = f'{target_path}.{uuid.uuid4().hex}.tmp'
+            pil_format, save_options = FORMATS[fmt]
+            try:
+                output.save(temp_path, pil_format, **save_options)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.replace(temp_path, target_path)  # Atomic, so readers never see partial files
+
+    return len(pending)
+
+
+def _generate_job(args):
+    """
+    Process pool worker: generate derivatives for one source path
+    """
+    path, force = args
+    try:
+        return path, generate_derivatives(path, force=force), None
+    except Exception as e:
+        return path, 0, str(e)
+
+
+def generate_for_paths(paths, workers=None, force=False):
+    """
+    Yield (path, files_written, error) for each source, across a process pool
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = ((path, force) for path in paths)
+    if workers == 1:
+        yield from map(_generate_job, jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_generate_job, jobs, chunksize=16)
+
+
+def derivative_url(image_field, size='card', fmt=None):
+    """
+    URL of the derivative of an ImageField file at a named size, generating
+    it on first use; falls back to the original file on any error
+    """
+    if not image_field:
+        return ''
+
+    fmt = fmt or get_default_format()
+    width = get_sizes().get(size, size)
+    try:
+        path = image_field.path
+        digest = source_digest(path)
+        name = derivative_name(digest, width, fmt)
+        if not os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+            generate_derivatives(path, widths=[width], formats=[fmt])
+        return f'{settings.MEDIA_URL}{name}'
+    except Exception as e:
+        print(f"Error building derivative for {image_field.name}: {e}")
+        return image_field.url
+
+
+def derivative_srcset(image_field, fmt=None):
+    """
+    srcset attribute value covering every configured width
+    """
+    if not image_field:
+        return ''
+    return ', '.join(
+        f'{derivative_url(image_field, width, fmt)} {width}w'
+        for width in sorted(set(get_sizes().values()))
+    )
+
+
+def product_thumbnail_url(product, size='card'):
+    """
+    Derivative URL of a product's first image, or None when it has none
+    """
+    product_image = product.product_images.first()
+    return derivative_url(product_image.image, size) if product_image else None
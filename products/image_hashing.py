@@ -0,0 +1,307 @@
+"""
+Perceptual Image Hashing for Product Images
+Computes dHash/pHash fingerprints in parallel batches and answers Hamming
+distance queries through a BK-tree for near-duplicate and visual similarity search
+"""
+
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.fft import dctn
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .models import Product, ProductImage, ProductHash
+from .hashing import HashBucketStore, band_keys, hamming_distance
+
+
+HASH_TYPE = 'image'
+TREE_TTL_SECONDS = 300
+
+_tree_cache = {}
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash: compare horizontally adjacent pixels of a
+    (hash_size + 1) x hash_size grayscale thumbnail
+    """
+    from PIL import Image
+
+    pixels = np.asarray(
+        image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.int16
+    )
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return sum(1 << i for i in np.flatnonzero(bits).tolist())
+
+
+def phash(image, hash_size=8, highfreq_factor=4):
+    """
+    Perceptual hash: threshold the low-frequency DCT coefficients of a
+    grayscale thumbnail against their median
+    """
+    from PIL import Image
+
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(image.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float64)
+    low_freq = dctn(pixels, norm='ortho')[:hash_size, :hash_size]
+    bits = (low_freq > np.median(low_freq)).flatten()
+    return sum(1 << i for i in np.flatnonzero(bits).tolist())
+
+
+def hash_image_file(path):
+    """
+    Return (dhash, phash) for an image file
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft('L', (64, 64))  # Let JPEG decode at reduced size
+        return dhash(image), phash(image)
+
+
+def _hash_image_job(job):
+    """
+    Process pool worker: hash one (image_uid, product_id, path) job
+    """
+    image_uid, product_id, path = job
+    try:
+        return image_uid, product_id, *hash_image_file(path)
+    except Exception as e:
+        print(f"Error hashing image {path}: {e}")
+        return image_uid, product_id, None, None
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value, item):
+        """
+        Insert an item keyed by its hash value
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """
+        Return (distance, item) pairs within `max_distance`, closest first;
+        the triangle inequality prunes subtrees outside the search radius
+        """
+        if self.root is None:
+            return []
+
+        results = []
+        stack = [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class ImageHashingService:
+    """Service class for image hash computation and lookup"""
+
+    def __init__(self, max_distance=None, n_bands=4):
+        self.max_distance = max_distance if max_distance is not None else getattr(
+            settings, 'IMAGE_DUPLICATE_MAX_DISTANCE', 6
+        )
+        self.n_bands = n_bands
+        self.store = HashBucketStore()
+
+    def _iter_jobs(self, batch_size):
+        """
+        Stream (image_uid, product_id, path) jobs in batches without
+        loading every ProductImage row at once
+        """
+        batch = []
+        images = ProductImage.objects.order_by('product_id').values_list('uid', 'product_id', 'image')
+        for image_uid, product_id, name in images.iterator(chunk_size=batch_size):
+            if not name:
+                continue
+            batch.append((str(image_uid), str(product_id), default_storage.path(name)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def compute_hashes(self, workers=None, batch_size=500):
+        """
+        Yield (image_uid, product_id, dhash, phash) for every product image,
+        hashing each batch across a process pool
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for batch in self._iter_jobs(batch_size):
+                yield from map(_hash_image_job, batch)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in self._iter_jobs(batch_size):
+                chunksize = max(1, len(batch) // (workers * 4))
+                yield from pool.map(_hash_image_job, batch, chunksize=chunksize)
+
+    def _product_hash(self, image_hashes):
+        """
+        Build (hash_value, bucket_keys, metadata) from {image_uid: (dhash, phash)};
+        the first image's dHash is the product's representative hash
+        """
+        keys = set()
+        for dhash_value, _ in image_hashes.values():
+            keys.update(band_keys(dhash_value, self.n_bands))
+
+        primary = next(iter(image_hashes.values()))[0]
+        metadata = {
+            'images': {
+                uid: {'dhash': f'{d:016x}', 'phash': f'{p:016x}'}
+                for uid, (d, p) in image_hashes.items()
+            }
+        }
+        return f'{primary:016x}', sorted(keys), metadata
+
+    def build(self, workers=None, batch_size=500):
+        """
+        Hash every product image and rebuild the image buckets
+        """
+        hashes_by_product = defaultdict(dict)
+        failed = 0
+        for image_uid, product_id, dhash_value, phash_value in self.compute_hashes(workers, batch_size):
+            if dhash_value is None:
+                failed += 1
+                continue
+            hashes_by_product[product_id][image_uid] = (dhash_value, phash_value)
+
+        product_hashes = {
+            product_id: self._product_hash(image_hashes)
+            for product_id, image_hashes in hashes_by_product.items()
+        }
+        bucket_count = self.store.replace(HASH_TYPE, product_hashes)
+        _tree_cache.clear()
+
+        return {
+            'images': sum(len(image_hashes) for image_hashes in hashes_by_product.values()),
+            'products': len(product_hashes),
+            'failed': failed,
+            'buckets': bucket_count,
+        }
+
+    def index_image(self, product_image):
+        """
+        Incrementally hash one newly uploaded image into its product's entry
+        """
+        try:
+            dhash_value, phash_value = hash_image_file(product_image.image.path)
+        except Exception as e:
+            print(f"Error hashing image {product_image.image.name}: {e}")
+            return None
+
+        existing = ProductHash.objects.filter(
+            product_id=product_image.product_id, hash_type=HASH_TYPE
+        ).values_list('hash_metadata', flat=True).first() or {}
+
+        image_hashes = {
+            uid: (int(values['dhash'], 16), int(values['phash'], 16))
+            for uid, values in existing.get('images', {}).items()
+        }
+        image_hashes[str(product_image.uid)] = (dhash_value, phash_value)
+
+        value, keys, metadata = self._product_hash(image_hashes)
+        self.store.upsert(HASH_TYPE, product_image.product_id, value, keys, metadata)
+        _tree_cache.clear()
+        return dhash_value, phash_value
+
+    def get_tree(self, kind='phash'):
+        """
+        BK-tree of (product_id, image_uid) items keyed by `kind` hash,
+        cached per process for TREE_TTL_SECONDS
+        """
+        cached = _tree_cache.get(kind)
+        if cached and time.monotonic() - cached[0] < TREE_TTL_SECONDS:
+            return cached[1]
+
+        tree = BKTree()
+        rows = ProductHash.objects.filter(hash_type=HASH_TYPE).values_list('product_id', 'hash_metadata')
+        for product_id, metadata in rows.iterator(chunk_size=2000):
+            for image_uid, values in metadata.get('images', {}).items():
+                tree.add(int(values[kind], 16), (str(product_id), image_uid))
+
+        _tree_cache[kind] = (time.monotonic(), tree)
+        return tree
+
+    def find_near_duplicates(self, max_distance=None, kind='phash'):
+        """
+        Return (image_uid, other_image_uid, distance) pairs of near-identical
+        images across the catalogue
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        tree = self.get_tree(kind)
+
+        pairs = []
+        rows = ProductHash.objects.filter(hash_type=HASH_TYPE).values_list('hash_metadata', flat=True)
+        for metadata in rows.iterator(chunk_size=2000):
+            for image_uid, values in metadata.get('images', {}).items():
+                for distance, (_, other_uid) in tree.search(int(values[kind], 16), max_distance):
+                    if image_uid < other_uid:
+                        pairs.append((image_uid, other_uid, distance))
+
+        pairs.sort(key=lambda pair: pair[2])
+        return pairs
+
+    def get_visually_similar_products(self, product, limit=10, max_distance=None, kind='phash'):
+        """
+        Products whose images are within `max_distance` bits of any of
+        `product`'s images, as (product, distance) pairs closest first
+        """
+        max_distance = 2 * self.max_distance if max_distance is None else max_distance
+        metadata = ProductHash.objects.filter(
+            product=product, hash_type=HASH_TYPE
+        ).values_list('hash_metadata', flat=True).first()
+        if not metadata:
+            return []
+
+        tree = self.get_tree(kind)
+        best = {}
+        for values in metadata.get('images', {}).values():
+            for distance, (product_id, _) in tree.search(int(values[kind], 16), max_distance):
+                if product_id != str(product.uid) and distance < best.get(product_id, max_distance + 1):
+                    best[product_id] = distance
+
+        ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+        products_by_id = {
+            str(uid): similar_product
+            for uid, similar_product in Product.objects.in_bulk([product_id for product_id, _ in ranked]).items()
+        }
+        return [
+            (products_by_id[product_id], distance)
+            for product_id, distance in ranked
+            if product_id in products_by_id
+        ]
@@ -0,0 +1,132 @@
+"""
+Django management command to benchmark approximate nearest neighbour indexes
+Usage: python manage.py benchmark_ann_index [--source svd] [--items 20000]
+"""
+
+import json
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from products.ann_index import (
+    BruteForceIndex, RandomProjectionLSHIndex, IVFIndex, recall_at_k
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure recall@K and query latency of ANN indexes against brute-force search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            type=str,
+            choices=['synthetic', 'mf', 'svd', 'nmf'],
+            default='synthetic',
+            help='Use random factors or factors from a fitted model',
+        )
+        parser.add_argument('--items', type=int, default=20000, help='Synthetic item count')
+        parser.add_argument('--factors', type=int, default=50, help='Synthetic factor dimension')
+        parser.add_argument('--queries', type=int, default=200, help='Number of query vectors')
+        parser.add_argument('--k', type=int, default=10, help='Top-K size')
+        parser.add_argument(
+            '--persist',
+            action='store_true',
+            help='Store LSH buckets in ProductHash/HashBucket (model sources only)',
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        item_vectors, item_ids, queries = self._load_vectors(options)
+
+        if item_vectors is None:
+            self.stdout.write(self.style.WARNING('No factors available to benchmark'))
+            return
+
+        k = options['k']
+        exact_index = BruteForceIndex().build(item_vectors, item_ids)
+        exact_results = [exact_index.search(q, k) for q in queries]
+
+        results = {
+            'source': options['source'],
+            'items': len(item_ids),
+            'factors': item_vectors.shape[1],
+            'queries': len(queries),
+            'k': k,
+            'indexes': [],
+        }
+
+        for index in [BruteForceIndex(), RandomProjectionLSHIndex(), IVFIndex()]:
+            start = time.perf_counter()
+            index.build(item_vectors, item_ids)
+            build_seconds = time.perf_counter() - start
+
+            latencies = []
+            recalls = []
+            for query, exact in zip(queries, exact_results):
+                start = time.perf_counter()
+                approximate = index.search(query, k)
+                latencies.append(time.perf_counter() - start)
+                recalls.append(recall_at_k(approximate, exact))
+
+            results['indexes'].append({
+                'method': index.method,
+                'build_ms': round(build_seconds * 1000, 2),
+                'p50_query_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+                'p95_query_ms': round(float(np.percentile(latencies, 95)) * 1000, 3),
+                f'recall_at_{k}': round(float(np.mean(recalls)), 4),
+            })
+
+            if options['persist'] and index.method == 'lsh' and options['source'] != 'synthetic':
+                bucket_count = index.persist(options['source'])
+                self.stdout.write(f'Persisted {bucket_count} LSH buckets')
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{results['items']} items x {results['factors']} factors, "
+            f"{results['queries']} queries, k={k}"
+        )
+        for row in results['indexes']:
+            self.stdout.write(
+                f"  {row['method']:<6} build {row['build_ms']:>9.2f} ms  "
+                f"p50 {row['p50_query_ms']:>8.3f} ms  p95 {row['p95_query_ms']:>8.3f} ms  "
+                f"recall@{k} {row[f'recall_at_{k}']:.4f}"
+            )
+
+    def _load_vectors(self, options):
+        """
+        Return (item_vectors, item_ids, query_vectors) for the chosen source
+        """
+        rng = np.random.default_rng(42)
+
+        if options['source'] == 'synthetic':
+            # Clustered factors with skewed norms, like popular items in a fitted model
+            n_items, n_factors = options['items'], options['factors']
+            centers = rng.standard_normal((max(1, n_items // 100), n_factors))
+            item_vectors = centers[rng.integers(0, len(centers), n_items)]
+            item_vectors = item_vectors + 0.5 * rng.standard_normal((n_items, n_factors))
+            item_vectors *= rng.lognormal(0, 0.5, (n_items, 1))
+            queries = centers[rng.integers(0, len(centers), options['queries'])]
+            queries = queries + 0.5 * rng.standard_normal((options['queries'], n_factors))
+            return item_vectors, list(range(n_items)), queries
+
+        from products.matrix_factorization import MatrixFactorizationService
+        service = MatrixFactorizationService()
+        service.create_rating_matrix()
+        if not service.fit_models():
+            return None, None, None
+
+        recommender = {
+            'mf': service.mf_recommender,
+            'svd': service.svd_recommender,
+            'nmf': service.nmf_recommender,
+        }[options['source']]
+
+        if recommender.item_factors is None:
+            return None, None, None
+
+        item_ids = recommender.item_index.ids()
+        user_factors = recommender.user_factors
+        picks = rng.choice(len(user_factors), min(options['queries'], len(user_factors)), replace=False)
+        return recommender.item_factors, item_ids, user_factors[picks]
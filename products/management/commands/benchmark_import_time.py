@@ -0,0 +1,153 @@
+"""
+Django management command to measure startup import time with `python -X importtime`
+and fail when the ML stack (pandas, scikit-learn, scipy, TextBlob) leaks into startup
+Usage: python manage.py benchmark_import_time [--runs 5] [--max-ms 300] [--json]
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from base.lazy import HEAVY_MODULES
+
+
+SETUP = (
+    "import os, django; "
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecomm.settings'); "
+    "django.setup()"
+)
+
+# name -> code run in a fresh interpreter; each target is what a process pays before serving
+TARGETS = {
+    'setup': SETUP,
+    'urls': SETUP + "; import importlib; from django.conf import settings; "
+                    "importlib.import_module(settings.ROOT_URLCONF)",
+    'wsgi': "import ecomm.wsgi",
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into {module: (self_us, cumulative_us)}
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure startup import time per target and check heavy ML modules stay lazy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--targets',
+            nargs='+',
+            choices=list(TARGETS),
+            default=['setup', 'urls'],
+            help='Startup paths to measure (default: setup urls)'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Fresh interpreters per target; the median run is reported (default: 5)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Slowest modules by cumulative time to list (default: 15)'
+        )
+        parser.add_argument(
+            '--max-ms',
+            type=float,
+            default=None,
+            help='Fail when a target\'s median import time exceeds this many milliseconds'
+        )
+        parser.add_argument(
+            '--allow-heavy',
+            action='store_true',
+            help='Report but do not fail when pandas, sklearn, scipy, textblob or nltk load at startup'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print results as JSON'
+        )
+
+    def measure(self, code):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'Import failed:\n{completed.stderr[-2000:]}')
+        return parse_importtime(completed.stderr)
+
+    def run_target(self, name, runs, top):
+        measurements = []
+        for _ in range(runs):
+            modules = self.measure(TARGETS[name])
+            total_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+            measurements.append((total_ms, modules))
+        totals = [total for total, _ in measurements]
+        median_total = statistics.median(totals)
+        _, modules = min(measurements, key=lambda m: abs(m[0] - median_total))
+
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {
+            'target': name,
+            'runs': runs,
+            'median_ms': round(median_total, 1),
+            'min_ms': round(min(totals), 1),
+            'max_ms': round(max(totals), 1),
+            'modules': len(modules),
+            'heavy_modules': sorted(m for m in HEAVY_MODULES if m in modules),
+            'slowest': [
+                {'module': module, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                for module, (self_us, cumulative_us) in slowest
+            ],
+        }
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+
+        results = [self.run_target(name, options['runs'], options['top']) for name in options['targets']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({'python': sys.version.split()[0], 'results': results}, indent=2))
+        else:
+            for result in results:
+                self._write_result(result)
+
+        failures = []
+        for result in results:
+            if result['heavy_modules'] and not options['allow_heavy']:
+                failures.append(f"{result['target']} imports {', '.join(result['heavy_modules'])}")
+            if options['max_ms'] is not None and result['median_ms'] > options['max_ms']:
+                failures.append(f"{result['target']} took {result['median_ms']}ms (limit {options['max_ms']}ms)")
+        if failures:
+            raise CommandError('Import time regression: ' + '; '.join(failures))
+
+    def _write_result(self, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['target']}: median {result['median_ms']}ms "
+            f"(min {result['min_ms']}, max {result['max_ms']}) over {result['runs']} runs, "
+            f"{result['modules']} modules"
+        ))
+        if result['heavy_modules']:
+            self.stdout.write(self.style.WARNING(f"  heavy modules loaded: {', '.join(result['heavy_modules'])}"))
+        self.stdout.write(f"  {'cumulative ms':>14} {'self ms':>9}  module")
+        for entry in result['slowest']:
+            self.stdout.write(f"  {entry['cumulative_ms']:>14} {entry['self_ms']:>9}  {entry['module']}")
@@ -0,0 +1,234 @@
+"""
+Django management command to benchmark every recommender path on the current database
+Usage: SQLITE_PATH=/tmp/bench.sqlite3 python manage.py benchmark_recommenders [--engines similarity hybrid_engine] [--output results.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from products.models import Product, ProductReview, UserBehavior
+
+
+def _fit_similarity():
+    from products.similarity_calculator import SimilarityService
+    service = SimilarityService()
+    service.calculator.calculate_product_similarities(force_recalculate=True)
+    return service
+
+
+def _fit_collaborative():
+    from products.collaborative_filtering import CollaborativeFilteringService
+    service = CollaborativeFilteringService()
+    service.update_similarity_matrices()
+    return service
+
+
+def _fit_matrix_factorization():
+    from products.matrix_factorization import MatrixFactorizationService
+    service = MatrixFactorizationService()
+    service.create_rating_matrix()
+    service.fit_models()
+    return service
+
+
+def _fit_hybrid_engine():
+    from products.recommendation_engine import RecommendationEngine
+    return RecommendationEngine()
+
+
+def _fit_sentiment():
+    from products.sentiment_analyzer import SentimentService
+    service = SentimentService()
+    service.analyze_all_products_sentiment(force_recalculate=True)
+    return service
+
+
+# name -> (fit, query, subject); query(state, subject_object) serves one request
+ENGINES = {
+    'similarity': (_fit_similarity, lambda service, product: service.get_similar_products(product, 10), 'product'),
+    'collaborative': (_fit_collaborative, lambda service, user: service.get_collaborative_recommendations(user, 'hybrid', 10), 'user'),
+    'matrix_factorization': (_fit_matrix_factorization, lambda service, user: service.get_hybrid_recommendations(user, 10), 'user'),
+    'hybrid_engine': (_fit_hybrid_engine, lambda engine, user: engine.get_hybrid_recommendations(user, 10), 'user'),
+    'sentiment': (_fit_sentiment, lambda service, product: service.get_sentiment_insights(product), 'product'),
+}
+
+
+class QueryCounter:
+    """
+    Counts queries run on the default connection while active. Unlike
+    CaptureQueriesContext it keeps no SQL, so it is not capped by the
+    connection's 9000-entry query log and fits of any size are counted
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Measure fit time, request latency, query counts and peak memory of each recommender'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            choices=list(ENGINES),
+            default=list(ENGINES),
+            help='Recommender paths to benchmark',
+        )
+        parser.add_argument('--requests', type=int, default=50, help='Requests per engine')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for picking request subjects')
+        parser.add_argument('--output', type=str, help='Write the JSON results to this file')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+        parser.add_argument(
+            '--no-isolate',
+            action='store_true',
+            help='Run engines in this process instead of one subprocess each (peak RSS then accumulates)',
+        )
+
+    def _subjects(self, kind, count, seed):
+        rng = np.random.default_rng(seed)
+        if kind == 'user':
+            ids = list(UserBehavior.objects.values_list('user_id', flat=True).distinct())
+            model, lookup = User, 'id__in'
+        else:
+            ids = list(Product.objects.values_list('uid', flat=True))
+            model, lookup = Product, 'uid__in'
+        if not ids:
+            return []
+        picked = [ids[i] for i in rng.choice(len(ids), size=min(count, len(ids)), replace=False)]
+        objects = {obj.pk: obj for obj in model.objects.filter(**{lookup: picked})}
+        return [objects[pk] for pk in picked if pk in objects]
+
+    def run_engine(self, name, requests, seed):
+        fit, query, kind = ENGINES[name]
+        subjects = self._subjects(kind, requests, seed)
+
+        # Services report progress with print(); keep it out of the results
+        with redirect_stdout(io.StringIO()):
+            with QueryCounter() as fit_queries:
+                start = time.perf_counter()
+                state = fit()
+                fit_seconds = time.perf_counter() - start
+
+            latencies = []
+            query_counts = []
+            for subject in subjects:
+                with QueryCounter() as request_queries:
+                    start = time.perf_counter()
+                    query(state, subject)
+                    latencies.append(time.perf_counter() - start)
+                query_counts.append(request_queries.count)
+
+        def percentile(values, q):
+            return round(float(np.percentile(values, q)) * 1000, 3) if values else None
+
+        return {
+            'engine': name,
+            'fit_seconds': round(fit_seconds, 4),
+            'fit_queries': fit_queries.count,
+            'requests': len(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'mean_queries_per_request': round(float(np.mean(query_counts)), 2) if query_counts else None,
+            'max_queries_per_request': max(query_counts) if query_counts else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def run_isolated(self, name, options):
+        """
+        Run one engine in a fresh interpreter so its peak RSS is its own
+        """
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_recommenders',
+            '--engines', name, '--requests', str(options['requests']), '--seed', str(options['seed']),
+            '--no-isolate', '--json',
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        if completed.returncode != 0:
+            return {'engine': name, 'error': completed.stderr.strip().splitlines()[-1:]}
+        return json.loads(completed.stdout)['engines'][0]
+
+    def handle(self, *args, **options):
+        if not UserBehavior.objects.exists():
+            raise CommandError('No behaviors to benchmark; run generate_synthetic_data first')
+
+        results = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'database': str(connection.settings_dict['NAME']),
+            'dataset': {
+                'users': User.objects.count(),
+                'products': Product.objects.count(),
+                'behaviors': UserBehavior.objects.count(),
+                'reviews': ProductReview.objects.count(),
+            },
+            'engines': [],
+        }
+
+        for name in options['engines']:
+            if options['no_isolate']:
+                result = self.run_engine(name, options['requests'], options['seed'])
+            else:
+                result = self.run_isolated(name, options)
+            results['engines'].append(result)
+            if not options['json']:
+                self._write_result(result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            if not options['json']:
+                self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def _write_result(self, result):
+        if 'error' in result:
+            self.stdout.write(self.style.ERROR(f"{result['engine']:>20}: failed {result['error']}"))
+            return
+        self.stdout.write(
+            f"{result['engine']:>20}: fit {result['fit_seconds']}s ({result['fit_queries']} queries), "
+            f"p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms p99 {result['p99_ms']}ms, "
+            f"{result['mean_queries_per_request']} queries/request, peak RSS {result['peak_rss_mb']} MB"
+        )
@@ -0,0 +1,96 @@
+"""
+Django management command to benchmark sentiment scorers against TextBlob
+Usage: python manage.py benchmark_sentiment_scorers [--reviews 5000] [--source synthetic]
+"""
+
+import json
+import time
+import random
+import numpy as np
+from django.core.management.base import BaseCommand
+from products.models import ProductReview
+from products.sentiment_scorers import SCORERS, TextBlobScorer, label_for_score
+
+
+SYNTHETIC_PHRASES = [
+    'very comfortable', 'not comfortable', 'really stylish', 'terrible quality',
+    'great fit', 'too tight', 'not bad at all', 'cheap material', 'excellent grip',
+    'arrived late', 'perfect for running', "don't like the color", 'extremely light',
+    'poor stitching', 'good value', 'awful smell', 'nice design', 'never again',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure throughput of sentiment scorers and their label agreement with TextBlob'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            type=str,
+            choices=['reviews', 'synthetic'],
+            default='reviews',
+            help='Score stored review texts (topped up synthetically) or synthetic texts only',
+        )
+        parser.add_argument('--reviews', type=int, default=5000, help='Number of texts to score')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for synthetic texts')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def _load_texts(self, options):
+        count = options['reviews']
+        texts = []
+        if options['source'] == 'reviews':
+            texts = list(
+                ProductReview.objects.exclude(content__isnull=True).exclude(content='')
+                .values_list('content', flat=True)[:count]
+            )
+
+        rng = random.Random(options['seed'])
+        while len(texts) < count:
+            phrases = rng.sample(SYNTHETIC_PHRASES, rng.randint(1, 4))
+            texts.append('These shoes are ' + ', '.join(phrases) + '.')
+        return texts
+
+    def handle(self, *args, **options):
+        texts = self._load_texts(options)
+        results = {'texts': len(texts), 'scorers': []}
+
+        reference = None
+        for name, scorer_class in SCORERS.items():
+            scorer = scorer_class()
+            scorer.score_batch(texts[:10])  # Warm up lexicons and imports
+
+            start = time.perf_counter()
+            scores = scorer.score_batch(texts)
+            elapsed = time.perf_counter() - start
+
+            if name == TextBlobScorer.name:
+                reference = scores
+            results['scorers'].append({
+                'name': name,
+                'seconds': round(elapsed, 4),
+                'reviews_per_second': round(len(texts) / elapsed) if elapsed else None,
+                'scores': scores,
+            })
+
+        textblob_seconds = next(r['seconds'] for r in results['scorers'] if r['name'] == TextBlobScorer.name)
+        reference_labels = [label_for_score(score) for score in reference]
+        for result in results['scorers']:
+            scores = result.pop('scores')
+            labels = [label_for_score(score) for score in scores]
+            result['label_agreement'] = round(
+                sum(a == b for a, b in zip(labels, reference_labels)) / len(texts), 4
+            )
+            result['correlation'] = round(float(np.corrcoef(scores, reference)[0, 1]), 4) if np.std(scores) and np.std(reference) else None
+            result['speedup'] = round(textblob_seconds / result['seconds'], 1) if result['seconds'] else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"Scored {results['texts']} texts")
+        for result in results['scorers']:
+            self.stdout.write(
+                f"{result['name']:>10}: {result['reviews_per_second']} reviews/s "
+                f"({result['speedup']}x TextBlob), label agreement {result['label_agreement']:.2%}, "
+                f"correlation {result['correlation']}"
+            )
@@ -0,0 +1,50 @@
+"""
+Django management command to build LSH hash buckets for candidate generation
+Usage: python manage.py build_product_hashes [--types content behavior image]
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from products.hashing import ProductHashingService
+
+
+class Command(BaseCommand):
+    help = 'Build SimHash, MinHash and image hash buckets used for candidate generation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--types',
+            nargs='+',
+            choices=[
+                ProductHashingService.CONTENT,
+                ProductHashingService.BEHAVIOR,
+                ProductHashingService.IMAGE,
+            ],
+            default=[
+                ProductHashingService.CONTENT,
+                ProductHashingService.BEHAVIOR,
+                ProductHashingService.IMAGE,
+            ],
+            help='Which hash types to rebuild',
+        )
+
+    def handle(self, *args, **options):
+        service = ProductHashingService()
+        builders = {
+            ProductHashingService.CONTENT: service.build_content_hashes,
+            ProductHashingService.BEHAVIOR: service.build_behavior_hashes,
+            ProductHashingService.IMAGE: service.build_image_hashes,
+        }
+
+        for hash_type in options['types']:
+            start = time.perf_counter()
+            try:
+                bucket_count = builders[hash_type]()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Error building {hash_type} hashes: {e}'))
+                continue
+
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                self.style.SUCCESS(f'Built {bucket_count} {hash_type} buckets in {elapsed:.2f}s')
+            )
@@ -0,0 +1,65 @@
+"""
+Django management command to fill a throwaway database with synthetic shop data
+Usage: SQLITE_PATH=/tmp/bench.sqlite3 python manage.py generate_synthetic_data --migrate [--users 10000]
+"""
+
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from products.synthetic_data import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate power-law catalogs, users, behaviors and reviews for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users (1k to 1M)')
+        parser.add_argument('--products', type=int, default=500, help='Number of products')
+        parser.add_argument('--behaviors-per-user', type=int, default=20, help='Median events per user')
+        parser.add_argument('--review-rate', type=float, default=0.3, help='Share of purchases that get a review')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Exponent of the product popularity curve')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--migrate', action='store_true', help='Run migrations on the target database first')
+        parser.add_argument(
+            '--allow-main-db',
+            action='store_true',
+            help='Allow writing to the project database instead of a SQLITE_PATH file',
+        )
+
+    def handle(self, *args, **options):
+        database = Path(str(connection.settings_dict['NAME']))
+        if database == Path(settings.BASE_DIR) / 'db.sqlite3' and not options['allow_main_db']:
+            raise CommandError(
+                'Refusing to write synthetic data to the project database; '
+                'set SQLITE_PATH to a throwaway file or pass --allow-main-db'
+            )
+
+        if options['migrate']:
+            call_command('migrate', verbosity=0, interactive=False)
+
+        generator = SyntheticDataGenerator(
+            users=options['users'],
+            products=options['products'],
+            behaviors_per_user=options['behaviors_per_user'],
+            review_rate=options['review_rate'],
+            zipf_exponent=options['zipf'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+
+        start = time.perf_counter()
+        try:
+            counts = generator.generate()
+        except Exception as e:
+            raise CommandError(f'Error generating synthetic data: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Database {database} now has {counts['users']} users, {counts['products']} products, "
+            f"{counts['behaviors']} behaviors and {counts['reviews']} reviews "
+            f"({time.perf_counter() - start:.1f}s)"
+        ))
@@ -0,0 +1,60 @@
+"""
+Django management command to compute perceptual hashes for product images
+Usage: python manage.py hash_product_images [--workers 4] [--batch-size 500] [--duplicates]
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from products.image_hashing import ImageHashingService
+
+
+class Command(BaseCommand):
+    help = 'Compute dHash/pHash for every ProductImage and report near-duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes (defaults to CPU count, 1 hashes in-process)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Images streamed from the database per batch',
+        )
+        parser.add_argument(
+            '--duplicates',
+            action='store_true',
+            help='List near-duplicate image pairs after hashing',
+        )
+        parser.add_argument(
+            '--max-distance',
+            type=int,
+            default=None,
+            help='Hamming distance threshold for near-duplicates',
+        )
+        parser.add_argument(
+            '--skip-build',
+            action='store_true',
+            help='Only report near-duplicates from stored hashes',
+        )
+
+    def handle(self, *args, **options):
+        service = ImageHashingService(max_distance=options['max_distance'])
+
+        if not options['skip_build']:
+            start = time.perf_counter()
+            stats = service.build(options['workers'], options['batch_size'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"Hashed {stats['images']} images of {stats['products']} products "
+                f"into {stats['buckets']} buckets in {elapsed:.2f}s ({stats['failed']} failed)"
+            ))
+
+        if options['duplicates']:
+            pairs = service.find_near_duplicates()
+            for image_uid, other_uid, distance in pairs:
+                self.stdout.write(f'{image_uid}  {other_uid}  distance={distance}')
+            self.stdout.write(self.style.SUCCESS(f'Found {len(pairs)} near-duplicate pairs'))
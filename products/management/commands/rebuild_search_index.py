@@ -0,0 +1,49 @@
+"""
+Django management command to rebuild the product full-text search index
+Usage: python manage.py rebuild_search_index [--query "nike runnr"]
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.search import get_search_backend, index_key, search_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index and optionally run a test query'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--query',
+            type=str,
+            help='Search for this text after rebuilding and print the ranked results',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start = time.perf_counter()
+        try:
+            indexed = backend.rebuild()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error rebuilding {backend.name} search index: {e}'))
+            return
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} products with the {backend.name} backend in {elapsed:.2f}s')
+        )
+
+        if options['query']:
+            start = time.perf_counter()
+            results = search_products(options['query'], limit=10)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(f'{len(results)} results in {elapsed:.1f}ms')
+            names = {
+                uid.hex: name
+                for uid, name in Product.objects.filter(
+                    uid__in=[product_id for product_id, _ in results]
+                ).values_list('uid', 'product_name')
+            }
+            for product_id, score in results:
+                name = names.get(index_key(product_id), product_id)
+                self.stdout.write(f'  {score:.4f}  {name}')
@@ -3,6 +3,7 @@ Django management command to update collaborative filtering models
 Usage: python manage.py update_collaborative_filtering
 """
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from products.collaborative_filtering import CollaborativeFilteringService
@@ -75,6 +76,11 @@ class Command(BaseCommand):
                         self.stdout.write(
                             self.style.SUCCESS('Matrix factorization models fitted successfully!')
                         )
+                        if settings.FACTOR_MODEL_DIR:
+                            size = mf_service.save_models()
+                            self.stdout.write(
+                                self.style.SUCCESS(f'Saved factor models to {settings.FACTOR_MODEL_DIR} ({size / 1024:.1f} KiB)')
+                            )
                     else:
                         self.stdout.write(
                             self.style.WARNING('Some matrix factorization models failed to fit')
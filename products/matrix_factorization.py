@@ -3,14 +3,22 @@ Matrix Factorization for Advanced Collaborative Filtering
 Implements SVD, NMF, and other matrix factorization techniques
 """
 
+import threading
 import numpy as np
 import pandas as pd
 from sklearn.decomposition import NMF, TruncatedSVD
 from sklearn.preprocessing import StandardScaler
 from scipy.sparse import csr_matrix
+from django.conf import settings
 from django.db.models import Q, Count, Avg
 from django.contrib.auth.models import User
 from .models import Product, UserBehavior
+from .ann_index import build_ann_index
+from .factor_store import (
+    IdIndex, compact_factors, sort_rating_matrix, save_factor_models, load_factor_models, manifest_mtime
+)
+from base.tracing import span, traced
+from base.metrics import MODEL_FIT_LATENCY
 
 
 class MatrixFactorizationRecommender:
@@ -23,12 +31,12 @@ class MatrixFactorizationRecommender:
         self.regularization = regularization
         self.user_factors = None
         self.item_factors = None
-        self.user_mapping = {}
-        self.item_mapping = {}
-        self.reverse_user_mapping = {}
-        self.reverse_item_mapping = {}
+        self.user_index = None
+        self.item_index = None
+        self.ann_index = None
     
-    def fit(self, rating_matrix):
+    @MODEL_FIT_LATENCY.timed(model='mf')
+    def fit(self, rating_matrix, user_index=None, item_index=None):
         """
         Fit the matrix factorization model
         """
@@ -36,8 +44,9 @@ class MatrixFactorizationRecommender:
             if rating_matrix.empty:
                 return False
             
-            # Create mappings
-            self._create_mappings(rating_matrix)
+            # Rows and columns in id order, sharing the service's id indexes when given
+            rating_matrix = sort_rating_matrix(rating_matrix)
+            self._set_indexes(rating_matrix, user_index, item_index)
             
             # Convert to numpy array
             R = rating_matrix.values
@@ -84,6 +93,9 @@ class MatrixFactorizationRecommender:
                     loss = self._calculate_loss(R)
                     print(f"Iteration {iteration}, Loss: {loss:.4f}")
             
+            self.user_factors = compact_factors(self.user_factors)
+            self.item_factors = compact_factors(self.item_factors)
+            self._build_index()
             return True
             
         except Exception as e:
@@ -98,14 +110,13 @@ class MatrixFactorizationRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return 0.0
             
-            if user_id not in self.user_mapping or item_id not in self.item_mapping:
+            user_idx = self.user_index.position(user_id)
+            item_idx = self.item_index.position(item_id)
+            if user_idx is None or item_idx is None:
                 return 0.0
             
-            user_idx = self.user_mapping[user_id]
-            item_idx = self.item_mapping[item_id]
-            
             prediction = np.dot(self.user_factors[user_idx, :], self.item_factors[item_idx, :])
-            return max(0.0, prediction)  # Ensure non-negative
+            return max(0.0, float(prediction))  # Ensure non-negative
             
         except Exception as e:
             print(f"Error predicting rating: {e}")
@@ -119,46 +130,34 @@ class MatrixFactorizationRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return []
             
-            if user_id not in self.user_mapping:
+            user_idx = self.user_index.position(user_id)
+            if user_idx is None:
                 return []
             
-            user_idx = self.user_mapping[user_id]
             user_vector = self.user_factors[user_idx, :]
             
-            # Calculate scores for all items
-            scores = np.dot(self.item_factors, user_vector)
-            
-            # Get top items
-            top_indices = np.argsort(scores)[::-1][:limit]
-            
-            # Convert back to item IDs
-            recommendations = []
-            for idx in top_indices:
-                item_id = self.reverse_item_mapping[idx]
-                score = scores[idx]
-                recommendations.append((item_id, score))
+            # Top-K inner product search through the ANN index built at fit time
+            if self.ann_index is None:
+                self._build_index()
             
-            return recommendations
+            return self.ann_index.search(user_vector, limit)
             
         except Exception as e:
             print(f"Error getting recommendations: {e}")
             return []
     
-    def _create_mappings(self, rating_matrix):
+    def _build_index(self):
         """
-        Create user and item ID mappings
+        Build the approximate nearest neighbour index over item factors
         """
-        # User mappings
-        user_ids = rating_matrix.index.tolist()
-        for i, user_id in enumerate(user_ids):
-            self.user_mapping[user_id] = i
-            self.reverse_user_mapping[i] = user_id
-        
-        # Item mappings
-        item_ids = rating_matrix.columns.tolist()
-        for j, item_id in enumerate(item_ids):
-            self.item_mapping[item_id] = j
-            self.reverse_item_mapping[j] = item_id
+        self.ann_index = build_ann_index(self.item_factors, self.item_index.ids())
+    
+    def _set_indexes(self, rating_matrix, user_index=None, item_index=None):
+        """
+        Use the given sorted id indexes or build them from the rating matrix
+        """
+        self.user_index = user_index if user_index is not None else IdIndex.from_ids(rating_matrix.index)
+        self.item_index = item_index if item_index is not None else IdIndex.from_ids(rating_matrix.columns)
     
     def _calculate_loss(self, R):
         """
@@ -181,14 +180,14 @@ class SVDRecommender:
     def __init__(self, n_components=50):
         self.n_components = n_components
         self.svd = None  # Will be initialized in fit method
-        self.user_mapping = {}
-        self.item_mapping = {}
-        self.reverse_user_mapping = {}
-        self.reverse_item_mapping = {}
+        self.user_index = None
+        self.item_index = None
         self.user_factors = None
         self.item_factors = None
+        self.ann_index = None
     
-    def fit(self, rating_matrix):
+    @MODEL_FIT_LATENCY.timed(model='svd')
+    def fit(self, rating_matrix, user_index=None, item_index=None):
         """
         Fit SVD model
         """
@@ -196,8 +195,9 @@ class SVDRecommender:
             if rating_matrix.empty:
                 return False
             
-            # Create mappings
-            self._create_mappings(rating_matrix)
+            # Rows and columns in id order, sharing the service's id indexes when given
+            rating_matrix = sort_rating_matrix(rating_matrix)
+            self._set_indexes(rating_matrix, user_index, item_index)
             
             # Convert to numpy array
             R = rating_matrix.values
@@ -214,10 +214,11 @@ class SVDRecommender:
             self.svd = TruncatedSVD(n_components=max_components, random_state=42)
             
             # Apply SVD
-            self.user_factors = self.svd.fit_transform(R)
-            self.item_factors = self.svd.components_.T
+            self.user_factors = compact_factors(self.svd.fit_transform(R))
+            self.item_factors = compact_factors(self.svd.components_.T)
             
             print(f"SVD: Fitted with {max_components} components (users: {n_users}, items: {n_items})")
+            self._build_index()
             return True
             
         except Exception as e:
@@ -232,14 +233,13 @@ class SVDRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return 0.0
             
-            if user_id not in self.user_mapping or item_id not in self.item_mapping:
+            user_idx = self.user_index.position(user_id)
+            item_idx = self.item_index.position(item_id)
+            if user_idx is None or item_idx is None:
                 return 0.0
             
-            user_idx = self.user_mapping[user_id]
-            item_idx = self.item_mapping[item_id]
-            
             prediction = np.dot(self.user_factors[user_idx, :], self.item_factors[item_idx, :])
-            return max(0.0, prediction)
+            return max(0.0, float(prediction))
             
         except Exception as e:
             print(f"Error predicting rating: {e}")
@@ -253,46 +253,34 @@ class SVDRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return []
             
-            if user_id not in self.user_mapping:
+            user_idx = self.user_index.position(user_id)
+            if user_idx is None:
                 return []
             
-            user_idx = self.user_mapping[user_id]
             user_vector = self.user_factors[user_idx, :]
             
-            # Calculate scores for all items
-            scores = np.dot(self.item_factors, user_vector)
-            
-            # Get top items
-            top_indices = np.argsort(scores)[::-1][:limit]
+            # Top-K inner product search through the ANN index built at fit time
+            if self.ann_index is None:
+                self._build_index()
             
-            # Convert back to item IDs
-            recommendations = []
-            for idx in top_indices:
-                item_id = self.reverse_item_mapping[idx]
-                score = scores[idx]
-                recommendations.append((item_id, score))
-            
-            return recommendations
+            return self.ann_index.search(user_vector, limit)
             
         except Exception as e:
             print(f"Error getting recommendations: {e}")
             return []
     
-    def _create_mappings(self, rating_matrix):
+    def _build_index(self):
         """
-        Create user and item ID mappings
+        Build the approximate nearest neighbour index over item factors
         """
-        # User mappings
-        user_ids = rating_matrix.index.tolist()
-        for i, user_id in enumerate(user_ids):
-            self.user_mapping[user_id] = i
-            self.reverse_user_mapping[i] = user_id
-        
-        # Item mappings
-        item_ids = rating_matrix.columns.tolist()
-        for j, item_id in enumerate(item_ids):
-            self.item_mapping[item_id] = j
-            self.reverse_item_mapping[j] = item_id
+        self.ann_index = build_ann_index(self.item_factors, self.item_index.ids())
+    
+    def _set_indexes(self, rating_matrix, user_index=None, item_index=None):
+        """
+        Use the given sorted id indexes or build them from the rating matrix
+        """
+        self.user_index = user_index if user_index is not None else IdIndex.from_ids(rating_matrix.index)
+        self.item_index = item_index if item_index is not None else IdIndex.from_ids(rating_matrix.columns)
 
 
 class NMFRecommender:
@@ -302,14 +290,14 @@ class NMFRecommender:
         self.n_components = n_components
         self.max_iter = max_iter
         self.nmf = None  # Will be initialized in fit method
-        self.user_mapping = {}
-        self.item_mapping = {}
-        self.reverse_user_mapping = {}
-        self.reverse_item_mapping = {}
+        self.user_index = None
+        self.item_index = None
         self.user_factors = None
         self.item_factors = None
+        self.ann_index = None
     
-    def fit(self, rating_matrix):
+    @MODEL_FIT_LATENCY.timed(model='nmf')
+    def fit(self, rating_matrix, user_index=None, item_index=None):
         """
         Fit NMF model
         """
@@ -317,8 +305,9 @@ class NMFRecommender:
             if rating_matrix.empty:
                 return False
             
-            # Create mappings
-            self._create_mappings(rating_matrix)
+            # Rows and columns in id order, sharing the service's id indexes when given
+            rating_matrix = sort_rating_matrix(rating_matrix)
+            self._set_indexes(rating_matrix, user_index, item_index)
             
             # Convert to numpy array
             R = rating_matrix.values
@@ -335,10 +324,11 @@ class NMFRecommender:
             self.nmf = NMF(n_components=max_components, max_iter=self.max_iter, random_state=42)
             
             # Apply NMF
-            self.user_factors = self.nmf.fit_transform(R)
-            self.item_factors = self.nmf.components_.T
+            self.user_factors = compact_factors(self.nmf.fit_transform(R))
+            self.item_factors = compact_factors(self.nmf.components_.T)
             
             print(f"NMF: Fitted with {max_components} components (users: {n_users}, items: {n_items})")
+            self._build_index()
             return True
             
         except Exception as e:
@@ -353,14 +343,13 @@ class NMFRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return 0.0
             
-            if user_id not in self.user_mapping or item_id not in self.item_mapping:
+            user_idx = self.user_index.position(user_id)
+            item_idx = self.item_index.position(item_id)
+            if user_idx is None or item_idx is None:
                 return 0.0
             
-            user_idx = self.user_mapping[user_id]
-            item_idx = self.item_mapping[item_id]
-            
             prediction = np.dot(self.user_factors[user_idx, :], self.item_factors[item_idx, :])
-            return max(0.0, prediction)
+            return max(0.0, float(prediction))
             
         except Exception as e:
             print(f"Error predicting rating: {e}")
@@ -374,57 +363,94 @@ class NMFRecommender:
             if self.user_factors is None or self.item_factors is None:
                 return []
             
-            if user_id not in self.user_mapping:
+            user_idx = self.user_index.position(user_id)
+            if user_idx is None:
                 return []
             
-            user_idx = self.user_mapping[user_id]
             user_vector = self.user_factors[user_idx, :]
             
-            # Calculate scores for all items
-            scores = np.dot(self.item_factors, user_vector)
-            
-            # Get top items
-            top_indices = np.argsort(scores)[::-1][:limit]
+            # Top-K inner product search through the ANN index built at fit time
+            if self.ann_index is None:
+                self._build_index()
             
-            # Convert back to item IDs
-            recommendations = []
-            for idx in top_indices:
-                item_id = self.reverse_item_mapping[idx]
-                score = scores[idx]
-                recommendations.append((item_id, score))
-            
-            return recommendations
+            return self.ann_index.search(user_vector, limit)
             
         except Exception as e:
             print(f"Error getting recommendations: {e}")
             return []
     
-    def _create_mappings(self, rating_matrix):
+    def _build_index(self):
         """
-        Create user and item ID mappings
+        Build the approximate nearest neighbour index over item factors
         """
-        # User mappings
-        user_ids = rating_matrix.index.tolist()
-        for i, user_id in enumerate(user_ids):
-            self.user_mapping[user_id] = i
-            self.reverse_user_mapping[i] = user_id
-        
-        # Item mappings
-        item_ids = rating_matrix.columns.tolist()
-        for j, item_id in enumerate(item_ids):
-            self.item_mapping[item_id] = j
-            self.reverse_item_mapping[j] = item_id
+        self.ann_index = build_ann_index(self.item_factors, self.item_index.ids())
+    
+    def _set_indexes(self, rating_matrix, user_index=None, item_index=None):
+        """
+        Use the given sorted id indexes or build them from the rating matrix
+        """
+        self.user_index = user_index if user_index is not None else IdIndex.from_ids(rating_matrix.index)
+        self.item_index = item_index if item_index is not None else IdIndex.from_ids(rating_matrix.columns)
+
+
+MODEL_CLASSES = {'mf': MatrixFactorizationRecommender, 'svd': SVDRecommender, 'nmf': NMFRecommender}
+
+_saved_models = {'mtime': None, 'recommenders': {}}
+_saved_models_lock = threading.Lock()
+
+
+def _load_recommenders(directory):
+    user_index, item_index, models = load_factor_models(directory)
+    recommenders = {}
+    for name, (user_factors, item_factors) in models.items():
+        recommender = MODEL_CLASSES[name]()
+        recommender.user_index = user_index
+        recommender.item_index = item_index
+        recommender.user_factors = user_factors
+        recommender.item_factors = item_factors
+        recommender._build_index()
+        recommenders[name] = recommender
+    return recommenders
+
+
+def get_saved_recommenders():
+    """
+    Models saved in FACTOR_MODEL_DIR, memory-mapped once per process and
+    reloaded when a new set is saved; empty when nothing is saved
+    """
+    directory = getattr(settings, 'FACTOR_MODEL_DIR', '')
+    if not directory:
+        return {}
+    mtime = manifest_mtime(directory)
+    if mtime is None:
+        return {}
+    if _saved_models['mtime'] != mtime:
+        with _saved_models_lock:
+            if _saved_models['mtime'] != mtime:
+                try:
+                    _saved_models['recommenders'] = _load_recommenders(directory)
+                except Exception as e:
+                    print(f"Error loading factor models from {directory}: {e}")
+                    _saved_models['recommenders'] = {}
+                _saved_models['mtime'] = mtime
+    return _saved_models['recommenders']
 
 
 class MatrixFactorizationService:
     """Service class for matrix factorization operations"""
     
     def __init__(self):
-        self.mf_recommender = MatrixFactorizationRecommender()
-        self.svd_recommender = SVDRecommender()
-        self.nmf_recommender = NMFRecommender()
+        # Saved models are shared by every service instance in the process
+        saved = get_saved_recommenders()
+        self.mf_recommender = saved.get('mf') or MatrixFactorizationRecommender()
+        self.svd_recommender = saved.get('svd') or SVDRecommender()
+        self.nmf_recommender = saved.get('nmf') or NMFRecommender()
+        self.uses_saved_models = bool(saved)
         self.rating_matrix = None
     
+    def recommenders(self):
+        return {'mf': self.mf_recommender, 'svd': self.svd_recommender, 'nmf': self.nmf_recommender}
+    
     def create_rating_matrix(self):
         """
         Create user-item rating matrix from behaviors
@@ -493,14 +519,26 @@ class MatrixFactorizationService:
                 print("No rating data available")
                 return False
             
+            if self.uses_saved_models:
+                # Never refit the shared, memory-mapped models in place
+                self.mf_recommender = MatrixFactorizationRecommender()
+                self.svd_recommender = SVDRecommender()
+                self.nmf_recommender = NMFRecommender()
+                self.uses_saved_models = False
+            
+            # One pair of sorted id indexes shared by all three models
+            self.rating_matrix = sort_rating_matrix(self.rating_matrix)
+            user_index = IdIndex.from_ids(self.rating_matrix.index)
+            item_index = IdIndex.from_ids(self.rating_matrix.columns)
+            
             print("Fitting Matrix Factorization model...")
-            mf_success = self.mf_recommender.fit(self.rating_matrix)
+            mf_success = self.mf_recommender.fit(self.rating_matrix, user_index, item_index)
             
             print("Fitting SVD model...")
-            svd_success = self.svd_recommender.fit(self.rating_matrix)
+            svd_success = self.svd_recommender.fit(self.rating_matrix, user_index, item_index)
             
             print("Fitting NMF model...")
-            nmf_success = self.nmf_recommender.fit(self.rating_matrix)
+            nmf_success = self.nmf_recommender.fit(self.rating_matrix, user_index, item_index)
             
             # Return True if at least one model was fitted successfully
             success_count = sum([mf_success, svd_success, nmf_success])
@@ -511,6 +549,21 @@ class MatrixFactorizationService:
             print(f"Error fitting models: {e}")
             return False
     
+    def save_models(self, directory=None):
+        """
+        Save the fitted models to `directory` (default FACTOR_MODEL_DIR) for
+        web processes to memory-map; returns the bytes written
+        """
+        directory = directory or settings.FACTOR_MODEL_DIR
+        fitted = {name: recommender for name, recommender in self.recommenders().items()
+                  if recommender.user_factors is not None}
+        if not directory or not fitted:
+            return 0
+        first = next(iter(fitted.values()))
+        models = {name: (recommender.user_factors, recommender.item_factors) for name, recommender in fitted.items()}
+        return save_factor_models(directory, first.user_index, first.item_index, models)
+    
+    @traced('matrix_factorization.recommend')
     def get_recommendations(self, user, method='mf', limit=10):
         """
         Get recommendations using specified method
@@ -527,12 +580,14 @@ class MatrixFactorizationService:
             
             # Convert to product objects
             products = []
-            for product_id, score in recommendations:
-                try:
-                    product = Product.objects.get(uid=product_id)
-                    products.append(product)
-                except Product.DoesNotExist:
-                    continue
+            with span('matrix_factorization.hydrate', candidates=len(recommendations)) as hydrate:
+                for product_id, score in recommendations:
+                    try:
+                        product = Product.objects.get(uid=product_id)
+                        products.append(product)
+                    except Product.DoesNotExist:
+                        continue
+                hydrate.set(results=len(products))
             
             return products
             
@@ -540,6 +595,7 @@ class MatrixFactorizationService:
             print(f"Error getting recommendations: {e}")
             return []
     
+    @traced('matrix_factorization.hybrid')
     def get_hybrid_recommendations(self, user, limit=10):
         """
         Get hybrid recommendations from all models
@@ -568,12 +624,14 @@ class MatrixFactorizationService:
             
             # Convert to product objects
             products = []
-            for product_id, score in sorted_recs[:limit]:
-                try:
-                    product = Product.objects.get(uid=product_id)
-                    products.append(product)
-                except Product.DoesNotExist:
-                    continue
+            with span('matrix_factorization.hydrate', candidates=len(sorted_recs)) as hydrate:
+                for product_id, score in sorted_recs[:limit]:
+                    try:
+                        product = Product.objects.get(uid=product_id)
+                        products.append(product)
+                    except Product.DoesNotExist:
+                        continue
+                hydrate.set(results=len(products))
             
             return products
             
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_hashbucket_producthashbucket_hashbucket_products_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producthash',
+            name='hash_type',
+            field=models.CharField(choices=[('content', 'Content Hash'), ('feature', 'Feature Hash'), ('image', 'Image Hash'), ('factor', 'Factor LSH Hash')], max_length=20),
+        ),
+    ]
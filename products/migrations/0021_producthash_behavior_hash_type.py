@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_producthash_factor_hash_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producthash',
+            name='hash_type',
+            field=models.CharField(choices=[('content', 'Content Hash'), ('feature', 'Feature Hash'), ('image', 'Image Hash'), ('factor', 'Factor LSH Hash'), ('behavior', 'Behavior MinHash')], max_length=20),
+        ),
+    ]
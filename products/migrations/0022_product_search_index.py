@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+WORDS_TABLE = 'products_search_words'
+TRIGRAM_TABLE = 'products_search_trigrams'
+
+
+def create_search_tables(apps, schema_editor):
+    """
+    FTS5 tables only exist on SQLite; other databases use their own search
+    backend (see products.search)
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {WORDS_TABLE} USING fts5("
+            "product_id UNINDEXED, name, description, brand, category, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5("
+            "product_id UNINDEXED, text, tokenize='trigram')"
+        )
+        cursor.execute(
+            f"INSERT INTO {WORDS_TABLE} (product_id, name, description, brand, category) "
+            "SELECT p.uid, p.product_name, p.product_desription, COALESCE(b.name, ''), COALESCE(c.category_name, '') "
+            "FROM products_product p "
+            "LEFT JOIN products_brand b ON b.uid = p.brand_id "
+            "LEFT JOIN products_category c ON c.uid = p.category_id"
+        )
+        cursor.execute(
+            f"INSERT INTO {TRIGRAM_TABLE} (product_id, text) "
+            "SELECT p.uid, p.product_name || ' ' || COALESCE(b.name, '') || ' ' || COALESCE(c.category_name, '') "
+            "FROM products_product p "
+            "LEFT JOIN products_brand b ON b.uid = p.brand_id "
+            "LEFT JOIN products_category c ON c.uid = p.category_id"
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {WORDS_TABLE}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TRIGRAM_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_producthash_behavior_hash_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+TRIGRAM_INDEX = 'products_product_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    pg_trgm and a trigram GIN index on product names for PostgresSearchBackend;
+    raw SQL so the migration does not import psycopg on other databases
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+            'ON products_product USING gin (product_name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    # The extension may be used by other apps, so it is left installed
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.4 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+def split_factor_hashes(apps, schema_editor):
+    """
+    Move rows of the shared 'factor' hash type to the type of the model that
+    wrote them (ProductHash metadata 'index', bucket id prefix '<model>:')
+    """
+    ProductHash = apps.get_model('products', 'ProductHash')
+    HashBucket = apps.get_model('products', 'HashBucket')
+
+    for product_hash in ProductHash.objects.filter(hash_type='factor'):
+        name = product_hash.hash_metadata.get('index')
+        if name:
+            product_hash.hash_type = f'factor_{name}'
+            product_hash.save(update_fields=['hash_type'])
+        else:
+            product_hash.delete()
+
+    for bucket in HashBucket.objects.filter(hash_type='factor'):
+        name, _, _ = bucket.bucket_id.partition(':')
+        bucket.hash_type = f'factor_{name}'
+        bucket.save(update_fields=['hash_type'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_product_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producthash',
+            name='hash_type',
+            field=models.CharField(choices=[('content', 'Content Hash'), ('feature', 'Feature Hash'), ('image', 'Image Hash'), ('factor_mf', 'MF Factor LSH Hash'), ('factor_svd', 'SVD Factor LSH Hash'), ('factor_nmf', 'NMF Factor LSH Hash'), ('behavior', 'Behavior MinHash')], max_length=20),
+        ),
+        migrations.RunPython(split_factor_hashes, migrations.RunPython.noop),
+    ]
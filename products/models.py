@@ -240,6 +240,10 @@ class ProductHash(BaseModel):
         ('content', 'Content Hash'),
         ('feature', 'Feature Hash'),
         ('image', 'Image Hash'),
+        ('factor_mf', 'MF Factor LSH Hash'),
+        ('factor_svd', 'SVD Factor LSH Hash'),
+        ('factor_nmf', 'NMF Factor LSH Hash'),
+        ('behavior', 'Behavior MinHash'),
     ])
     hash_value = models.CharField(max_length=255)
     hash_metadata = models.JSONField(default=dict)  # Additional hash info
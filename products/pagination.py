@@ -0,0 +1,226 @@
+"""
+Keyset (Cursor) Pagination
+Pages through ordered querysets with WHERE clauses on the sort key instead of
+OFFSET, using opaque cursors and a cached or planner-estimated total count
+"""
+
+import json
+import base64
+import hashlib
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from base.metrics import record_cache_lookup
+
+
+# Catalog sort options (the `sort` query parameter) and their keyset orderings;
+# uid is always appended as the tiebreaker
+SORT_ORDERINGS = {
+    'priceAsc': ['price'],
+    'priceDesc': ['-price'],
+    'price_asc': ['price'],
+    'price_desc': ['-price'],
+    'newest': ['-created_at'],
+    'oldest': ['created_at'],
+}
+DEFAULT_ORDERING = ['-created_at']
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor cannot be decoded or does not match the ordering"""
+
+
+def get_ordering(sort=None):
+    return SORT_ORDERINGS.get(sort, DEFAULT_ORDERING)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return payload['v'], payload['d']
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+class CursorPage:
+    """One page of results plus the cursors around it"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, estimated_count=None, params=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.estimated_count = estimated_count
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def querystring(self, cursor):
+        """
+        Current query parameters with the cursor replaced (and any legacy
+        page number dropped)
+        """
+        params = self.params.copy() if self.params is not None else {}
+        for key in ('cursor', 'page'):
+            params.pop(key, None)
+        if hasattr(params, 'urlencode'):
+            params['cursor'] = cursor
+            return params.urlencode()
+        params['cursor'] = cursor
+        return urlencode(params)
+
+    @property
+    def next_querystring(self):
+        return self.querystring(self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_querystring(self):
+        return self.querystring(self.previous_cursor) if self.previous_cursor else ''
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over `queryset` ordered by `ordering` (Django order_by
+    syntax); the primary key is added as the final tiebreaker
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        ordering = list(ordering or DEFAULT_ORDERING)
+        if ordering[-1].lstrip('-') not in ('pk', 'uid'):
+            ordering.append('-uid' if ordering[-1].startswith('-') else 'uid')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _serialize(self, obj):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float, str, type(None))):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def _deserialize(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor('Cursor does not match the current ordering')
+        model = self.queryset.model
+        parsed = []
+        for (name, _), value in zip(self.fields, values):
+            try:
+                field = model._meta.get_field(name)
+            except Exception:
+                field = None  # Annotation, e.g. search relevance
+            if field is not None and field.get_internal_type() == 'DateTimeField' and value is not None:
+                value = parse_datetime(value)
+            parsed.append(value)
+        return parsed
+
+    def _keyset_filter(self, values, forward):
+        """
+        (a > x) OR (a = x AND b > y) OR ... with each comparison flipped for
+        descending fields and for backwards paging
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return condition
+
+    def estimated_count(self):
+        return estimate_count(self.queryset)
+
+    def page(self, cursor=None, params=None):
+        """
+        Page after (or before) `cursor`; the first page when cursor is empty
+        """
+        forward = True
+        queryset = self.queryset
+        if cursor:
+            values, direction = decode_cursor(cursor)
+            forward = direction != 'p'
+            queryset = queryset.filter(self._keyset_filter(self._deserialize(values), forward))
+
+        ordering = self.ordering if forward else [
+            name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+        ]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = encode_cursor(self._serialize(rows[-1]), 'n')
+            if cursor and (forward or has_more):
+                previous_cursor = encode_cursor(self._serialize(rows[0]), 'p')
+
+        return CursorPage(rows, next_cursor, previous_cursor, self.estimated_count(), params)
+
+
+def estimate_count(queryset):
+    """
+    Row estimate from the Postgres planner, otherwise an exact COUNT cached
+    per query so deep pages never recount
+    """
+    connection = connections[queryset.db]
+    sql, query_params = queryset.order_by().query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', query_params)
+                return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+        except Exception as e:
+            print(f"Error estimating row count: {e}")
+
+    digest = hashlib.md5(f'{sql}|{query_params}'.encode()).hexdigest()
+    cache_key = f'cursor_count:{digest}'
+    count = cache.get(cache_key)
+    record_cache_lookup('cursor_count', count is not None)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, getattr(settings, 'CURSOR_COUNT_CACHE_SECONDS', 300))
+    return count
+
+
+def paginate(request, queryset, per_page=20, ordering=None):
+    """
+    Cursor page for a request's `cursor` parameter; an invalid cursor falls
+    back to the first page
+    """
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    cursor = request.GET.get('cursor')
+    try:
+        return paginator.page(cursor, request.GET)
+    except (InvalidCursor, ValidationError, ValueError, TypeError, OverflowError):
+        # OverflowError: a tampered cursor can carry Infinity or 1e999 for an integer key
+        return paginator.page(None, request.GET)
@@ -324,7 +324,7 @@ class AdvancedPreferenceLearner:
     
     def _get_user_behaviors(self, user):
         """Get all user behaviors with time weighting"""
-        return UserBehavior.objects.filter(user=user).order_by('-timestamp')
+        return UserBehavior.objects.filter(user=user).select_related('product__category', 'product__brand').order_by('-timestamp')
     
     def _calculate_time_weight(self, timestamp):
         """
@@ -18,6 +18,9 @@ from .feature_extractor import ContentBasedRecommender
 from .preference_learner import PreferenceService
 from .collaborative_filtering import CollaborativeFilteringService
 from .matrix_factorization import MatrixFactorizationService
+from .hashing import ProductHashingService
+from base.tracing import span, traced, current_span
+from base.metrics import track_recommendation
 
 
 class RecommendationEngine:
@@ -31,13 +34,15 @@ class RecommendationEngine:
         self.collaborative_service = CollaborativeFilteringService()
         self.matrix_factorization_service = MatrixFactorizationService()
         
+    @traced('recommendation.content')
     def get_content_based_recommendations(self, user, limit=10):
         """
         Get enhanced content-based recommendations based on user preferences
         """
         try:
             # Update user preferences first
-            self.preference_service.update_user_preferences(user)
+            with span('recommendation.preferences'):
+                self.preference_service.update_user_preferences(user)
             
             # Use the enhanced content-based recommender
             return self.content_recommender.get_content_based_recommendations(user, limit)
@@ -46,10 +51,12 @@ class RecommendationEngine:
             print(f"Error in content-based recommendations: {e}")
             return self._get_trending_products(limit)
     
+    @traced('recommendation.collaborative')
     def get_collaborative_filtering_recommendations(self, user, method='hybrid', limit=10):
         """
         Get collaborative filtering recommendations
         """
+        current_span().set(method=method)
         try:
             if method == 'user_based':
                 return self.collaborative_service.get_collaborative_recommendations(user, 'user_based', limit)
@@ -72,6 +79,7 @@ class RecommendationEngine:
             print(f"Error in collaborative filtering recommendations: {e}")
             return self._get_trending_products(limit)
     
+    @traced('recommendation.hybrid')
     def get_hybrid_recommendations(self, user, limit=10):
         """
         Get hybrid recommendations combining content-based and collaborative filtering
@@ -101,12 +109,14 @@ class RecommendationEngine:
             
             # Get product objects
             recommended_products = []
-            for product_uid, score in sorted_products[:limit]:
-                try:
-                    product = Product.objects.get(uid=product_uid)
-                    recommended_products.append(product)
-                except Product.DoesNotExist:
-                    continue
+            with span('recommendation.hydrate', candidates=len(sorted_products)) as hydrate:
+                for product_uid, score in sorted_products[:limit]:
+                    try:
+                        product = Product.objects.get(uid=product_uid)
+                        recommended_products.append(product)
+                    except Product.DoesNotExist:
+                        continue
+                hydrate.set(results=len(recommended_products))
             
             return recommended_products
             
@@ -122,11 +132,11 @@ class RecommendationEngine:
             # Get product similarities
             similarities = ProductSimilarity.objects.filter(
                 Q(product1=product) | Q(product2=product)
-            ).order_by('-similarity_score')[:limit*2]
+            ).select_related('product1', 'product2').order_by('-similarity_score')[:limit*2]
             
             similar_products = []
             for similarity in similarities:
-                if similarity.product1 == product:
+                if similarity.product1_id == product.uid:
                     similar_product = similarity.product2
                 else:
                     similar_product = similarity.product1
@@ -137,6 +147,14 @@ class RecommendationEngine:
                 if len(similar_products) >= limit:
                     break
             
+            # Top up from shared LSH buckets when precomputed similarities run short
+            if len(similar_products) < limit:
+                for candidate in ProductHashingService().get_candidate_products([product], limit=limit * 2):
+                    if candidate not in similar_products:
+                        similar_products.append(candidate)
+                    if len(similar_products) >= limit:
+                        break
+            
             return similar_products
             
         except Exception as e:
@@ -216,18 +234,21 @@ class RecommendationService:
         """
         Get recommendations for a user based on specified type
         """
-        if recommendation_type == 'content':
-            return self.engine.get_content_based_recommendations(user, limit)
-        elif recommendation_type == 'collaborative':
-            return self.engine.get_collaborative_filtering_recommendations(user, limit)
-        else:
-            return self.engine.get_hybrid_recommendations(user, limit)
+        strategy = recommendation_type if recommendation_type in ('content', 'collaborative') else 'hybrid'
+        with track_recommendation(strategy):
+            if recommendation_type == 'content':
+                return self.engine.get_content_based_recommendations(user, limit)
+            elif recommendation_type == 'collaborative':
+                return self.engine.get_collaborative_filtering_recommendations(user, limit)
+            else:
+                return self.engine.get_hybrid_recommendations(user, limit)
     
     def get_recommendations_for_product(self, product, limit=5):
         """
         Get similar products for a given product
         """
-        return self.engine.get_similar_products(product, limit)
+        with track_recommendation('similar_products'):
+            return self.engine.get_similar_products(product, limit)
     
     def update_user_preferences(self, user):
         """
@@ -0,0 +1,445 @@
+"""
+Product Search Index
+BM25-ranked full-text search over product name, description, brand and
+category with character-trigram fuzzy matching. Uses SQLite FTS5 or Postgres
+full-text/trigram search when available and an in-process index otherwise.
+"""
+
+import re
+import math
+import time
+import threading
+import uuid
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import Product
+
+
+# Relative importance of each field in ranking
+FIELD_WEIGHTS = {'name': 10.0, 'description': 1.0, 'brand': 4.0, 'category': 3.0}
+# Share of the query's trigrams a product name must contain to count as a fuzzy match
+FUZZY_MIN_CONTAINMENT = 0.5
+# pg_trgm word similarity a Postgres fuzzy match needs
+FUZZY_MIN_WORD_SIMILARITY = 0.3
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9]+', (text or '').lower())
+
+
+def trigrams(text):
+    """
+    Character trigrams of each word, so typos anywhere in a word (including
+    its first letters) still share most trigrams with the intended word
+    """
+    grams = set()
+    for word in tokenize(text):
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_containment(query_grams, text):
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+def fuse_rankings(*rankings):
+    """
+    Reciprocal rank fusion of several best-first id lists
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for position, product_id in enumerate(ranking):
+            scores[product_id] += 1.0 / (RRF_K + position + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def index_key(product_id):
+    """
+    Canonical id stored in the index tables (Django's SQLite UUID encoding)
+    """
+    return uuid.UUID(str(product_id)).hex
+
+
+def product_documents(queryset=None):
+    """
+    Yield (product_id, {field: text}) for indexing
+    """
+    queryset = queryset if queryset is not None else Product.objects.all()
+    rows = queryset.values_list('uid', 'product_name', 'product_desription', 'brand__name', 'category__category_name')
+    for uid, name, description, brand, category in rows.iterator(chunk_size=2000):
+        yield uid, {
+            'name': name or '',
+            'description': description or '',
+            'brand': brand or '',
+            'category': category or '',
+        }
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 tables: unicode61 words for BM25 and trigram names for fuzzy matching"""
+
+    name = 'sqlite_fts'
+    WORDS_TABLE = 'products_search_words'
+    TRIGRAM_TABLE = 'products_search_trigrams'
+
+    @classmethod
+    def is_available(cls):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name IN (%s, %s)",
+                [cls.WORDS_TABLE, cls.TRIGRAM_TABLE],
+            )
+            return cursor.fetchone()[0] == 2
+
+    def _delete(self, cursor, product_ids):
+        for table in (self.WORDS_TABLE, self.TRIGRAM_TABLE):
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE product_id = %s', [[index_key(pid)] for pid in product_ids]
+            )
+
+    def _insert(self, cursor, documents):
+        word_rows, trigram_rows = [], []
+        for product_id, fields in documents:
+            word_rows.append([index_key(product_id), fields['name'], fields['description'], fields['brand'], fields['category']])
+            trigram_rows.append([index_key(product_id), f"{fields['name']} {fields['brand']} {fields['category']}"])
+        cursor.executemany(
+            f'INSERT INTO {self.WORDS_TABLE} (product_id, name, description, brand, category) VALUES (%s, %s, %s, %s, %s)',
+            word_rows,
+        )
+        cursor.executemany(
+            f'INSERT INTO {self.TRIGRAM_TABLE} (product_id, text) VALUES (%s, %s)',
+            trigram_rows,
+        )
+
+    def rebuild(self):
+        count = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.WORDS_TABLE}')
+            cursor.execute(f'DELETE FROM {self.TRIGRAM_TABLE}')
+            batch = []
+            for document in product_documents():
+                batch.append(document)
+                if len(batch) >= 1000:
+                    self._insert(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                count += len(batch)
+        return count
+
+    def index_products(self, product_ids):
+        documents = list(product_documents(Product.objects.filter(uid__in=product_ids)))
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+            self._insert(cursor, documents)
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+
+    def search(self, query, limit=200):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        weights = ', '.join(str(w) for w in FIELD_WEIGHTS.values())
+        word_match = ' OR '.join(f'"{token}"*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT product_id FROM {self.WORDS_TABLE} WHERE {self.WORDS_TABLE} MATCH %s '
+                f'ORDER BY bm25({self.WORDS_TABLE}, 0, {weights}) LIMIT %s',
+                [word_match, limit],
+            )
+            word_ranking = [row[0] for row in cursor.fetchall()]
+
+            query_grams = trigrams(query)
+            # Padded word-boundary grams are only scored in Python; FTS matches inner grams
+            inner_grams = [gram for gram in query_grams if ' ' not in gram]
+            fuzzy_ranking = []
+            if inner_grams:
+                trigram_match = ' OR '.join(f'"{gram}"' for gram in inner_grams)
+                cursor.execute(
+                    f'SELECT product_id, text FROM {self.TRIGRAM_TABLE} WHERE {self.TRIGRAM_TABLE} MATCH %s '
+                    f'ORDER BY bm25({self.TRIGRAM_TABLE}) LIMIT %s',
+                    [trigram_match, limit * 4],
+                )
+                scored = [
+                    (product_id, trigram_containment(query_grams, text))
+                    for product_id, text in cursor.fetchall()
+                ]
+                scored = [item for item in scored if item[1] >= FUZZY_MIN_CONTAINMENT]
+                scored.sort(key=lambda item: item[1], reverse=True)
+                fuzzy_ranking = [product_id for product_id, _ in scored[:limit]]
+
+        return fuse_rankings(word_ranking, fuzzy_ranking)[:limit]
+
+
+class PostgresSearchBackend:
+    """Postgres tsvector ranking plus pg_trgm word similarity, computed live"""
+
+    name = 'postgres'
+
+    @classmethod
+    def is_available(cls):
+        return connection.vendor == 'postgresql'
+
+    def rebuild(self):
+        # Vectors are computed at query time; the fuzzy match uses the
+        # trigram GIN index on product_name created by migration 0023
+        return 0
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def search(self, query, limit=200):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+        )
+
+        vector = (
+            SearchVector('product_name', weight='A')
+            + SearchVector('brand__name', weight='B')
+            + SearchVector('category__category_name', weight='B')
+            + SearchVector('product_desription', weight='C')
+        )
+        search_query = SearchQuery(query, search_type='websearch')
+
+        word_ranking = list(
+            Product.objects.annotate(rank=SearchRank(vector, search_query))
+            .filter(rank__gt=0).order_by('-rank').values_list('uid', flat=True)[:limit]
+        )
+        # The %> operator (unlike a filter on the similarity value) can use the
+        # trigram index; its threshold is set for this transaction only
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                    [str(FUZZY_MIN_WORD_SIMILARITY)],
+                )
+            fuzzy_ranking = list(
+                Product.objects.filter(TrigramWordSimilar(F('product_name'), query))
+                .annotate(similarity=TrigramWordSimilarity(query, 'product_name'))
+                .order_by('-similarity').values_list('uid', flat=True)[:limit]
+            )
+        return fuse_rankings(word_ranking, fuzzy_ranking)[:limit]
+
+
+class PythonSearchBackend:
+    """In-process BM25F inverted index with a trigram index for fuzzy matching"""
+
+    name = 'python'
+    k1 = 1.2
+    b = 0.75
+
+    _lock = threading.Lock()
+    _state = None
+    _built_at = 0.0
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def _build(self):
+        postings = defaultdict(dict)
+        gram_postings = defaultdict(set)
+        lengths = {}
+        names = {}
+        for product_id, fields in product_documents():
+            self._add(postings, gram_postings, lengths, names, product_id, fields)
+        return {
+            'postings': postings,
+            'gram_postings': gram_postings,
+            'lengths': lengths,
+            'names': names,
+            'vocabulary': sorted(postings),
+        }
+
+    @staticmethod
+    def _add(postings, gram_postings, lengths, names, product_id, fields):
+        weighted_tf = Counter()
+        length = 0.0
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            length += FIELD_WEIGHTS[field] * len(tokens)
+            for token in tokens:
+                weighted_tf[token] += FIELD_WEIGHTS[field]
+        for token, tf in weighted_tf.items():
+            postings[token][product_id] = tf
+        names[product_id] = f"{fields['name']} {fields['brand']} {fields['category']}"
+        for gram in trigrams(names[product_id]):
+            gram_postings[gram].add(product_id)
+        lengths[product_id] = length
+
+    def _get_state(self):
+        ttl = getattr(settings, 'PRODUCT_SEARCH_PYTHON_INDEX_TTL', 300)
+        cls = type(self)
+        if cls._state is None or time.monotonic() - cls._built_at > ttl:
+            with cls._lock:
+                if cls._state is None or time.monotonic() - cls._built_at > ttl:
+                    cls._state = self._build()
+                    cls._built_at = time.monotonic()
+        return cls._state
+
+    def rebuild(self):
+        cls = type(self)
+        with cls._lock:
+            cls._state = self._build()
+            cls._built_at = time.monotonic()
+        return len(cls._state['lengths'])
+
+    def _remove(self, state, product_ids):
+        product_ids = set(product_ids)
+        for token in list(state['postings']):
+            docs = state['postings'][token]
+            for product_id in product_ids & docs.keys():
+                del docs[product_id]
+        for docs in state['gram_postings'].values():
+            docs -= product_ids
+        for product_id in product_ids:
+            state['lengths'].pop(product_id, None)
+            state['names'].pop(product_id, None)
+
+    def index_products(self, product_ids):
+        cls = type(self)
+        if cls._state is None:
+            return  # Built from the database on first search
+        with cls._lock:
+            state = cls._state
+            self._remove(state, product_ids)
+            for product_id, fields in product_documents(Product.objects.filter(uid__in=product_ids)):
+                self._add(state['postings'], state['gram_postings'], state['lengths'], state['names'], product_id, fields)
+            state['vocabulary'] = sorted(token for token, docs in state['postings'].items() if docs)
+
+    def remove_products(self, product_ids):
+        cls = type(self)
+        if cls._state is None:
+            return
+        with cls._lock:
+            self._remove(cls._state, product_ids)
+
+    def _expand(self, vocabulary, token):
+        """
+        Vocabulary entries starting with `token` (prefix matching)
+        """
+        start = bisect_left(vocabulary, token)
+        matches = []
+        for candidate in vocabulary[start:start + 50]:
+            if not candidate.startswith(token):
+                break
+            matches.append(candidate)
+        return matches
+
+    def search(self, query, limit=200):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        state = self._get_state()
+        n_docs = len(state['lengths']) or 1
+        avg_length = (sum(state['lengths'].values()) / n_docs) or 1.0
+
+        scores = defaultdict(float)
+        for token in tokens:
+            for term in self._expand(state['vocabulary'], token):
+                docs = state['postings'].get(term, {})
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for product_id, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * state['lengths'][product_id] / avg_length)
+                    scores[product_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        word_ranking = [pid for pid, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+        query_grams = trigrams(query)
+        overlap = Counter()
+        for gram in query_grams:
+            for product_id in state['gram_postings'].get(gram, ()):
+                overlap[product_id] += 1
+        fuzzy = [
+            (product_id, count / len(query_grams))
+            for product_id, count in overlap.items()
+            if count / len(query_grams) >= FUZZY_MIN_CONTAINMENT
+        ]
+        fuzzy.sort(key=lambda item: item[1], reverse=True)
+        fuzzy_ranking = [product_id for product_id, _ in fuzzy[:limit]]
+
+        return fuse_rankings(word_ranking, fuzzy_ranking)[:limit]
+
+
+SEARCH_BACKENDS = {
+    SQLiteFTSBackend.name: SQLiteFTSBackend,
+    PostgresSearchBackend.name: PostgresSearchBackend,
+    PythonSearchBackend.name: PythonSearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    Backend named by PRODUCT_SEARCH_BACKEND, or the best available for the
+    database when set to 'auto'
+    """
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')
+        if name in SEARCH_BACKENDS:
+            _backend = SEARCH_BACKENDS[name]()
+        else:
+            for backend_class in (SQLiteFTSBackend, PostgresSearchBackend, PythonSearchBackend):
+                if backend_class.is_available():
+                    _backend = backend_class()
+                    break
+    return _backend
+
+
+def search_products(query, limit=200):
+    """
+    Ranked [(product_id, score)] for a free-text query
+    """
+    try:
+        return get_search_backend().search(query, limit)
+    except Exception as e:
+        print(f"Error searching products: {e}")
+        return []
+
+
+def search_catalog(params, limit=500):
+    """
+    Products matching request parameters: facet filters plus ranked text
+    search on `q`. Returns (queryset, filters, search_ids, ordering) where
+    ordering is relevance for text searches and the chosen sort otherwise
+    """
+    from .facets import build_product_filters, combine_filters, discount_percent_expression
+    from .pagination import get_ordering
+
+    # Filters are kept per facet dimension so facet counts can drop their own
+    filters = build_product_filters(params)
+    queryset = Product.objects.annotate(discount_percent_annotated=discount_percent_expression())
+
+    q_text = (params.get('q') or '').strip()
+    search_ids = None
+    if q_text:
+        search_ids = [product_id for product_id, _ in search_products(q_text, limit=limit)]
+        relevance = Case(
+            *[When(pk=product_id, then=Value(position)) for position, product_id in enumerate(search_ids)],
+            default=Value(len(search_ids)),
+            output_field=IntegerField(),
+        )
+        queryset = queryset.filter(pk__in=search_ids).annotate(relevance=relevance)
+
+    ordering = ['relevance'] if search_ids is not None else get_ordering(params.get('sort_by') or params.get('sort'))
+    return queryset.filter(combine_filters(filters)), filters, search_ids, ordering
@@ -4,24 +4,33 @@ Analyzes product reviews and user feedback for sentiment insights
 """
 
 import re
+import time
 import numpy as np
 import pandas as pd
-from textblob import TextBlob
 from collections import defaultdict, Counter
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q, Count, Avg, Max, Min
+from django.db.models import Q, Count, Avg, Max, Min, StdDev
+from django.db.models.functions import TruncWeek
 from django.contrib.auth.models import User
 from .models import (
     Product, ProductReview, SentimentAnalysis, AspectSentiment, 
     SentimentTrend, UserBehavior
 )
+from .sentiment_scorers import get_scorer, label_for_score
+from .sentiment_cache import sentiment_cache_key
+from base.tracing import traced, current_span
+from base.metrics import SENTIMENT_JOBS, SENTIMENT_JOB_LATENCY, record_cache_lookup
 
 
 class SentimentAnalyzer:
     """Advanced sentiment analysis for product reviews"""
     
-    def __init__(self):
+    def __init__(self, scorer=None):
+        self.scorer = scorer or get_scorer()
+
         # Define aspect categories for footwear
         self.aspects = {
             'comfort': ['comfort', 'comfortable', 'cushion', 'cushioned', 'soft', 'support', 'supportive'],
@@ -67,6 +76,8 @@ class SentimentAnalyzer:
         """
         Analyze sentiment for a specific product
         """
+        start = time.perf_counter()
+        status = 'skipped'
         try:
             # Check if analysis exists and is recent
             if not force_recalculate and self._sentiment_is_recent(product):
@@ -82,12 +93,16 @@ class SentimentAnalyzer:
             SentimentAnalysis.objects.filter(review__product=product).delete()
             AspectSentiment.objects.filter(review__product=product).delete()
             
+            # Score every review in one batch
+            reviews = list(reviews)
+            scores = self._score_reviews(reviews)
+
             # Analyze overall sentiment
-            overall_sentiment = self._analyze_overall_sentiment(reviews)
+            overall_sentiment = self._analyze_overall_sentiment(reviews, scores)
             
             # Create overall sentiment record for each review
             for review in reviews:
-                review_sentiment = self._analyze_single_review_sentiment(review)
+                review_sentiment = self._analyze_single_review_sentiment(review, scores[review.uid])
                 SentimentAnalysis.objects.get_or_create(
                     review=review,
                     defaults={
@@ -112,12 +127,18 @@ class SentimentAnalyzer:
                     )
             
             # Update sentiment trends
-            self._update_sentiment_trends(product)
+            self._update_sentiment_trends(product, scores)
             
+            status = 'completed'
             print(f"Sentiment analysis completed for product: {product.product_name}")
             
         except Exception as e:
+            status = 'failed'
             print(f"Error analyzing sentiment for product {product.product_name}: {e}")
+        finally:
+            SENTIMENT_JOBS.inc(status=status)
+            if status != 'skipped':
+                SENTIMENT_JOB_LATENCY.observe(time.perf_counter() - start)
     
     def analyze_all_products_sentiment(self, force_recalculate=False):
         """
@@ -141,40 +162,43 @@ class SentimentAnalyzer:
         
         return recent_analysis is not None
     
-    def _analyze_overall_sentiment(self, reviews):
+    def _score_reviews(self, reviews):
+        """
+        Polarity of each review keyed by review uid, scored as one batch
+        """
+        reviews = list(reviews)
+        scores = self.scorer.score_batch([review.content or '' for review in reviews])
+        return {review.uid: score for review, score in zip(reviews, scores)}
+
+    def _analyze_overall_sentiment(self, reviews, scores=None):
         """
         Analyze overall sentiment from reviews
         """
-        total_reviews = reviews.count()
+        reviews = list(reviews)
+        scores = scores or self._score_reviews(reviews)
+        total_reviews = len(reviews)
         positive_count = 0
         negative_count = 0
         neutral_count = 0
         total_score = 0
         
         for review in reviews:
-            # Use TextBlob for sentiment analysis
-            blob = TextBlob(review.content or '')
-            sentiment_score = blob.sentiment.polarity
+            sentiment_score = scores[review.uid]
             
             total_score += sentiment_score
             
             # Categorize sentiment
-            if sentiment_score > 0.1:
+            label = label_for_score(sentiment_score)
+            if label == 'positive':
                 positive_count += 1
-            elif sentiment_score < -0.1:
+            elif label == 'negative':
                 negative_count += 1
             else:
                 neutral_count += 1
         
         # Calculate overall sentiment
         avg_score = total_score / total_reviews if total_reviews > 0 else 0
-        
-        if avg_score > 0.1:
-            overall_sentiment = 'positive'
-        elif avg_score < -0.1:
-            overall_sentiment = 'negative'
-        else:
-            overall_sentiment = 'neutral'
+        overall_sentiment = label_for_score(avg_score)
         
         # Calculate confidence based on review count and consistency
         confidence = min(1.0, total_reviews / 10)  # More reviews = higher confidence
@@ -189,19 +213,13 @@ class SentimentAnalyzer:
             'confidence': confidence
         }
     
-    def _analyze_single_review_sentiment(self, review):
+    def _analyze_single_review_sentiment(self, review, sentiment_score=None):
         """
         Analyze sentiment for a single review
         """
-        blob = TextBlob(review.content or '')
-        sentiment_score = blob.sentiment.polarity
-        
-        if sentiment_score > 0.1:
-            sentiment = 'positive'
-        elif sentiment_score < -0.1:
-            sentiment = 'negative'
-        else:
-            sentiment = 'neutral'
+        if sentiment_score is None:
+            sentiment_score = self.scorer.score(review.content or '')
+        sentiment = label_for_score(sentiment_score)
         
         # Calculate confidence based on review length and subjectivity
         confidence = min(1.0, len(review.content or '') / 100)  # Longer reviews = higher confidence
@@ -212,14 +230,15 @@ class SentimentAnalyzer:
             'confidence': confidence
         }
     
-    def _update_sentiment_trends(self, product):
+    def _update_sentiment_trends(self, product, scores=None):
         """
         Update sentiment trends for a product
         """
         from datetime import date
         
         # Get all reviews for the product
-        reviews = product.reviews.all()
+        reviews = list(product.reviews.all())
+        scores = scores or self._score_reviews(reviews)
         
         # Group by date
         daily_sentiments = {}
@@ -231,7 +250,7 @@ class SentimentAnalyzer:
                     'total_score': 0, 'count': 0
                 }
             
-            sentiment = self._analyze_single_review_sentiment(review)
+            sentiment = self._analyze_single_review_sentiment(review, scores.get(review.uid))
             daily_sentiments[review_date][sentiment['sentiment']] += 1
             daily_sentiments[review_date]['total_score'] += sentiment['score']
             daily_sentiments[review_date]['count'] += 1
@@ -401,52 +420,59 @@ class SentimentTrendAnalyzer:
         """
         Analyze sentiment trends for a product over time
         """
+        cache_key = sentiment_cache_key(product.uid, f'trends:{days}')
+        trend_data = cache.get(cache_key)
+        current_span().set(trend_cache_hit=trend_data is not None)
+        record_cache_lookup('sentiment_trends', trend_data is not None)
+        if trend_data is not None:
+            return trend_data or None
+
         try:
             # Get reviews from the specified time period
             start_date = timezone.now() - timedelta(days=days)
             reviews = product.reviews.filter(created_at__gte=start_date)
             
-            if not reviews.exists():
-                return None
-            
             # Group reviews by week
-            weekly_sentiments = self._group_reviews_by_week(reviews)
-            
-            # Calculate trend
-            trend_data = self._calculate_trend(weekly_sentiments)
-            
-            # Save trend data (using the existing _update_sentiment_trends method)
-            # The trend data is already being saved in _update_sentiment_trends
-            
-            return trend_data
+            weekly = self._group_reviews_by_week(reviews)
+            if not weekly:
+                trend_data = None
+            else:
+                # Calculate trend
+                trend_data = self._calculate_trend({
+                    row['week'].strftime('%Y-%W'): row['average'] for row in weekly
+                })
+                trend_data['weekly'] = [
+                    {
+                        'week': row['week'].date().isoformat(),
+                        'average': row['average'],
+                        'deviation': row['deviation'] or 0.0,
+                        'count': row['count'],
+                    }
+                    for row in weekly
+                ]
             
         except Exception as e:
             print(f"Error analyzing sentiment trends: {e}")
             return None
+
+        # Empty results are cached as {} so products without reviews stay cheap too
+        cache.set(cache_key, trend_data or {}, settings.SENTIMENT_CACHE_SECONDS)
+        return trend_data
     
     def _group_reviews_by_week(self, reviews):
         """
-        Group reviews by week and calculate average sentiment
-        """
-        weekly_data = defaultdict(list)
-        
-        for review in reviews:
-            # Get week start date
-            week_start = review.created_at - timedelta(days=review.created_at.weekday())
-            week_key = week_start.strftime('%Y-%W')
-            
-            # Calculate sentiment for this review
-            blob = TextBlob(review.content or '')
-            sentiment_score = blob.sentiment.polarity
-            
-            weekly_data[week_key].append(sentiment_score)
-        
-        # Calculate average sentiment for each week
-        weekly_sentiments = {}
-        for week, scores in weekly_data.items():
-            weekly_sentiments[week] = np.mean(scores)
-        
-        return weekly_sentiments
+        Per-week average, standard deviation and count of stored sentiment
+        scores, aggregated in the database from SentimentAnalysis rows
+        (reviews without one are skipped)
+        """
+        weekly = SentimentAnalysis.objects.filter(review__in=reviews).annotate(
+            week=TruncWeek('review__created_at')
+        ).values('week').annotate(
+            average=Avg('sentiment_score'),
+            deviation=StdDev('sentiment_score'),
+            count=Count('uid'),
+        ).order_by('week')
+        return list(weekly)
     
     def _calculate_trend(self, weekly_sentiments):
         """
@@ -499,20 +525,32 @@ class SentimentTrendAnalyzer:
         """
         Get comprehensive sentiment insights for a product
         """
+        cache_key = sentiment_cache_key(product.uid, 'insights')
+        insights = cache.get(cache_key)
+        current_span().set(cache_hit=insights is not None)
+        record_cache_lookup('sentiment_insights', insights is not None)
+        if insights is not None:
+            return insights or None
+
         try:
             # Get sentiment analysis
             sentiment_summary = self.sentiment_analyzer.get_product_sentiment_summary(product)
             
             if not sentiment_summary:
+                cache.set(cache_key, {}, settings.SENTIMENT_CACHE_SECONDS)
                 return None
             
-            # Get trend analysis (get the most recent trend)
-            trend = SentimentTrend.objects.filter(product=product).order_by('-date').first()
+            # Weekly trend over stored scores
+            trend = self.analyze_sentiment_trends(product) or {
+                'direction': 'stable',
+                'strength': 0.0,
+                'volatility': 0.0
+            }
             
             # Get recent reviews for detailed analysis
             recent_reviews = product.reviews.filter(
                 created_at__gte=timezone.now() - timedelta(days=30)
-            ).order_by('-created_at')[:10]
+            ).select_related('sentiment').order_by('-created_at')[:10]
             
             insights = {
                 'overall_sentiment': sentiment_summary['overall_sentiment'],
@@ -521,25 +559,27 @@ class SentimentTrendAnalyzer:
                 'review_stats': sentiment_summary['review_stats'],
                 'aspects': sentiment_summary['aspects'],
                 'trend': {
-                    'direction': 'stable',  # Simplified for now
-                    'strength': 0.0,
-                    'volatility': 0.0
+                    'direction': trend['direction'],
+                    'strength': float(trend['strength']),
+                    'volatility': float(trend['volatility'])
                 },
                 'recent_reviews': []
             }
             
             # Add recent review insights
             for review in recent_reviews:
-                blob = TextBlob(review.content or '')
+                # Stored analysis only; subjectivity is not persisted
+                analysis = getattr(review, 'sentiment', None)
                 insights['recent_reviews'].append({
                     'id': review.uid,
                     'text': (review.content or '')[:100] + '...' if len(review.content or '') > 100 else (review.content or ''),
-                    'sentiment_score': blob.sentiment.polarity,
-                    'subjectivity': blob.sentiment.subjectivity,
+                    'sentiment_score': analysis.sentiment_score if analysis else None,
+                    'subjectivity': None,
                     'rating': review.stars,
                     'date': review.date_added.strftime('%Y-%m-%d')
                 })
             
+            cache.set(cache_key, insights, settings.SENTIMENT_CACHE_SECONDS)
             return insights
             
         except Exception as e:
@@ -566,18 +606,21 @@ class SentimentService:
         """
         self.analyzer.analyze_all_products_sentiment(force_recalculate)
     
+    @traced('sentiment.summary')
     def get_product_sentiment(self, product):
         """
         Get sentiment summary for a product
         """
         return self.analyzer.get_product_sentiment_summary(product)
     
+    @traced('sentiment.trends')
     def analyze_sentiment_trends(self, product, days=30):
         """
         Analyze sentiment trends for a product
         """
         return self.trend_analyzer.analyze_sentiment_trends(product, days)
     
+    @traced('sentiment.insights')
     def get_sentiment_insights(self, product):
         """
         Get comprehensive sentiment insights
@@ -0,0 +1,40 @@
+"""
+Sentiment Cache Keys
+Versioned cache keys for per-product sentiment trends and insights. Kept free
+of the analysis stack so signals can invalidate without importing it
+"""
+
+import time
+from django.core.cache import cache
+
+
+def _version_key(product_id):
+    return f'sentiment:version:{product_id}'
+
+
+def _seed_version(product_id):
+    # A missing (culled) version restarts at the current time, never at a value used before
+    seed = time.time_ns()
+    cache.add(_version_key(product_id), seed, None)
+    return cache.get(_version_key(product_id), seed)
+
+
+def sentiment_cache_key(product_id, name):
+    """
+    Per-product cache key; bumping the product's version invalidates every
+    cached sentiment result for it at once
+    """
+    version = cache.get(_version_key(product_id))
+    if version is None:
+        version = _seed_version(product_id)
+    return f'sentiment:{name}:{product_id}:{version}'
+
+
+def invalidate_product_sentiment(product_id):
+    """
+    Drop cached trends/insights after a review or analysis of the product changes
+    """
+    try:
+        cache.incr(_version_key(product_id))
+    except ValueError:
+        _seed_version(product_id)
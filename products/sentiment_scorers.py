@@ -0,0 +1,208 @@
+"""
+Sentiment Scorers
+Pluggable polarity scorers for review text: TextBlob's pattern analyzer and a
+vectorized lexicon scorer that scores whole batches with NumPy
+"""
+
+import os
+import re
+from functools import lru_cache
+from itertools import repeat
+from xml.etree import ElementTree
+import numpy as np
+from django.conf import settings
+
+
+# Score thresholds used for positive/negative/neutral labels everywhere
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+NEGATIONS = ('no', 'not', 'never')
+# Documents in a batch are joined with NUL, which is tokenized as a boundary marker
+DOCUMENT_SEPARATOR = '\x00'
+# Tokens are runs of a-z joined by single inner hyphens or apostrophes
+# ("well-made", "it's"), plus the separator. Text is tokenized as ASCII bytes:
+# translate() blanks every other byte, STRAY_PUNCTUATION_RE blanks hyphens and
+# apostrophes that are not between two letters, and split() cuts the words
+TOKEN_BYTES = bytes(
+    byte if chr(byte) in "abcdefghijklmnopqrstuvwxyz-'" + DOCUMENT_SEPARATOR else ord(' ')
+    for byte in range(256)
+)
+STRAY_PUNCTUATION_RE = re.compile(rb"[-'](?:[-']+|(?<![a-z][-'])|(?![a-z]))")
+CONTRACTED_NEGATION_RE = re.compile(r"n't\b")
+
+
+def label_for_score(score):
+    if score > POSITIVE_THRESHOLD:
+        return 'positive'
+    if score < NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+class SentimentScorer:
+    """Scores text polarity in [-1, 1]"""
+
+    name = None
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts):
+        return [self.score(text) for text in texts]
+
+
+class TextBlobScorer(SentimentScorer):
+    """TextBlob's per-document pattern analyzer"""
+
+    name = 'textblob'
+
+    def score(self, text):
+        from textblob import TextBlob
+        return TextBlob(text or '').sentiment.polarity
+
+    def score_batch(self, texts):
+        return [self.score(text) for text in texts]
+
+
+class Lexicon:
+    """
+    TextBlob's English adjective/adverb lexicon compiled to arrays: a token
+    id lookup plus per-id polarity, intensity and modifier/negation flags.
+    The last id is reserved for unknown tokens
+    """
+
+    def __init__(self, path):
+        senses = {}
+        for word in ElementTree.parse(path).getroot().findall('word'):
+            form = word.attrib.get('form')
+            if not form:
+                continue
+            senses.setdefault(form.lower(), []).append((
+                word.attrib.get('pos'),
+                float(word.attrib.get('polarity', 0.0)),
+                float(word.attrib.get('intensity', 1.0)),
+            ))
+
+        forms = sorted(set(senses) | set(NEGATIONS)) + [DOCUMENT_SEPARATOR]
+        # Keyed by the ASCII bytes tokens; forms with other characters never match a token
+        self.index = {form.encode('ascii', 'replace'): position for position, form in enumerate(forms)}
+        size = len(forms) + 1
+
+        self.polarity = np.zeros(size, dtype=np.float64)
+        self.intensity = np.ones(size, dtype=np.float64)
+        self.known = np.zeros(size, dtype=bool)
+        self.modifier = np.zeros(size, dtype=bool)
+        self.negation = np.zeros(size, dtype=bool)
+
+        for position, form in enumerate(forms):
+            if form in senses:
+                # Average senses per part of speech, then across parts of speech
+                by_pos = {}
+                for pos, polarity, intensity in senses[form]:
+                    by_pos.setdefault(pos, []).append((polarity, intensity))
+                averaged = [np.mean(values, axis=0) for values in by_pos.values()]
+                self.polarity[position], self.intensity[position] = np.mean(averaged, axis=0)
+                self.known[position] = True
+                self.modifier[position] = 'RB' in by_pos
+            self.negation[position] = form in NEGATIONS
+
+        self.unknown = size - 1
+        self.separator = self.index[DOCUMENT_SEPARATOR.encode()]
+
+    def encode(self, tokens):
+        # map() runs the dict lookups and fromiter fills the array in one
+        # pass, without building an intermediate list of Python ints
+        return np.fromiter(
+            map(self.index.get, tokens, repeat(self.unknown)), dtype=np.int32, count=len(tokens)
+        )
+
+
+@lru_cache(maxsize=1)
+def get_lexicon():
+    import textblob.en
+    return Lexicon(os.path.join(os.path.dirname(textblob.en.__file__), 'en-sentiment.xml'))
+
+
+class LexiconScorer(SentimentScorer):
+    """
+    Batch scorer following TextBlob's assessment rules: each known word is an
+    assessment, a preceding known adverb multiplies it by its intensity
+    (divides, when the adverb is negated), a preceding negation multiplies it
+    by -0.5, and a document's polarity is the
+    mean of its assessments. All documents in a batch are scored at once with
+    flat token arrays and segment sums
+    """
+
+    name = 'lexicon'
+
+    def tokenize(self, text):
+        """
+        Lowercased word tokens of `text` as ASCII bytes; non-ASCII characters
+        become '?' and so split words, as they are not letters to the tokenizer
+        """
+        text = CONTRACTED_NEGATION_RE.sub(' not', text.lower())
+        text = text.encode('ascii', 'replace').translate(TOKEN_BYTES)
+        return STRAY_PUNCTUATION_RE.sub(b' ', text).split()
+
+    def score_batch(self, texts):
+        if not texts:
+            return []
+
+        lexicon = get_lexicon()
+        # One tokenizer pass over the whole batch; separators mark document ends
+        joined = f' {DOCUMENT_SEPARATOR} '.join(
+            (text or '').replace(DOCUMENT_SEPARATOR, ' ') for text in texts
+        )
+        ids = lexicon.encode(self.tokenize(joined))
+        is_separator = ids == lexicon.separator
+        doc_ids = np.cumsum(is_separator)[~is_separator]
+        ids = ids[~is_separator]
+        if not len(ids):
+            return [0.0] * len(texts)
+
+        same_doc_as_prev = np.zeros(len(ids), dtype=bool)
+        same_doc_as_prev[1:] = doc_ids[1:] == doc_ids[:-1]
+
+        known = lexicon.known[ids]
+        polarity = lexicon.polarity[ids]
+
+        # A known word right after a known adverb is folded into the adverb's
+        # assessment ("very good" is one assessment of polarity good * 1.3)
+        after_modifier = np.zeros(len(ids), dtype=bool)
+        after_modifier[1:] = lexicon.modifier[ids[:-1]] & known[:-1]
+        merged = known & after_modifier & same_doc_as_prev
+        assessed = known & ~merged
+
+        # "not good" is slightly bad, "not bad" slightly good
+        negated = np.zeros(len(ids), dtype=bool)
+        negated[1:] = lexicon.negation[ids[:-1]]
+        negated &= same_doc_as_prev & assessed
+
+        values = polarity.copy()
+        merged_positions = np.flatnonzero(merged)
+        heads = merged_positions - 1
+        # A negated adverb weakens instead of strengthens ("not very good" is good / 1.3)
+        intensity = lexicon.intensity[ids[heads]]
+        intensity = np.where(negated[heads], 1.0 / intensity, intensity)
+        values[heads] = np.clip(polarity[merged_positions] * intensity, -1.0, 1.0)
+        values = np.where(negated, values * -0.5, values)
+
+        sums = np.bincount(doc_ids, weights=np.where(assessed, values, 0.0), minlength=len(texts))
+        counts = np.bincount(doc_ids, weights=assessed.astype(np.float64), minlength=len(texts))
+        scores = np.divide(sums, counts, out=np.zeros(len(texts)), where=counts > 0)
+        return np.clip(scores, -1.0, 1.0).tolist()
+
+
+SCORERS = {
+    TextBlobScorer.name: TextBlobScorer,
+    LexiconScorer.name: LexiconScorer,
+}
+
+
+def get_scorer(name=None):
+    """
+    Scorer named by `name` or the SENTIMENT_SCORER setting
+    """
+    name = name or getattr(settings, 'SENTIMENT_SCORER', TextBlobScorer.name)
+    return SCORERS[name]()
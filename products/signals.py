@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import (
+    Product, ProductImage, Category, Brand, ProductReview, SentimentAnalysis, AspectSentiment,
+    UserBehavior
+)
+from products.sentiment_cache import invalidate_product_sentiment
+from base.metrics import BEHAVIOR_EVENTS
+
+
+@receiver(post_save, sender=ProductImage)
+def hash_uploaded_image(sender, instance, created, **kwargs):
+    if created and instance.image:
+        from products.image_hashing import ImageHashingService
+        transaction.on_commit(lambda: ImageHashingService().index_image(instance))
+
+
+def _generate_derivatives(image_field):
+    from products.image_derivatives import generate_derivatives
+    try:
+        generate_derivatives(image_field.path)
+    except Exception as e:
+        print(f"Error generating derivatives for {image_field.name}: {e}")
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(lambda: _generate_derivatives(instance.image))
+
+
+@receiver(post_save, sender=Category)
+def category_image_derivatives(sender, instance, **kwargs):
+    if instance.category_image:
+        transaction.on_commit(lambda: _generate_derivatives(instance.category_image))
+
+
+@receiver(post_save, sender=Brand)
+def brand_logo_derivatives(sender, instance, **kwargs):
+    if instance.logo:
+        transaction.on_commit(lambda: _generate_derivatives(instance.logo))
+
+
+def _reindex_products(product_ids):
+    from products.search import get_search_backend
+    try:
+        get_search_backend().index_products(product_ids)
+    except Exception as e:
+        print(f"Error updating search index: {e}")
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _reindex_products([instance.pk]))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    from products.search import get_search_backend
+    product_id = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove_products([product_id]))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def reindex_renamed_products(sender, instance, created, **kwargs):
+    # Brand and category names are indexed on each of their products
+    if not created:
+        product_ids = list(instance.products.values_list('pk', flat=True))
+        if product_ids:
+            transaction.on_commit(lambda: _reindex_products(product_ids))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_facets(sender, **kwargs):
+    from products.facets import bump_catalog_version
+    transaction.on_commit(bump_catalog_version)
+
+
+def _invalidate_sentiment(product_id):
+    transaction.on_commit(lambda: invalidate_product_sentiment(product_id))
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def review_changed(sender, instance, **kwargs):
+    _invalidate_sentiment(instance.product_id)
+
+
+@receiver(post_save, sender=SentimentAnalysis)
+@receiver(post_delete, sender=SentimentAnalysis)
+@receiver(post_save, sender=AspectSentiment)
+@receiver(post_delete, sender=AspectSentiment)
+def review_analysis_changed(sender, instance, **kwargs):
+    product_id = ProductReview.objects.filter(pk=instance.review_id).values_list('product_id', flat=True).first()
+    if product_id:
+        _invalidate_sentiment(product_id)
+
+
+@receiver(post_save, sender=UserBehavior)
+def count_behavior_event(sender, instance, **kwargs):
+    BEHAVIOR_EVENTS.inc(behavior_type=instance.behavior_type)
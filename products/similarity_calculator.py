@@ -14,6 +14,7 @@ from .models import (
     Product, UserBehavior, UserSimilarity, ProductSimilarity, 
     UserRating, ProductReview, Category, Brand
 )
+from base.metrics import MODEL_FIT_LATENCY
 
 
 class SimilarityCalculator:
@@ -22,6 +23,7 @@ class SimilarityCalculator:
     def __init__(self):
         self.scaler = StandardScaler()
     
+    @MODEL_FIT_LATENCY.timed(model='user_similarity')
     def calculate_user_similarities(self, force_recalculate=False):
         """
         Calculate similarities between all users
@@ -61,6 +63,7 @@ class SimilarityCalculator:
         except Exception as e:
             print(f"Error calculating user similarities: {e}")
     
+    @MODEL_FIT_LATENCY.timed(model='product_similarity')
     def calculate_product_similarities(self, force_recalculate=False):
         """
         Calculate similarities between all products
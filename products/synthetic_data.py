@@ -0,0 +1,250 @@
+"""
+Synthetic Data Generator
+Bulk-creates power-law catalogs, users, behaviors and reviews at configurable
+sizes so recommenders can be benchmarked on a throwaway SQLite database
+"""
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils.text import slugify
+from accounts.models import Profile
+from .models import Brand, Category, Product, ProductReview, UserBehavior
+
+
+CATEGORY_NAMES = ['Running', 'Casual', 'Formal', 'Outdoor', 'Sports', 'Sandals', 'Boots', 'Kids']
+BRAND_NAMES = [
+    'Nike', 'Adidas', 'Puma', 'Reebok', 'New Balance', 'Converse',
+    'Vans', 'Crocs', 'Bata', 'Woodland', 'Sparx', 'Liberty',
+]
+# Vocabulary shared with ProductFeatureExtractor so text features are populated
+STYLES = ['casual', 'formal', 'sporty', 'elegant', 'trendy', 'classic']
+MATERIALS = ['leather', 'canvas', 'mesh', 'suede', 'synthetic', 'rubber']
+COLORS = ['black', 'white', 'red', 'blue', 'brown', 'grey']
+NOUNS = ['Runner', 'Sneaker', 'Loafer', 'Trail', 'Slip-On', 'Trainer', 'Boot', 'Sandal']
+
+# (behavior type, share of events, weight)
+BEHAVIOR_MIX = [
+    ('view', 0.70, 1.0),
+    ('cart_add', 0.12, 1.0),
+    ('wishlist', 0.08, 1.0),
+    ('purchase', 0.07, 1.0),
+    ('review', 0.03, 1.0),
+]
+REVIEW_PHRASES = {
+    5: ['absolutely love them', 'very comfortable', 'excellent quality', 'perfect fit'],
+    4: ['really good shoes', 'nice design', 'comfortable enough', 'good value'],
+    3: ['okay for the price', 'average quality', 'fit is a bit tight', 'not bad'],
+    2: ['not comfortable', 'cheap material', 'poor stitching', 'disappointing'],
+    1: ['terrible quality', 'awful fit', 'fell apart quickly', 'waste of money'],
+}
+
+
+class SyntheticDataGenerator:
+    """Generates a reproducible synthetic shop dataset with bulk inserts"""
+
+    def __init__(self, users=1000, products=500, behaviors_per_user=20, review_rate=0.3,
+                 zipf_exponent=1.1, seed=42, batch_size=5000, stdout=None):
+        self.n_users = users
+        self.n_products = products
+        self.behaviors_per_user = behaviors_per_user
+        self.review_rate = review_rate
+        self.zipf_exponent = zipf_exponent
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.stdout = stdout
+        self.last_existing_user_id = 0
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def _bulk_create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def _popularity(self, size):
+        """
+        Power-law (Zipf) probabilities over `size` items in a random order
+        """
+        weights = 1.0 / np.arange(1, size + 1) ** self.zipf_exponent
+        self.rng.shuffle(weights)
+        return weights / weights.sum()
+
+    def _configure_connection(self):
+        # The target is a throwaway database: trade durability for insert speed
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+                cursor.execute('PRAGMA journal_mode = MEMORY')
+
+    def generate_catalog(self):
+        categories = [Category(category_name=name, slug=slugify(name)) for name in CATEGORY_NAMES]
+        brands = [Brand(name=name) for name in BRAND_NAMES]
+        self._bulk_create(Category, categories)
+        self._bulk_create(Brand, brands)
+        categories = list(Category.objects.filter(category_name__in=CATEGORY_NAMES))
+        brands = list(Brand.objects.filter(name__in=BRAND_NAMES))
+
+        rng = self.rng
+        prices = np.round(rng.lognormal(mean=8.0, sigma=0.5, size=self.n_products), -1).astype(int)
+        discounted = rng.random(self.n_products) < 0.3
+        discount_rates = rng.uniform(0.05, 0.5, size=self.n_products)
+        category_choice = rng.integers(len(categories), size=self.n_products)
+        brand_choice = rng.choice(len(brands), size=self.n_products, p=self._popularity(len(brands)))
+
+        products = []
+        for i in range(self.n_products):
+            brand = brands[brand_choice[i]]
+            style, material, color = STYLES[i % len(STYLES)], MATERIALS[i % len(MATERIALS)], COLORS[i % len(COLORS)]
+            name = f'{brand.name} {NOUNS[i % len(NOUNS)]} {i}'
+            products.append(Product(
+                product_name=name,
+                slug=f'synthetic-{slugify(name)}',
+                category=categories[category_choice[i]],
+                brand=brand,
+                price=int(prices[i]),
+                discounted_price=round(prices[i] * (1 - discount_rates[i]), 2) if discounted[i] else None,
+                product_desription=f'A {style} {color} {material} shoe from {brand.name}.',
+                newest_product=bool(rng.random() < 0.1),
+                is_trending=bool(rng.random() < 0.05),
+                is_men=bool(rng.random() < 0.5),
+                is_women=bool(rng.random() < 0.5),
+            ))
+        self._bulk_create(Product, products)
+        self._log(f'Created {self.n_products} products')
+
+    def generate_users(self):
+        password = make_password(None)  # Unusable; synthetic users never log in
+        start = User.objects.count()
+        # Behaviors and reviews are only generated for users created by this run
+        self.last_existing_user_id = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        for offset in range(0, self.n_users, self.batch_size):
+            count = min(self.batch_size, self.n_users - offset)
+            users = [
+                User(username=f'synthetic_{start + offset + i}', email=f'synthetic_{start + offset + i}@example.com', password=password)
+                for i in range(count)
+            ]
+            self._bulk_create(User, users)
+
+        # bulk_create skips the post_save signal that creates profiles
+        users_without_profile = User.objects.filter(username__startswith='synthetic_', profile__isnull=True)
+        while True:
+            ids = list(users_without_profile.values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                break
+            self._bulk_create(Profile, [Profile(user_id=user_id, is_email_verified=True) for user_id in ids])
+        self._log(f'Created {self.n_users} users')
+
+    def generate_behaviors(self):
+        """
+        Events per user follow a Pareto distribution around `behaviors_per_user`
+        and products are drawn from the Zipf popularity curve
+        """
+        rng = self.rng
+        user_ids = np.array(
+            User.objects.filter(username__startswith='synthetic_', id__gt=self.last_existing_user_id)
+            .order_by('id').values_list('id', flat=True)
+        )
+        product_ids = list(Product.objects.filter(slug__startswith='synthetic-').values_list('uid', flat=True))
+        if not len(user_ids) or not product_ids:
+            return 0
+
+        popularity = self._popularity(len(product_ids))
+        shares = np.array([share for _, share, _ in BEHAVIOR_MIX])
+        counts = np.minimum(
+            np.maximum(1, (rng.pareto(2.0, size=len(user_ids)) + 1) * self.behaviors_per_user / 2).astype(int),
+            len(product_ids),
+        )
+
+        written = 0
+        # Chunk by users so memory stays flat at large sizes
+        users_per_chunk = max(1, self.batch_size // max(1, self.behaviors_per_user))
+        for start in range(0, len(user_ids), users_per_chunk):
+            chunk_users = user_ids[start:start + users_per_chunk]
+            chunk_counts = counts[start:start + len(chunk_users)]
+            users = np.repeat(chunk_users, chunk_counts)
+            products = rng.choice(len(product_ids), size=len(users), p=popularity)
+            types = rng.choice(len(BEHAVIOR_MIX), size=len(users), p=shares)
+
+            # One event per (user, product, type), as the unique constraint requires
+            keys = np.unique(np.stack([users, products, types], axis=1), axis=0)
+            self._bulk_create(UserBehavior, [
+                UserBehavior(
+                    user_id=int(user_id),
+                    product_id=product_ids[product],
+                    behavior_type=BEHAVIOR_MIX[behavior][0],
+                    weight=BEHAVIOR_MIX[behavior][2],
+                )
+                for user_id, product, behavior in keys
+            ])
+            written += len(keys)
+
+        self._log(f'Created {written} behaviors')
+        return written
+
+    def generate_reviews(self):
+        """
+        Reviews for a share of purchases; ratings follow a per-product quality
+        so sentiment differs between products
+        """
+        rng = self.rng
+        purchases = list(
+            UserBehavior.objects.filter(
+                behavior_type='purchase', product__slug__startswith='synthetic-',
+                user_id__gt=self.last_existing_user_id,
+            ).values_list('user_id', 'product_id')
+        )
+        if not purchases:
+            return 0
+
+        quality = {}
+        reviews = []
+        for user_id, product_id in purchases:
+            if rng.random() >= self.review_rate:
+                continue
+            if product_id not in quality:
+                quality[product_id] = rng.normal(3.8, 0.8)
+            stars = int(np.clip(np.rint(rng.normal(quality[product_id], 0.9)), 1, 5))
+            phrases = rng.choice(REVIEW_PHRASES[stars], size=2, replace=False)
+            reviews.append(ProductReview(
+                product_id=product_id, user_id=user_id, stars=stars,
+                content=f'{phrases[0].capitalize()}, {phrases[1]}.',
+            ))
+        self._bulk_create(ProductReview, reviews)
+        self._log(f'Created {len(reviews)} reviews')
+        return len(reviews)
+
+    def spread_timestamps(self, days=90):
+        """
+        auto_now_add stamps every row with the insert time; spread events over
+        the last `days` days so time-based code sees realistic history
+        """
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE products_userbehavior SET timestamp = "
+                "datetime(timestamp, '-' || (abs(random()) %% %s) || ' minutes')",
+                [days * 24 * 60],
+            )
+            cursor.execute(
+                "UPDATE products_productreview SET date_added = "
+                "datetime(date_added, '-' || (abs(random()) %% %s) || ' minutes')",
+                [days * 24 * 60],
+            )
+
+    def generate(self):
+        self._configure_connection()
+        with transaction.atomic():
+            self.generate_catalog()
+            self.generate_users()
+            self.generate_behaviors()
+            self.generate_reviews()
+            self.spread_timestamps()
+        return {
+            'users': User.objects.count(),
+            'products': Product.objects.count(),
+            'behaviors': UserBehavior.objects.count(),
+            'reviews': ProductReview.objects.count(),
+        }
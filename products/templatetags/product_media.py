@@ -0,0 +1,20 @@
+from django import template
+from products.image_derivatives import derivative_url, derivative_srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image_field, size='card', fmt=None):
+    """
+    Usage: <img src="{% thumbnail_url product.product_images.first.image 'card' %}">
+    """
+    return derivative_url(image_field, size, fmt)
+
+
+@register.simple_tag
+def thumbnail_srcset(image_field, fmt=None):
+    """
+    Usage: <img srcset="{% thumbnail_srcset image.image %}" sizes="...">
+    """
+    return derivative_srcset(image_field, fmt)
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import os
+import json
+import uuid
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from base.testing import QueryBudgetMixin
+import numpy as np
+from products.factor_store import IdIndex, MANIFEST, load_factor_models, save_factor_models
+from products.image_derivatives import generate_derivatives
+from products.ann_index import RandomProjectionLSHIndex
+from products.facets import (
+    CATALOG_VERSION_KEY, FacetService, build_product_filters, bump_catalog_version, get_catalog_version
+)
+from products.pagination import SORT_ORDERINGS, CursorPaginator, encode_cursor, paginate
+from products.models import Category, HashBucket, Product, ProductHash, ProductReview
+from products.sentiment_cache import sentiment_cache_key
+from products.sentiment_scorers import LexiconScorer, TextBlobScorer
+from products.warmup import should_warm_up, skip_warm_up, warmup_state
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogVersionTests(TestCase):
+    def test_evicted_version_never_repeats(self):
+        seen = {get_catalog_version()}
+        bump_catalog_version()
+        seen.add(get_catalog_version())
+
+        cache.delete(CATALOG_VERSION_KEY)
+        self.assertNotIn(get_catalog_version(), seen)
+        seen.add(get_catalog_version())
+
+        cache.delete(CATALOG_VERSION_KEY)
+        bump_catalog_version()
+        self.assertNotIn(get_catalog_version(), seen)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SentimentCacheTests(TestCase):
+    def test_review_changes_invalidate_cached_sentiment(self):
+        category = Category.objects.create(category_name='Running', slug='running')
+        product = Product.objects.create(
+            product_name='Runner', slug='runner', category=category, price=100, product_desription='Shoe')
+        user = User.objects.create_user(username='reviewer', password='secret')
+        key = sentiment_cache_key(product.uid, 'insights')
+        self.assertEqual(sentiment_cache_key(product.uid, 'insights'), key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(product=product, user=user, stars=5, content='Great')
+        self.assertNotEqual(sentiment_cache_key(product.uid, 'insights'), key)
+
+
+class LexiconTokenizerTests(SimpleTestCase):
+    def test_keeps_inner_punctuation_and_drops_stray_punctuation(self):
+        tokens = LexiconScorer().tokenize("Well-made, 'GREAT' -- isn't it? Café -nice-")
+        self.assertEqual(tokens, [b'well-made', b'great', b'is', b'not', b'it', b'caf', b'nice'])
+
+
+@override_settings(WARMUP_ON_STARTUP=True)
+class ShouldWarmUpTests(SimpleTestCase):
+    @mock.patch.dict(os.environ, {'RUN_MAIN': 'true'})
+    def test_serving_processes_warm_up(self):
+        self.assertTrue(should_warm_up(['/venv/bin/gunicorn', 'ecomm.wsgi', '--preload']))
+        self.assertTrue(should_warm_up(['uwsgi', '--module', 'ecomm.wsgi']))
+        self.assertTrue(should_warm_up(['manage.py', 'runserver']))
+
+    @mock.patch.dict(os.environ, {'RUN_MAIN': 'true'})
+    def test_other_entry_points_do_not(self):
+        self.assertFalse(should_warm_up(['/venv/bin/pytest']))
+        self.assertFalse(should_warm_up(['/venv/bin/celery', '-A', 'ecomm', 'worker']))
+        self.assertFalse(should_warm_up(['scripts/import_catalog.py']))
+        self.assertFalse(should_warm_up(['manage.py', 'migrate']))
+
+    @mock.patch.dict(os.environ, {'WARMUP_SERVER': '1'})
+    def test_explicit_flag_warms_up_any_server(self):
+        self.assertTrue(should_warm_up(['/venv/bin/daphne', 'ecomm.asgi:application']))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='secret')
+        category = Category.objects.create(category_name='Running', slug='running')
+        self.products = [
+            Product.objects.create(
+                product_name=f'Runner {i}', slug=f'runner-{i}', category=category, price=100 + i,
+                product_desription='Comfortable running shoe')
+            for i in range(5)
+        ]
+        for product in self.products:
+            ProductReview.objects.create(
+                product=product, user=self.user, stars=4, content='Very comfortable and great quality')
+        self.client.login(username='shopper', password='secret')
+
+    def test_product_page(self):
+        self.assertWithinQueryBudget(reverse('get_product', args=[self.products[0].slug]))
+
+    def test_catalog_and_recommendation_apis(self):
+        product_id = self.products[0].uid
+        for path in (
+            reverse('api_products'),
+            reverse('api_content_recommendations'),
+            reverse('api_user_preferences'),
+            reverse('api_product_features', args=[product_id]),
+            reverse('api_content_filtering_stats'),
+            reverse('api_collaborative_filtering_stats'),
+        ):
+            with self.subTest(path=path):
+                self.assertWithinQueryBudget(path)
+
+    def test_sentiment_apis(self):
+        product_id = self.products[0].uid
+        for path in (
+            reverse('api_product_sentiment', args=[product_id]),
+            reverse('api_sentiment_insights', args=[product_id]),
+            reverse('api_top_sentiment_products'),
+        ):
+            with self.subTest(path=path):
+                self.assertWithinQueryBudget(path)
+
+
+class ImageDerivativeTests(SimpleTestCase):
+    def test_concurrent_renders_of_one_image_do_not_collide(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            source = os.path.join(media_root, 'shoe.jpg')
+            Image.new('RGB', (64, 48), (200, 40, 40)).save(source)
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                jobs = [pool.submit(generate_derivatives, source, [32], ['jpeg'], True) for _ in range(16)]
+                self.assertEqual([job.result() for job in jobs], [1] * 16)
+
+            written = [name for _, _, names in os.walk(media_root) for name in names]
+            self.assertEqual(sorted(written), ['32.jpeg', 'shoe.jpg'])
+
+
+@override_settings(WARMUP_ON_STARTUP=True)
+class ReadinessTests(SimpleTestCase):
+    def setUp(self):
+        saved = dict(warmup_state)
+        self.addCleanup(warmup_state.update, saved)
+
+    def test_pending_warmup_is_not_ready(self):
+        warmup_state.update(status='pending')
+        self.assertEqual(self.client.get(reverse('readiness')).status_code, 503)
+
+    def test_process_that_skipped_warmup_is_ready(self):
+        skip_warm_up()
+        response = self.client.get(reverse('readiness'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'skipped')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FacetFlagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(category_name='Running', slug='running')
+        for name, is_men in (('Men', True), ('Women', False)):
+            Product.objects.create(
+                product_name=name, slug=name.lower(), category=self.category, price=100,
+                product_desription='Shoe', is_men=is_men)
+
+    def test_empty_flag_is_no_filter(self):
+        self.assertNotIn('is_men', build_product_filters(QueryDict('is_men=')))
+
+        service = FacetService()
+        for query_string in ('is_men=', ''):
+            categories = service.get_facets(QueryDict(query_string))['categories']
+            self.assertEqual(categories[0]['count'], 2, query_string)
+
+    def test_repeated_flag_is_order_independent(self):
+        service = FacetService()
+        first, second = QueryDict('is_men=true&is_men=false'), QueryDict('is_men=false&is_men=true')
+        self.assertEqual(service.normalize(first), service.normalize(second))
+        self.assertEqual(build_product_filters(first)['is_men'], build_product_filters(second)['is_men'])
+
+
+class IdIndexTests(SimpleTestCase):
+    def test_uuid_positions(self):
+        ids = sorted([uuid.uuid4() for _ in range(5)], key=lambda value: value.bytes)
+        index = IdIndex.from_ids(ids)
+        self.assertEqual(index.keys.dtype, np.dtype('S16'))
+        self.assertEqual([index.position(value) for value in ids], list(range(5)))
+        self.assertEqual(index.position(str(ids[3])), 3)
+        self.assertEqual(index.ids(), ids)
+
+    def test_int_positions(self):
+        index = IdIndex.from_ids([3, 8, 21])
+        self.assertEqual(index.keys.dtype, np.int32)
+        self.assertEqual([index.position(value) for value in (3, 8, 21)], [0, 1, 2])
+        self.assertEqual(index.id_at(2), 21)
+        self.assertEqual(IdIndex.from_ids([1, 2 ** 40]).keys.dtype, np.int64)
+
+    def test_unknown_ids(self):
+        index = IdIndex.from_ids([3, 8, 21])
+        for value in (0, 9, 99, 'nine', None):
+            self.assertIsNone(index.position(value))
+        self.assertNotIn(9, index)
+        self.assertIsNone(IdIndex.from_ids([uuid.uuid4()]).position('not-a-uuid'))
+
+    def test_uuids_ending_in_zero_bytes(self):
+        # NumPy strips trailing NULs from S16 values; lookups and decoding must not
+        ids = [uuid.UUID(bytes=b'\x01' * 12 + b'\0' * 4), uuid.UUID(bytes=b'\x02' * 15 + b'\0')]
+        index = IdIndex.from_ids(ids)
+        self.assertEqual([index.position(value) for value in ids], [0, 1])
+        self.assertEqual(index.ids(), ids)
+
+    def test_rejects_unsorted_ids(self):
+        with self.assertRaises(ValueError):
+            IdIndex.from_ids([8, 3])
+
+
+class FactorStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.user_index = IdIndex.from_ids([1, 2, 3])
+        self.item_index = IdIndex.from_ids(sorted([uuid.uuid4() for _ in range(4)], key=lambda value: value.bytes))
+
+    def _save(self, scale=1.0):
+        models = {'svd': (np.ones((3, 2)) * scale, np.arange(8, dtype=np.float64).reshape(4, 2) * scale)}
+        return save_factor_models(self.directory, self.user_index, self.item_index, models)
+
+    def test_round_trip(self):
+        self._save()
+        user_index, item_index, models = load_factor_models(self.directory)
+        self.assertEqual(user_index.ids(), [1, 2, 3])
+        self.assertEqual(item_index.ids(), self.item_index.ids())
+        user_factors, item_factors = models['svd']
+        self.assertEqual(item_factors.dtype, np.float32)
+        np.testing.assert_array_equal(item_factors, np.arange(8).reshape(4, 2))
+        np.testing.assert_array_equal(user_factors, np.ones((3, 2)))
+
+    def test_saves_are_versioned_and_old_versions_pruned(self):
+        for scale in (1.0, 2.0, 3.0):
+            self._save(scale)
+        versions = sorted(name for name in os.listdir(self.directory) if name.startswith('v'))
+        self.assertEqual(len(versions), 2)
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            self.assertEqual(json.load(f)['version'], versions[-1])
+        np.testing.assert_array_equal(load_factor_models(self.directory)[2]['svd'][0], np.full((3, 2), 3.0))
+
+    def test_rejects_arrays_that_do_not_match_the_manifest(self):
+        self._save()
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        version_dir = os.path.join(self.directory, manifest['version'])
+        np.save(os.path.join(version_dir, 'svd_item_factors.npy'), np.zeros((5, 2), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            load_factor_models(self.directory)
+
+
+class FactorLSHPersistTests(TestCase):
+    def test_each_model_keeps_its_own_hashes(self):
+        category = Category.objects.create(category_name='Running', slug='running')
+        product_ids = [
+            Product.objects.create(
+                product_name=f'Runner {i}', slug=f'runner-{i}', category=category, price=100,
+                product_desription='Shoe').uid
+            for i in range(6)
+        ]
+        rng = np.random.default_rng(0)
+        for name in ('mf', 'svd', 'nmf'):
+            index = RandomProjectionLSHIndex(n_tables=2, n_bits=1)
+            index.build(rng.normal(size=(len(product_ids), 4)), product_ids)
+            index.persist(name)
+
+        for name in ('mf', 'svd', 'nmf'):
+            self.assertEqual(ProductHash.objects.filter(hash_type=f'factor_{name}').count(), 6)
+            self.assertTrue(HashBucket.objects.filter(hash_type=f'factor_{name}').exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(category_name='Running', slug='running')
+        now = timezone.now()
+        # Prices repeat so every sort has to fall back on the uid tiebreaker
+        for i, price in enumerate([100, 100, 100, 250, 250, 80, 100]):
+            product = Product.objects.create(
+                product_name=f'Runner {i}', slug=f'runner-{i}', category=self.category, price=price,
+                product_desription='Shoe')
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(hours=i % 3))
+        self.factory = RequestFactory()
+
+    def _walk(self, ordering, per_page=3):
+        paginator = CursorPaginator(Product.objects.all(), per_page, ordering)
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append([product.uid for product in page])
+            if not page.has_next():
+                return pages, paginator
+            cursor = page.next_cursor
+
+    def _expected(self, ordering):
+        products = list(Product.objects.all())
+        # The paginator's tiebreaker follows the direction of the last sort field
+        tiebreaker = '-uid' if ordering[-1].startswith('-') else 'uid'
+        for name in reversed(ordering + [tiebreaker]):
+            products.sort(key=lambda product: getattr(product, name.lstrip('-')), reverse=name.startswith('-'))
+        return [product.uid for product in products]
+
+    def test_forward_pages_across_equal_sort_keys(self):
+        pages, paginator = self._walk(['price'], per_page=2)
+        self.assertEqual([uid for page in pages for uid in page], self._expected(['price']))
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        # Paging back from the second page returns the first
+        second = paginator.page(paginator.page().next_cursor)
+        self.assertEqual([product.uid for product in paginator.page(second.previous_cursor)], pages[0])
+
+    def test_every_sort(self):
+        for sort, ordering in SORT_ORDERINGS.items():
+            with self.subTest(sort=sort):
+                pages, _ = self._walk(ordering)
+                self.assertEqual([uid for page in pages for uid in page], self._expected(ordering))
+
+    def test_malformed_or_tampered_cursor_returns_first_page(self):
+        first_page = [product.uid for product in CursorPaginator(Product.objects.all(), 3, ['price']).page()]
+        for cursor in (
+            'not-a-cursor', '!!!', 'e30',
+            encode_cursor([100], 'n'),  # Wrong length for the ordering
+            encode_cursor(['cheap', 'not-a-uuid'], 'n'),
+            encode_cursor([[100], {'uid': 1}], 'n'),
+            encode_cursor([float('inf'), str(uuid.uuid4())], 'n'),
+            encode_cursor([None, None], 'p'),
+        ):
+            with self.subTest(cursor=cursor):
+                page = paginate(self.factory.get('/', {'cursor': cursor}), Product.objects.all(), 3, ['price'])
+                self.assertEqual([product.uid for product in page], first_page)
+
+    def test_tampered_cursor_in_a_view_is_not_a_server_error(self):
+        cursor = encode_cursor([float('inf'), str(uuid.uuid4())], 'n')
+        response = self.client.get(reverse('product_search'), {'sort': 'priceAsc', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+
+
+class LexiconScorerTests(SimpleTestCase):
+    # Phrases on which the lexicon scorer must reproduce TextBlob exactly
+    PHRASES = [
+        'This shoe is good',
+        'The fit is terrible',
+        'This shoe is not good',        # Negation
+        'not bad at all',
+        'Never comfortable',
+        'very comfortable',             # Intensifier
+        'extremely bad quality',
+        'not very comfortable',         # Negated intensifier
+        'very',                         # Adverb with nothing to modify
+        'not',
+        'Nothing to say here',          # No known words
+        '',
+    ]
+
+    def test_scores_match_textblob(self):
+        lexicon_scores = LexiconScorer().score_batch(self.PHRASES + [None])
+        textblob_scores = TextBlobScorer().score_batch(self.PHRASES + [''])
+        for phrase, lexicon_score, textblob_score in zip(self.PHRASES + [None], lexicon_scores, textblob_scores):
+            with self.subTest(phrase=phrase):
+                self.assertAlmostEqual(lexicon_score, textblob_score, places=9)
+
+    def test_documents_do_not_leak_into_each_other(self):
+        scorer = LexiconScorer()
+        # A trailing negation or adverb must not reach the next document's first word
+        self.assertEqual(scorer.score_batch(['not', 'good']), [0.0, 0.7])
+        self.assertEqual(scorer.score_batch(['very', 'good']), [0.2, 0.7])
+        # A NUL inside a document is a space, not a document boundary
+        self.assertAlmostEqual(
+            scorer.score_batch(['Great\x00terrible'])[0], TextBlobScorer().score('Great terrible'), places=9)
+        self.assertEqual(len(scorer.score_batch(['good\x00bad', 'fine'])), 2)
+
+    def test_contracted_negation_is_expanded(self):
+        # Deliberate difference: TextBlob reads "isn't good" as 0.7
+        self.assertAlmostEqual(LexiconScorer().score_batch(["It isn't good"])[0], -0.35, places=9)
@@ -6,7 +6,8 @@ from products.api_views import (
     get_content_filtering_stats, get_collaborative_recommendations, 
     get_collaborative_similar_users, get_collaborative_similar_products,
     get_collaborative_filtering_stats, get_product_sentiment, get_sentiment_insights,
-    get_top_sentiment_products, get_aspect_insights, get_sentiment_stats
+    get_top_sentiment_products, get_aspect_insights, get_sentiment_stats,
+    get_visually_similar_products, get_products
 )
 
 urlpatterns = [
@@ -22,6 +23,9 @@ urlpatterns = [
     path('<slug>/', get_product, name='get_product'),
     path('<slug>/<review_uid>/delete/', delete_review, name='delete_review'),
     
+    # Catalog listing API (cursor paginated)
+    path('api/products/', get_products, name='api_products'),
+
     # API endpoints for content-based filtering
     path('api/recommendations/content-based/', get_content_based_recommendations, name='api_content_recommendations'),
     path('api/preferences/', get_user_preferences, name='api_user_preferences'),
@@ -37,6 +41,9 @@ urlpatterns = [
     path('api/collaborative/similar-products/<uuid:product_id>/', get_collaborative_similar_products, name='api_collaborative_similar_products'),
     path('api/collaborative/stats/', get_collaborative_filtering_stats, name='api_collaborative_filtering_stats'),
     
+    # API endpoints for image similarity
+    path('api/visual/similar-products/<uuid:product_id>/', get_visually_similar_products, name='api_visually_similar_products'),
+    
     # API endpoints for sentiment analysis
     path('api/sentiment/product/<uuid:product_id>/', get_product_sentiment, name='api_product_sentiment'),
     path('api/sentiment/insights/<uuid:product_id>/', get_sentiment_insights, name='api_sentiment_insights'),
@@ -8,12 +8,18 @@ from django.contrib.auth.decorators import login_required
 from .forms import ReviewForm
 from products.models import Product, SizeVariant, ProductReview, Wishlist, Brand, UserBehavior
 from accounts.models import Cart, CartItem
-from .recommendation_engine import RecommendationService
-from .feature_extractor import ProductFeatureExtractor
-from .preference_learner import PreferenceService as UserPreferenceService
-from .sentiment_analyzer import SentimentService
+from .pagination import paginate, get_ordering
+from base.instrumentation import query_budget
+from base.lazy import LazyImport
 
+# ML services load pandas/scikit-learn/TextBlob on first use, not at URL load
+RecommendationService = LazyImport('products.recommendation_engine', 'RecommendationService')
+ProductFeatureExtractor = LazyImport('products.feature_extractor', 'ProductFeatureExtractor')
+UserPreferenceService = LazyImport('products.preference_learner', 'PreferenceService')
+SentimentService = LazyImport('products.sentiment_analyzer', 'SentimentService')
 
+
+@query_budget(50)
 def get_product(request, slug):
     product = get_object_or_404(Product, slug=slug)
     sorted_size_variants = product.size_variant.all().order_by('size_name')
@@ -58,9 +64,12 @@ def get_product(request, slug):
     if request.user.is_authenticated:
         review = ProductReview.objects.filter(product=product, user=request.user).first()
 
+    # Likes and dislikes are prefetched so each review's counts need no query
+    reviews = list(product.reviews.select_related('user').prefetch_related('likes', 'dislikes'))
+    rating = sum(review.stars for review in reviews) / len(reviews) if reviews else 0
     rating_percentage = 0
-    if product.reviews.exists():
-        rating_percentage = (product.get_rating() / 5) * 100
+    if reviews:
+        rating_percentage = (rating / 5) * 100
 
     if request.method == 'POST' and request.user.is_authenticated:
         review_form = ReviewForm(request.POST, instance=review) if review else ReviewForm(request.POST)
@@ -92,6 +101,8 @@ def get_product(request, slug):
         'ai_similar_products': ai_similar_products,
         'sentiment_insights': sentiment_insights,
         'review_form': review_form,
+        'reviews': reviews,
+        'rating': rating,
         'rating_percentage': rating_percentage,
         'in_wishlist': in_wishlist,
     }
@@ -221,7 +232,7 @@ def index(request):
 # 👇 Add your brand_products view here:
 def brand_products(request, brand_id):
     brand = get_object_or_404(Brand, uid=brand_id)
-    products = Product.objects.filter(brand=brand)
+    products = paginate(request, Product.objects.filter(brand=brand), 20, get_ordering(request.GET.get('sort')))
     return render(request, 'product/brand_products.html', {
         'brand': brand,
         'products': products,
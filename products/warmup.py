@@ -0,0 +1,174 @@
+"""
+Startup Warmup
+Loads the ML modules, saved factor models, compiled sentiment lexicons and
+in-process catalog indexes once at startup instead of on each worker's first request. Run in the
+gunicorn master (--preload) it happens before fork, and gc.freeze() keeps the
+loaded objects out of garbage collection so their pages stay shared
+copy-on-write between workers
+"""
+
+import gc
+import os
+import sys
+import time
+import warnings
+import importlib
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+
+# Modules behind the views' LazyImport stand-ins
+ML_MODULES = (
+    'products.recommendation_engine',
+    'products.feature_extractor',
+    'products.preference_learner',
+    'products.collaborative_filtering',
+    'products.matrix_factorization',
+    'products.sentiment_analyzer',
+    'products.image_hashing',
+)
+
+# Commands that serve requests; other manage.py commands never warm up
+SERVING_COMMANDS = ('runserver',)
+# Servers recognised from argv[0]; any other server sets WARMUP_SERVER=1
+SERVER_PROGRAMS = ('gunicorn', 'uwsgi')
+WARMUP_SERVER_ENV = 'WARMUP_SERVER'
+
+warmup_state = {
+    'status': 'pending',
+    'pid': None,
+    'steps': [],
+    'total_seconds': None,
+    'frozen_objects': 0,
+}
+
+
+def _import_ml_modules():
+    for module in ML_MODULES:
+        importlib.import_module(module)
+    return {'modules': len(ML_MODULES)}
+
+
+def _compile_lexicons():
+    from .sentiment_scorers import get_lexicon, get_scorer
+    lexicon = get_lexicon()
+    # TextBlob loads its own lexicon on the first scored text
+    get_scorer().score_batch(['warm up'])
+    return {'lexicon_tokens': len(lexicon.known), 'scorer': settings.SENTIMENT_SCORER}
+
+
+def _load_search_index():
+    from .search import get_search_backend, PythonSearchBackend
+    backend = get_search_backend()
+    detail = {'backend': backend.name}
+    if isinstance(backend, PythonSearchBackend):
+        detail['documents'] = backend.rebuild()
+    return detail
+
+
+def _load_image_hash_trees():
+    from .image_hashing import ImageHashingService
+    service = ImageHashingService()
+    return {kind: len(service.get_tree(kind)) for kind in ('phash', 'dhash')}
+
+
+def _load_factor_models():
+    from .matrix_factorization import get_saved_recommenders
+    recommenders = get_saved_recommenders()
+    if not recommenders:
+        return {'models': []}
+    first = next(iter(recommenders.values()))
+    return {'models': sorted(recommenders), 'users': len(first.user_index), 'items': len(first.item_index)}
+
+
+# name -> loader returning details for the readiness report
+WARMUP_STEPS = {
+    'ml_modules': _import_ml_modules,
+    'sentiment_lexicon': _compile_lexicons,
+    'search_index': _load_search_index,
+    'image_hash_trees': _load_image_hash_trees,
+    'factor_models': _load_factor_models,
+}
+
+
+def should_warm_up(argv=None):
+    """
+    Warm up only in processes that clearly serve requests: gunicorn, uWSGI,
+    runserver's serving child, or a process started with WARMUP_SERVER=1.
+    Everything else (migrate, shell, test runners, workers, scripts) skips it
+    """
+    if not getattr(settings, 'WARMUP_ON_STARTUP', False):
+        return False
+    if os.environ.get(WARMUP_SERVER_ENV, '').lower() in ('1', 'true', 'yes'):
+        return True
+    argv = sys.argv if argv is None else argv
+    if not argv:
+        return False
+    program = os.path.basename(argv[0])
+    if program in ('manage.py', 'django-admin'):
+        command = argv[1] if len(argv) > 1 else ''
+        if command not in SERVING_COMMANDS:
+            return False
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+    # argv[0] is the server's script, or its package's __main__ under python -m
+    return any(server in argv[0] for server in SERVER_PROGRAMS)
+
+
+def warm_up(steps=None):
+    """
+    Run the configured warmup steps, then close database connections (forked
+    workers must not share them) and freeze the surviving objects. A failed
+    step is recorded and left to load lazily on first use
+    """
+    names = steps if steps is not None else getattr(settings, 'WARMUP_STEPS', list(WARMUP_STEPS))
+    warmup_state.update(status='warming', pid=os.getpid(), steps=[])
+    started = time.perf_counter()
+
+    with warnings.catch_warnings():
+        # Runs from AppConfig.ready(); the steps only read, and fail soft if tables are missing
+        warnings.filterwarnings('ignore', message='Accessing the database during app initialization')
+        for name in names:
+            step = {'name': name, 'seconds': None, 'detail': {}, 'error': None}
+            step_started = time.perf_counter()
+            try:
+                step['detail'] = WARMUP_STEPS[name]()
+            except Exception as e:
+                step['error'] = f'{type(e).__name__}: {e}'
+                print(f"Error in warmup step {name}: {e}")
+            step['seconds'] = round(time.perf_counter() - step_started, 3)
+            warmup_state['steps'].append(step)
+
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+    failed = any(step['error'] for step in warmup_state['steps'])
+    warmup_state.update(
+        status='degraded' if failed else 'ready',
+        total_seconds=round(time.perf_counter() - started, 3),
+        frozen_objects=gc.get_freeze_count(),
+    )
+    return warmup_state
+
+
+def skip_warm_up():
+    """
+    Record that this process loads everything lazily, so /ready reports it
+    ready instead of waiting for a warmup that will never run
+    """
+    warmup_state.update(status='skipped', pid=os.getpid())
+    return warmup_state
+
+
+def readiness_view(request):
+    """
+    Warmup report for load balancer readiness checks: 503 until warmup has
+    finished; a worker without warmup loads everything lazily and is ready
+    """
+    if not getattr(settings, 'WARMUP_ON_STARTUP', False):
+        return JsonResponse({'success': True, 'status': 'ready', 'warmup': 'disabled', 'pid': os.getpid()})
+
+    report = dict(warmup_state, worker_pid=os.getpid())
+    ready = report['status'] in ('ready', 'degraded', 'skipped')
+    return JsonResponse({'success': ready, **report}, status=200 if ready else 503)